@@ -3,13 +3,15 @@ import datetime
 import re
 import pythoncom
 import win32com.client
+import outlook_broker
 import pandas as pd
 import nest_asyncio
 import json
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, Response
 from flask_socketio import SocketIO
 from threading import Thread
 import openpyxl
+import metrics
 
 # Apply nest_asyncio to allow nested event loops
 nest_asyncio.apply()
@@ -184,7 +186,8 @@ def save_email(item, save_path, special_case):
     else:
         filename = f"{sanitize_filename(item.Subject)}.msg"
 
-    item.SaveAs(os.path.join(save_path, filename), 3)
+    with metrics.SAVEAS_SECONDS.time():
+        item.SaveAs(os.path.join(save_path, filename), 3)
     return filename
 
 def process_email(item, sender_path_table, default_year, specific_date_str):
@@ -206,22 +209,33 @@ def process_email(item, sender_path_table, default_year, specific_date_str):
             base_path, special_case, is_keyword_path = find_path_for_sender(sender_email, item.Subject, sender_path_table)
             if base_path:
                 save_path = os.path.join(base_path, str(year), month if month else '')
+                if is_keyword_path:
+                    route = 'keyword'
+                elif special_case and str(special_case).lower() == 'yes':
+                    route = 'special_case'
+                else:
+                    route = 'csv'
             else:
                 save_path = os.path.join(DEFAULT_SAVE_PATH, specific_date_str)  # Use specific date folder in default path
+                route = 'default'
 
             filename = save_email(item, save_path, special_case)
             logs.append(f"Saved: {filename} to {save_path}")
+            metrics.EMAILS_PROCESSED.inc(route=route)
             processed = True
         except pythoncom.com_error as com_err:
             retries -= 1
+            metrics.COM_ERRORS.inc(code=metrics.com_error_code(com_err))
             logs.append(f"COM Error handling email with subject '{item.Subject}' (Code: {com_err.args})")
             if retries == 0:
                 logs.append(f"Failed to save the email '{item.Subject}' after 3 retries")
                 failed_emails.append({'email_address': sender_email, 'subject': item.Subject})
+                metrics.EMAILS_PROCESSED.inc(route='failed')
         except Exception as e:
             retries = 0
             logs.append(f"Error handling email with subject '{item.Subject}': {str(e)}")
             failed_emails.append({'email_address': sender_email, 'subject': item.Subject})
+            metrics.EMAILS_PROCESSED.inc(route='failed')
 
     return logs, failed_emails
 
@@ -229,33 +243,39 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
     logs = []
     pythoncom.CoInitialize()
     specific_date = datetime.datetime.strptime(specific_date_str, '%Y-%m-%d').date()
-    outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
-    inbox = None
-
-    for store in outlook.Stores:
-        if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
-            try:
-                root_folder = store.GetRootFolder()
-                for folder in root_folder.Folders:
-                    if folder.Name.lower() == "inbox":
-                        inbox = folder
+    # A running outlook_broker.py already holds the session and the Inbox
+    broker = outlook_broker.connect()
+    inbox = items = None
+    if broker is not None:
+        items = outlook_broker.inbox_items_on(broker, email_address, specific_date)
+    else:
+        outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+        for store in outlook.Stores:
+            if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
+                try:
+                    root_folder = store.GetRootFolder()
+                    for folder in root_folder.Folders:
+                        if folder.Name.lower() == "inbox":
+                            inbox = folder
+                            break
+                    if inbox is not None:
                         break
-                if inbox is not None:
-                    break
-            except AttributeError as e:
-                logs.append(f"Error accessing inbox: {str(e)}")
-                continue
+                except AttributeError as e:
+                    logs.append(f"Error accessing inbox: {str(e)}")
+                    continue
 
-    if inbox is None:
+    if inbox is None and items is None:
         logs.append(f"No Inbox found for the account with email address: {email_address}")
         pythoncom.CoUninitialize()
         with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
             f.writelines("\n".join(logs))
         return
 
-    items = inbox.Items
-    items.Sort("[ReceivedTime]", True)
-    items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
+    if items is None:
+        items = inbox.Items
+        items.Sort("[ReceivedTime]", True)
+        items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
 
     total_emails = 0
     saved_default = 0
@@ -263,9 +283,11 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
     not_saved = 0
     failed_emails = []
 
+    metrics.QUEUE_DEPTH.set(items.Count)
     for item in items:
         total_emails += 1
         email_logs, email_failed_emails = process_email(item, sender_path_table, default_year, specific_date_str)
+        metrics.QUEUE_DEPTH.set(max(items.Count - total_emails, 0))
         logs.extend(email_logs)
         failed_emails.extend(email_failed_emails)
         if any(DEFAULT_SAVE_PATH in log for log in email_logs):
@@ -316,6 +338,10 @@ def results():
 
     return render_template('results.html', logs=logs)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 def run_app():
     socketio.run(app, debug=True, use_reloader=False, allow_unsafe_werkzeug=True)
 
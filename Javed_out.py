@@ -1,37 +1,91 @@
 import win32com.client
+import pythoncom
 import os
 import datetime
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def extract_attachments(account_name, inbox_name, sender_email, date_str):
+import blob_store
+import outlook_broker
+
+# Attachments are kept once per distinct content in this store under the save
+# location; the timestamped names are hardlinks into it (see blob_store.py)
+BLOB_STORE_NAME = ".blobs"
+
+def build_dasl_filter(target_dates, sender_emails):
     """
-    Extract attachments from Outlook emails in the specified account and inbox,
-    from the specified sender, on the specified date.
-    
-    Parameters:
-    account_name (str): Name of the Outlook account
-    inbox_name (str): Name of the Outlook inbox/folder
-    sender_email (str): Email address of the sender
-    date_str (str): Date in format 'YYYY-MM-DD'
-    
-    Returns:
-    int: Number of attachments extracted
+    Build an @SQL Restrict filter for the received-date span and any of the
+    senders, so Outlook only returns candidate messages with attachments.
+    """
+    start = datetime.datetime.combine(min(target_dates), datetime.time.min)
+    end = datetime.datetime.combine(max(target_dates) + datetime.timedelta(days=1), datetime.time.min)
+    return outlook_broker.dasl_filter(start, end, sender_emails, has_attachments=True)
+
+def save_message_attachments(message, save_location, blobs):
     """
-    # Convert date string to datetime object
+    Save one message's attachments. Returns (saved, linked, skipped, errors):
+    new content, content already in the store linked under a new name, names
+    already present, and failures.
+    """
+    saved, linked, skipped, errors = 0, 0, 0, 0
+    # Batches span several dates, so the date is part of the prefix
+    timestamp = message.ReceivedTime.strftime('%Y%m%d_%H%M%S')
+    for attachment in message.Attachments:
+        # Create a unique filename with timestamp
+        safe_filename = f"{timestamp}_{attachment.FileName}"
+        file_path = os.path.join(save_location, safe_filename)
+        temp_path = blobs.temp_path(safe_filename)
+        try:
+            attachment.SaveAsFile(temp_path)
+            digest = blob_store.hash_file(temp_path)
+            # Pick the first of name, name_1, ... that is free or already holds
+            # this content; a different file under the name is never replaced
+            base, extension = os.path.splitext(file_path)
+            counter = 1
+            while os.path.exists(file_path) and blobs.ref_digest(file_path) != digest:
+                file_path = f"{base}_{counter}{extension}"
+                counter += 1
+            safe_filename = os.path.basename(file_path)
+            if os.path.exists(file_path):
+                os.remove(temp_path)
+                print(f"  Skipped attachment already saved: {safe_filename}")
+                skipped += 1
+                continue
+            known = blobs.has(digest)
+            blobs.ingest(temp_path, digest)
+            blobs.link(digest, file_path)
+            if known:
+                print(f"  Linked duplicate attachment: {safe_filename}")
+                linked += 1
+            else:
+                print(f"  Saved attachment: {safe_filename}")
+                saved += 1
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            print(f"  Error saving attachment '{attachment.FileName}': {e}")
+            errors += 1
+    return saved, linked, skipped, errors
+
+def save_local_message_attachments(entry_id, store_id, save_location, blobs):
+    """
+    save_message_attachments on a worker thread with its own COM apartment and
+    MAPI session.
+    """
+    pythoncom.CoInitialize()
     try:
-        target_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-    except ValueError:
-        print(f"Error: Invalid date format. Please use YYYY-MM-DD format.")
-        return 0
-    
-    # Hardcoded save location - modify as needed
-    save_location = r"C:\EmailAttachments"
-    
-    # Create save location if it doesn't exist
-    if not os.path.exists(save_location):
-        os.makedirs(save_location)
-        
+        namespace = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+        message = namespace.GetItemFromID(entry_id, store_id)
+        return save_message_attachments(message, save_location, blobs)
+    finally:
+        pythoncom.CoUninitialize()
+
+def find_local_messages(account_name, inbox_name, target_dates, sender_emails):
+    """
+    Open Outlook in this process, find the account and folder, and return the
+    messages matching the date span and senders, or None on error.
+    """
     # Connect to Outlook
     print("Connecting to Outlook...")
     try:
@@ -39,7 +93,7 @@ def extract_attachments(account_name, inbox_name, sender_email, date_str):
         namespace = outlook.GetNamespace("MAPI")
     except Exception as e:
         print(f"Error connecting to Outlook: {e}")
-        return 0
+        return None
     
     # Find the specified account
     account_found = False
@@ -59,7 +113,7 @@ def extract_attachments(account_name, inbox_name, sender_email, date_str):
             print(f"Error: Account '{account_name}' not found. Available accounts:")
             for i in range(1, namespace.Folders.Count + 1):
                 print(f"  - {namespace.Folders.Item(i).Name}")
-            return 0
+            return None
             
         # Navigate to the specified inbox/folder
         folder = root_folder
@@ -75,48 +129,128 @@ def extract_attachments(account_name, inbox_name, sender_email, date_str):
                 print("Available folders:")
                 for subfolder in folder.Folders:
                     print(f"  - {subfolder.Name}")
-                return 0
+                return None
     except Exception as e:
         print(f"Error accessing folder: {e}")
-        return 0
+        return None
+
+    # Let the store do the filtering instead of walking every item in the folder
+    try:
+        messages = folder.Items.Restrict(build_dasl_filter(target_dates, sender_emails))
+        messages.Sort("[ReceivedTime]", True)  # Sort by received time
+    except Exception as e:
+        print(f"Error processing emails: {e}")
+        return None
+    return messages
+
+def find_broker_messages(broker, account_name, inbox_name, target_dates, sender_emails):
+    """
+    Look the folder up and filter it through a running outlook_broker.py, which
+    keeps the Outlook session and folder handles warm. Returns the candidate
+    messages, or None when the folder cannot be found.
+    """
+    folder = broker.resolve_folder(account_name, inbox_name)
+    if folder is None:
+        print(f"Error: Folder '{inbox_name}' not found in account '{account_name}'")
+        return None
+    print(f"Found folder through the Outlook broker: {folder['name']}")
+    start = datetime.datetime.combine(min(target_dates), datetime.time.min)
+    end = datetime.datetime.combine(max(target_dates) + datetime.timedelta(days=1), datetime.time.min)
+    return broker.restrict(folder, start=start, end=end, senders=sender_emails, has_attachments=True)
+
+def extract_attachments(account_name, inbox_name, sender_email, date_str, workers=4):
+    """
+    Extract attachments from Outlook emails in the specified account and inbox,
+    from the specified sender(s), on the specified date(s).
     
-    print(f"Searching for emails in account '{account_name}', folder '{inbox_name}' from '{sender_email}' on {date_str}...")
+    Parameters:
+    account_name (str): Name of the Outlook account
+    inbox_name (str): Name of the Outlook inbox/folder
+    sender_email (str or list): Email address(es) of the sender(s)
+    date_str (str or list): Date(s) in format 'YYYY-MM-DD'
+    workers (int): Number of threads saving attachments
     
-    # Filter emails
-    attachment_count = 0
+    Returns:
+    int: Number of attachments extracted
+    """
+    sender_emails = [sender_email] if isinstance(sender_email, str) else list(sender_email)
+    date_strs = [date_str] if isinstance(date_str, str) else list(date_str)
+    sender_emails = [s for s in sender_emails if s]
+    date_strs = [d for d in date_strs if d]
+    if not sender_emails:
+        print("Error: No sender email address given.")
+        return 0
+    if not date_strs:
+        print("Error: Invalid date format. Please use YYYY-MM-DD format.")
+        return 0
+
+    # Convert date strings to date objects
     try:
-        messages = folder.Items
-        messages.Sort("[ReceivedTime]", True)  # Sort by received time
+        target_dates = {datetime.datetime.strptime(d, '%Y-%m-%d').date() for d in date_strs}
+    except ValueError:
+        print(f"Error: Invalid date format. Please use YYYY-MM-DD format.")
+        return 0
+    
+    # Hardcoded save location - modify as needed
+    save_location = r"C:\EmailAttachments"
+    
+    # Create save location if it doesn't exist
+    if not os.path.exists(save_location):
+        os.makedirs(save_location)
         
+    print(f"Searching for emails in account '{account_name}', folder '{inbox_name}' "
+          f"from {', '.join(sender_emails)} on {', '.join(sorted(date_strs))}...")
+
+    # Prefer a running Outlook broker: no Outlook start-up or folder walk per run
+    broker = outlook_broker.connect()
+    if broker is not None:
+        messages = find_broker_messages(broker, account_name, inbox_name, target_dates, sender_emails)
+    else:
+        messages = find_local_messages(account_name, inbox_name, target_dates, sender_emails)
+    if messages is None:
+        return 0
+
+    lowered_senders = [s.lower() for s in sender_emails]
+    matches = []
+    try:
         for message in messages:
-            # Check if the message was received on the target date
-            message_date = message.ReceivedTime.date()
-            if message_date == target_date:
-                # Check if the sender matches
-                if sender_email.lower() in str(message.SenderEmailAddress).lower():
-                    print(f"Found matching email: '{message.Subject}' received at {message.ReceivedTime}")
-                    
-                    # Process attachments
-                    if message.Attachments.Count > 0:
-                        for attachment in message.Attachments:
-                            # Create a unique filename with timestamp
-                            timestamp = message.ReceivedTime.strftime('%H%M%S')
-                            safe_filename = f"{timestamp}_{attachment.FileName}"
-                            file_path = os.path.join(save_location, safe_filename)
-                            
-                            # Save the attachment
-                            try:
-                                attachment.SaveAsFile(file_path)
-                                print(f"  Saved attachment: {safe_filename}")
-                                attachment_count += 1
-                            except Exception as e:
-                                print(f"  Error saving attachment '{attachment.FileName}': {e}")
-                    else:
-                        print("  No attachments found in this email.")
+            # The span filter can include days between non-consecutive target dates
+            if message.ReceivedTime.date() not in target_dates:
+                continue
+            if not any(s in str(message.SenderEmailAddress).lower() for s in lowered_senders):
+                continue
+            print(f"Found matching email: '{message.Subject}' received at {message.ReceivedTime}")
+            matches.append(message)
     except Exception as e:
         print(f"Error processing emails: {e}")
+
+    # Save attachments concurrently; identical content is stored only once
+    blobs = blob_store.BlobStore(os.path.join(save_location, BLOB_STORE_NAME))
+    attachment_count, linked_count, skipped_count, error_count = 0, 0, 0, 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if broker is not None:
+                futures = [pool.submit(save_message_attachments, message, save_location, blobs) for message in matches]
+            else:
+                # Local COM objects cannot cross threads; workers reopen them by EntryID
+                futures = [pool.submit(save_local_message_attachments, message.EntryID, message.Parent.StoreID, save_location, blobs)
+                           for message in matches]
+            for future in as_completed(futures):
+                try:
+                    saved, linked, skipped, errors = future.result()
+                except Exception as e:
+                    print(f"Error processing email: {e}")
+                    error_count += 1
+                    continue
+                attachment_count += saved
+                linked_count += linked
+                skipped_count += skipped
+                error_count += errors
+    finally:
+        blobs.close()
     
-    print(f"\nExtraction complete. {attachment_count} attachment(s) saved to {save_location}")
+    print(f"\nExtraction complete. {attachment_count} attachment(s) saved to {save_location}"
+          f" ({linked_count} duplicate(s) linked, {skipped_count} already present, {error_count} error(s))")
     return attachment_count
 
 def list_outlook_accounts():
@@ -132,14 +266,19 @@ def list_outlook_accounts():
     except Exception as e:
         print(f"Error listing Outlook accounts: {e}")
 
+def split_list(value):
+    """Split a comma-separated input into a list of stripped, non-empty values"""
+    return [part.strip() for part in value.split(',') if part.strip()]
+
 def main():
     """Main function to get user input and extract attachments"""
     if len(sys.argv) == 5:
-        # Get parameters from command line arguments
+        # Get parameters from command line arguments; sender and date may be
+        # comma-separated lists for a batch run
         account_name = sys.argv[1]
         inbox_name = sys.argv[2]
-        sender_email = sys.argv[3]
-        date_str = sys.argv[4]
+        sender_emails = split_list(sys.argv[3])
+        date_strs = split_list(sys.argv[4])
     else:
         # Get parameters from user input
         print("Outlook Email Attachment Extractor")
@@ -150,11 +289,11 @@ def main():
         
         account_name = input("Enter Outlook account name: ")
         inbox_name = input("Enter inbox/folder path (e.g., 'Inbox' or 'Inbox/Subfolder'): ")
-        sender_email = input("Enter sender email address: ")
-        date_str = input("Enter date (YYYY-MM-DD): ")
+        sender_emails = split_list(input("Enter sender email address(es), comma-separated: "))
+        date_strs = split_list(input("Enter date(s) (YYYY-MM-DD), comma-separated: "))
     
     # Extract attachments
-    extract_attachments(account_name, inbox_name, sender_email, date_str)
+    extract_attachments(account_name, inbox_name, sender_emails, date_strs)
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,7 @@ import os
 import datetime
 import re
 import win32com.client
+import outlook_broker
 import pandas as pd
 import nest_asyncio
 from threading import Thread
@@ -132,24 +133,29 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
     logs = []
     pythoncom.CoInitialize()
     specific_date = datetime.datetime.strptime(specific_date_str, '%Y-%m-%d').date()
-    outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
-    inbox = None
+    # A running outlook_broker.py already holds the session and the Inbox
+    broker = outlook_broker.connect()
+    inbox = items = None
+    if broker is not None:
+        items = outlook_broker.inbox_items_on(broker, email_address, specific_date)
+    else:
+        outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
 
-    for store in outlook.Stores:
-        if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
-            try:
-                root_folder = store.GetRootFolder()
-                for folder in root_folder.Folders:
-                    if folder.Name.lower() == "inbox":
-                        inbox = folder
+        for store in outlook.Stores:
+            if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
+                try:
+                    root_folder = store.GetRootFolder()
+                    for folder in root_folder.Folders:
+                        if folder.Name.lower() == "inbox":
+                            inbox = folder
+                            break
+                    if inbox is not None:
                         break
-                if inbox is not None:
-                    break
-            except AttributeError as e:
-                logs.append(f"Error accessing inbox: {str(e)}")
-                continue
+                except AttributeError as e:
+                    logs.append(f"Error accessing inbox: {str(e)}")
+                    continue
 
-    if inbox is None:
+    if inbox is None and items is None:
         logs.append(f"No Inbox found for the account with the email address: {email_address}")
         pythoncom.CoUninitialize()
         with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
@@ -157,9 +163,10 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
                 f.write(f"{log}\n")
         return
 
-    items = inbox.Items
-    items.Sort("[ReceivedTime]", True)
-    items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
+    if items is None:
+        items = inbox.Items
+        items.Sort("[ReceivedTime]", True)
+        items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
 
     total_emails = 0
     saved_default = 0
@@ -3,6 +3,7 @@ import datetime
 import re
 import pythoncom
 import win32com.client
+import outlook_broker
 import pandas as pd
 import json
 from flask import Flask, render_template, request, redirect, url_for, flash
@@ -399,30 +400,36 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
     logs = []
     pythoncom.CoInitialize()
     specific_date = datetime.datetime.strptime(specific_date_str, '%Y-%m-%d').date()
-    outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+    # A running outlook_broker.py already holds the session and the Inbox
+    broker = outlook_broker.connect()
+    inbox = items = None
+    if broker is not None:
+        items = outlook_broker.inbox_items_on(broker, email_address, specific_date)
+    else:
+        outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
 
-    inbox = None
-    for store in outlook.Stores:
-        if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
-            try:
-                root_folder = store.GetRootFolder()
-                inbox = next((folder for folder in root_folder.Folders if folder.Name.lower() == "inbox"), None)
-                if inbox:
-                    break
-            except AttributeError as e:
-                logs.append(f"Error accessing inbox: {str(e)}")
-                continue
+        for store in outlook.Stores:
+            if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
+                try:
+                    root_folder = store.GetRootFolder()
+                    inbox = next((folder for folder in root_folder.Folders if folder.Name.lower() == "inbox"), None)
+                    if inbox:
+                        break
+                except AttributeError as e:
+                    logs.append(f"Error accessing inbox: {str(e)}")
+                    continue
 
-    if not inbox:
+    if inbox is None and items is None:
         logs.append(f"No Inbox found for the account with email address: {email_address}")
         pythoncom.CoUninitialize()
         with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
             f.writelines("\n".join(logs))
         return
 
-    items = inbox.Items
-    items.Sort("[ReceivedTime]", True)
-    items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
+    if items is None:
+        items = inbox.Items
+        items.Sort("[ReceivedTime]", True)
+        items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
 
     total_emails, saved_default, saved_actual, not_saved = 0, 0, 0, 0
     failed_emails = []
@@ -0,0 +1,337 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import nav_corpus
+import nav_scanner
+import number_parser
+
+# Accuracy and throughput benchmark for the NAV extractors (extract_pdfv2.py,
+# ext_pdf.py, pdf_model_a.py) on the synthetic corpus from nav_corpus.py.
+#
+# Each engine runs over the whole corpus in a fresh interpreter, so import
+# caches and memory from one engine do not leak into the next and the peak
+# resident memory is the engine's own. A file counts as correct when both NAVs
+# match the manifest; period labels are scored separately after normalising
+# them to ISO dates. Results are written to a JSON file named after the git
+# commit, together with the corpus fingerprint, and --compare prints the
+# difference against an earlier run; the run fails if an engine's NAV
+# accuracy dropped.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ENGINES = ('extract_pdfv2', 'ext_pdf', 'pdf_model_a')
+DEFAULT_TIMEOUT = 1800
+NAV_TOLERANCE = 0.5
+
+# pdf_model_a only ships fund name and report date rules; the harness adds
+# these to a throwaway knowledge base so it can be scored on NAVs
+_DATE = r"\d{1,2}[\./]\d{1,2}[\./]\d{4}|\d{1,2}\s+[A-Z][a-z]+\s+\d{4}"
+MODEL_A_RULES = (
+    ('period1_label', rf"({_DATE})\s+({_DATE})", 0),
+    ('period2_label', rf"({_DATE})\s+({_DATE})", 1),
+    ('period1_nav', r"Net\s+asset\s+value\s+([\d',\.]+)\s+([\d',\.]+)", 0),
+    ('period2_nav', r"Net\s+asset\s+value\s+([\d',\.]+)\s+([\d',\.]+)", 1),
+)
+
+_MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+
+def _result_periods(result):
+    return (result.get('Period 1 Label'), result.get('Period 1 NAV'),
+            result.get('Period 2 Label'), result.get('Period 2 NAV'))
+
+def _load_extract_pdfv2(work_dir):
+    module = importlib.import_module('extract_pdfv2')
+
+    def run(pdf_path):
+        # No layout templates or strategy stats, so every run starts cold
+        return _result_periods(module.process_pdf_comprehensive(pdf_path, templates_path=None, stats_path=None))
+    return run
+
+def _load_ext_pdf(work_dir):
+    module = importlib.import_module('ext_pdf')
+
+    def run(pdf_path):
+        return _result_periods(module.process_pdf(pdf_path))
+    return run
+
+def _load_pdf_model_a(work_dir):
+    # Exits (SystemExit) when PyPDF2, pandas or tqdm are missing
+    module = importlib.import_module('pdf_model_a')
+    extractor = module.FundReportExtractor(os.path.join(work_dir, 'model_a_kb.pkl'))
+    for name, pattern, group in MODEL_A_RULES:
+        extractor.add_rule(name, pattern, match_group=group)
+    rules = [name for name, _, _ in MODEL_A_RULES]
+
+    def run(pdf_path):
+        result = extractor.extract_from_file(pdf_path, rules)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return (result.get('period1_label'), number_parser.parse_number(result.get('period1_nav')),
+                result.get('period2_label'), number_parser.parse_number(result.get('period2_nav')))
+    return run
+
+ENGINE_LOADERS = {
+    'extract_pdfv2': _load_extract_pdfv2,
+    'ext_pdf': _load_ext_pdf,
+    'pdf_model_a': _load_pdf_model_a,
+}
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB, or None when it cannot be
+    measured (needs psutil on Windows).
+    """
+    try:
+        resource = importlib.import_module('resource')
+    except ImportError:
+        try:
+            psutil = importlib.import_module('psutil')
+        except ImportError:
+            return None
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        return peak / (1024 * 1024) if peak else None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_worker(engine, folder, output_path):
+    """
+    Run one engine over the corpus in this process and write its raw results
+    to output_path as JSON.
+    """
+    manifest = nav_corpus.load_manifest(folder)
+    with tempfile.TemporaryDirectory() as work_dir:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run = ENGINE_LOADERS[engine](work_dir)
+        except (ImportError, SystemExit) as e:
+            payload = {'error': f"not available: {type(e).__name__}: {e}"}
+        else:
+            files = {}
+            for name in sorted(manifest['files']):
+                start = time.perf_counter()
+                error = None
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        extracted = run(os.path.join(folder, name))
+                except Exception as e:
+                    extracted, error = (None, None, None, None), f"{type(e).__name__}: {e}"
+                files[name] = {'extracted': list(extracted), 'error': error, 'seconds': time.perf_counter() - start}
+            payload = {'files': files, 'peak_rss_mb': peak_rss_mb()}
+    with open(output_path, 'w') as f:
+        json.dump(payload, f, default=str)
+    return 0
+
+def normalise_label(label):
+    """
+    A period label ('30.09.2024', '30/09/2024', '30 September 2024',
+    'Sep 30, 2024', ...) as an ISO date, or None when it holds no full date.
+    """
+    token = nav_scanner.scan_line(str(label or '')).first(*nav_scanner.DAY_DATE_KINDS)
+    if token is None:
+        return None
+    if token.kind == 'date_numeric':
+        day, month, year = (int(part) for part in re.split(r'[\./]', token.text))
+    else:
+        parts = re.findall(r'\d+|[A-Za-z]+', token.text)
+        month = _MONTHS.index(next(part for part in parts if part.isalpha())[:3].lower()) + 1
+        numbers = [int(part) for part in parts if part.isdigit()]
+        day, year = min(numbers), max(numbers)
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+def _nav_matches(value, expected):
+    return value is not None and abs(float(value) - expected) <= NAV_TOLERANCE
+
+def score_file(expected, extracted):
+    """
+    (NAVs correct, labels correct) for one file.
+    """
+    label1, nav1, label2, nav2 = extracted
+    navs_ok = _nav_matches(nav1, expected['period1_nav']) and _nav_matches(nav2, expected['period2_nav'])
+    labels_ok = (normalise_label(label1) == expected['period1_label']
+                 and normalise_label(label2) == expected['period2_label'])
+    return navs_ok, labels_ok
+
+def summarise(manifest, raw):
+    """
+    Per-engine summary (accuracy, time per file, peak memory, per-layout
+    accuracy and the files it got wrong) from a worker's raw results.
+    """
+    if 'error' in raw:
+        return {'error': raw['error']}
+    seconds = []
+    navs_correct = labels_correct = errors = 0
+    layouts = {}
+    wrong = {}
+    for name, expected in sorted(manifest['files'].items()):
+        entry = raw['files'][name]
+        seconds.append(entry['seconds'])
+        navs_ok, labels_ok = score_file(expected, entry['extracted'])
+        navs_correct += navs_ok
+        labels_correct += labels_ok
+        errors += entry['error'] is not None
+        layout = layouts.setdefault(expected['layout'], {'files': 0, 'navs_correct': 0})
+        layout['files'] += 1
+        layout['navs_correct'] += navs_ok
+        if not navs_ok:
+            wrong[name] = entry['error'] or entry['extracted']
+    total = len(manifest['files'])
+    return {
+        'files': total,
+        'nav_accuracy': navs_correct / total if total else 0.0,
+        'label_accuracy': labels_correct / total if total else 0.0,
+        'errors': errors,
+        'seconds_total': sum(seconds),
+        'seconds_per_file_median': statistics.median(seconds) if seconds else 0.0,
+        'seconds_per_file_mean': statistics.mean(seconds) if seconds else 0.0,
+        'peak_rss_mb': raw['peak_rss_mb'],
+        'layouts': layouts,
+        'wrong': wrong,
+    }
+
+def run_engine(engine, folder, timeout):
+    """
+    Run engine over the corpus in a fresh interpreter; returns its raw results.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, 'result.json')
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', engine, os.path.abspath(folder), output_path]
+        try:
+            result = subprocess.run(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {'error': f"timed out after {timeout}s"}
+        if result.returncode != 0 or not os.path.exists(output_path):
+            last = result.stderr.decode(errors='ignore').strip().splitlines()[-1:]
+            return {'error': f"worker failed: {' '.join(last)}"}
+        with open(output_path) as f:
+            return json.load(f)
+
+def git_revision():
+    """
+    Short commit of the scripts being benchmarked, with -dirty for local
+    changes, or None outside a git checkout.
+    """
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=HERE,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode().strip() or None
+
+def _format_mb(value):
+    return f"{value:8.1f}" if value is not None else f"{'n/a':>8}"
+
+def print_report(report):
+    print(f"Corpus {report['corpus']} ({report['files']} files), revision {report['revision'] or 'unknown'}\n")
+    print(f"{'engine':<16} {'NAV ok':>7} {'labels':>7} {'errors':>6} {'s/file':>8} {'mean':>8} {'peak MB':>8}")
+    for engine, summary in report['engines'].items():
+        if 'error' in summary:
+            print(f"{engine:<16} {summary['error']}")
+            continue
+        print(f"{engine:<16} {summary['nav_accuracy']:7.1%} {summary['label_accuracy']:7.1%} {summary['errors']:6d} "
+              f"{summary['seconds_per_file_median']:8.3f} {summary['seconds_per_file_mean']:8.3f} "
+              f"{_format_mb(summary['peak_rss_mb'])}")
+
+    scored = [(engine, summary) for engine, summary in report['engines'].items() if 'error' not in summary]
+    if scored:
+        print(f"\n{'NAV accuracy by layout':<24}" + "".join(f" {engine:>14}" for engine, _ in scored))
+        for layout in nav_corpus.LAYOUTS:
+            cells = []
+            for _, summary in scored:
+                counts = summary['layouts'].get(layout)
+                cells.append(f"{counts['navs_correct']}/{counts['files']}" if counts else "-")
+            if any(cell != "-" for cell in cells):
+                print(f"{layout:<24}" + "".join(f" {cell:>14}" for cell in cells))
+
+def compare(report, baseline):
+    """
+    Print the change against an earlier report; returns True if any engine's
+    NAV accuracy dropped.
+    """
+    print(f"\nCompared with {baseline['revision'] or 'unknown'}:")
+    if baseline['corpus'] != report['corpus']:
+        print(f"  Different corpus ({baseline['corpus']} vs {report['corpus']}); results are not comparable.")
+        return False
+    regressed = False
+    for engine, summary in report['engines'].items():
+        before = baseline['engines'].get(engine)
+        if not before or 'error' in before or 'error' in summary:
+            print(f"  {engine:<16} no comparison")
+            continue
+        accuracy = summary['nav_accuracy'] - before['nav_accuracy']
+        speed = summary['seconds_per_file_median'] - before['seconds_per_file_median']
+        memory = ((summary['peak_rss_mb'] or 0) - (before['peak_rss_mb'] or 0)
+                  if summary['peak_rss_mb'] is not None and before['peak_rss_mb'] is not None else None)
+        flag = ""
+        if accuracy < 0:
+            regressed = True
+            flag = "  ACCURACY DROPPED"
+        memory_text = f"{memory:+.1f} MB" if memory is not None else "n/a"
+        print(f"  {engine:<16} NAV {accuracy:+.1%}  s/file {speed:+.3f}  peak {memory_text}{flag}")
+        for name in sorted(set(summary['wrong']) - set(before['wrong'])):
+            print(f"    now wrong: {name}")
+        for name in sorted(set(before['wrong']) - set(summary['wrong'])):
+            print(f"    now right: {name}")
+    return regressed
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--worker']:
+        return run_worker(*argv[1:4])
+
+    parser = argparse.ArgumentParser(description="Benchmark NAV extraction accuracy, speed and memory on a synthetic corpus.")
+    parser.add_argument('folder', help="Corpus folder; generated there first if it has no manifest.json.")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES), help="Extractors to benchmark.")
+    parser.add_argument('--per-layout', type=int, default=nav_corpus.DEFAULT_PER_LAYOUT,
+                        help="PDFs per layout when generating the corpus.")
+    parser.add_argument('--seed', type=int, default=nav_corpus.DEFAULT_SEED, help="Seed when generating the corpus.")
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help="Seconds allowed per engine.")
+    parser.add_argument('--output', default=None,
+                        help="Where to write the JSON results (default: bench_<revision>.json in the corpus folder).")
+    parser.add_argument('--compare', default=None, help="Earlier results JSON to compare against.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(args.folder, nav_corpus.MANIFEST_NAME)):
+        print(f"Generating corpus in {args.folder}...")
+        nav_corpus.generate_corpus(args.folder, args.per_layout, args.seed)
+    manifest = nav_corpus.load_manifest(args.folder)
+
+    report = {
+        'revision': git_revision(),
+        'corpus': manifest['fingerprint'],
+        'files': len(manifest['files']),
+        'python': sys.version.split()[0],
+        'engines': {},
+    }
+    for engine in args.engines:
+        print(f"Running {engine}...")
+        report['engines'][engine] = summarise(manifest, run_engine(engine, args.folder, args.timeout))
+
+    print()
+    print_report(report)
+
+    output = args.output or os.path.join(args.folder, f"bench_{report['revision'] or 'unknown'}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nResults saved to: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(report, json.load(f)):
+                return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
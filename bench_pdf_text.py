@@ -0,0 +1,88 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+import pdf_document
+import extract_pdfv2
+
+# Text-engine benchmark for the NAV extractor. For every PDF in a folder it
+# times plain-text extraction with PyMuPDF and with pdfplumber, then runs the
+# full process_pdf_comprehensive() cascade once per engine and checks that both
+# produce the same fund name, labels and NAV values. The run fails if any file's
+# extracted values differ between the engines.
+
+ENGINES = (pdf_document.ENGINE_PYMUPDF, pdf_document.ENGINE_PDFPLUMBER)
+COMPARED_KEYS = ('Fund Name', 'Period 1 Label', 'Period 1 NAV', 'Period 2 Label', 'Period 2 NAV')
+
+def time_text(pdf_path, engine, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with pdf_document.PDFDocument(pdf_path, text_engine=engine) as pdf:
+            pdf.text()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def run_cascade(pdf_path, engine):
+    pdf_document.TEXT_ENGINE = engine
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # No layout templates or strategy stats, so both engines run the same cascade
+        result = extract_pdfv2.process_pdf_comprehensive(pdf_path, templates_path=None, stats_path=None)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PyMuPDF and pdfplumber text extraction on a folder of PDFs.")
+    parser.add_argument('folder', help="Folder of PDF reports to benchmark on.")
+    parser.add_argument('--runs', type=int, default=3, help="Text extraction runs per file and engine.")
+    parser.add_argument('--limit', type=int, default=None, help="Only benchmark the first N files.")
+    args = parser.parse_args()
+
+    if pdf_document.resolve_text_engine(pdf_document.ENGINE_PYMUPDF) != pdf_document.ENGINE_PYMUPDF:
+        print("PyMuPDF is not installed; nothing to compare.")
+        return 1
+
+    pdf_files = sorted(glob.glob(os.path.join(args.folder, "*.pdf")))[:args.limit]
+    if not pdf_files:
+        print(f"No PDF files found in folder '{args.folder}'.")
+        return 1
+
+    totals = {engine: {'text': 0.0, 'cascade': 0.0} for engine in ENGINES}
+    mismatches = []
+    print(f"{'file':<40} {'pymupdf':>9} {'pdfplumber':>11} {'speedup':>8}  values")
+    for pdf_path in pdf_files:
+        name = os.path.basename(pdf_path)
+        text_times = {engine: time_text(pdf_path, engine, args.runs) for engine in ENGINES}
+        results = {}
+        for engine in ENGINES:
+            results[engine], elapsed = run_cascade(pdf_path, engine)
+            totals[engine]['cascade'] += elapsed
+            totals[engine]['text'] += text_times[engine]
+
+        fast, slow = (results[engine] for engine in ENGINES)
+        differing = [key for key in COMPARED_KEYS if fast[key] != slow[key]]
+        if differing:
+            mismatches.append((name, differing, fast, slow))
+        speedup = text_times[ENGINES[1]] / text_times[ENGINES[0]] if text_times[ENGINES[0]] else 0.0
+        print(f"{name[:40]:<40} {text_times[ENGINES[0]]:9.3f} {text_times[ENGINES[1]]:11.3f} {speedup:7.1f}x  "
+              f"{'same' if not differing else 'DIFFERENT: ' + ', '.join(differing)}")
+
+    print(f"\n{'total':<40} {'pymupdf':>9} {'pdfplumber':>11}")
+    for stage in ('text', 'cascade'):
+        print(f"{stage:<40} {totals[ENGINES[0]][stage]:9.3f} {totals[ENGINES[1]][stage]:11.3f}")
+
+    for name, differing, fast, slow in mismatches:
+        print(f"\n{name}:")
+        for key in differing:
+            print(f"  {key}: pymupdf={fast[key]!r} pdfplumber={slow[key]!r}")
+
+    print(f"\n{len(pdf_files) - len(mismatches)}/{len(pdf_files)} files extracted identically.")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Import-time benchmark for the email saver entry points. Each case is run in a
+# fresh interpreter so nothing is served from sys.modules; the run fails if the
+# median exceeds the budget (1s by default).
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CASES = [
+    ("import email_core", [sys.executable, "-c", "import email_core"]),
+    ("email_cli.py --help", [sys.executable, os.path.join(HERE, "email_cli.py"), "--help"]),
+    ("email_core + single-day setup", [sys.executable, "-c",
+        "import email_core; email_core.date_range('2024-05-01', '2024-05-01'); "
+        "email_core.extract_date_from_text('NAV report May 2024', '2024')"]),
+]
+
+# Reference only: what every entry point used to pay at module load
+EAGER_CASE = ("eager heavy imports (old behaviour)", [sys.executable, "-c",
+    "import pandas, openpyxl, dateparser; dateparser.parse('May 2024')"])
+
+def time_command(cmd, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return None, result.stderr.decode(errors='ignore').strip().splitlines()[-1:]
+        timings.append(elapsed)
+    return timings, None
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start time of the email saver entry points.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreter runs per case.")
+    parser.add_argument('--budget', type=float, default=1.0, help="Maximum allowed median seconds per case.")
+    parser.add_argument('--include-eager', action='store_true', help="Also time the old eager heavy imports for comparison.")
+    args = parser.parse_args()
+
+    cases = list(CASES)
+    if args.include_eager:
+        cases.append(EAGER_CASE)
+
+    over_budget = False
+    print(f"{'case':<40} {'median':>8} {'min':>8} {'max':>8}")
+    for name, cmd in cases:
+        timings, error = time_command(cmd, args.runs)
+        if timings is None:
+            print(f"{name:<40} failed: {' '.join(error)}")
+            continue
+        median = statistics.median(timings)
+        flag = ""
+        if median > args.budget and (name, cmd) != EAGER_CASE:
+            over_budget = True
+            flag = "  OVER BUDGET"
+        print(f"{name:<40} {median:8.3f} {min(timings):8.3f} {max(timings):8.3f}{flag}")
+
+    return 1 if over_budget else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+# Content-addressed store for saved attachments and special-case emails.
+#
+# Each distinct file body is kept once under objects/<aa>/<sha256>, and the
+# human-readable routed paths are created as hardlinks to it (falling back to a
+# reflink, then a symlink, then a plain copy when the share does not support
+# links). A SQLite index records which view path points at which blob, so blobs
+# no view refers to any more can be garbage-collected with gc().
+#
+# Hardlinks only work within one volume, so the store should live on the same
+# share as the routed folders it serves.
+
+INDEX_NAME = 'index.sqlite3'
+CHUNK_SIZE = 1024 * 1024
+TMP_MAX_AGE = 24 * 3600
+
+LINK_HARDLINK = 'hardlink'
+LINK_REFLINK = 'reflink'
+LINK_SYMLINK = 'symlink'
+LINK_COPY = 'copy'
+
+# Linux FICLONE ioctl (btrfs, xfs); other platforms skip straight to symlinks
+_FICLONE = 0x40049409
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, INDEX_NAME), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " digest TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS refs ("
+            " view_path TEXT PRIMARY KEY,"
+            " digest TEXT NOT NULL,"
+            " method TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+        self._db.commit()
+
+    def blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def temp_path(self, name=''):
+        """
+        Return a unique path inside the store (same volume as the blobs) to write
+        a file into before ingest().
+        """
+        return os.path.join(self.tmp_dir, f"{time.time_ns()}_{threading.get_ident()}_{name}")
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def ingest(self, src_path, digest=None):
+        """
+        Move src_path into the store and return its digest. digest defaults to the
+        SHA-256 of the file; callers may key a blob by something else. If the blob
+        already exists src_path is simply removed.
+        """
+        if digest is None:
+            digest = hash_file(src_path)
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            os.remove(src_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.replace(src_path, blob_path)
+            except OSError:
+                # Different volume: copy then rename so a blob is never half-written
+                partial_path = blob_path + '.partial'
+                shutil.copyfile(src_path, partial_path)
+                os.replace(partial_path, blob_path)
+                os.remove(src_path)
+        size = os.path.getsize(blob_path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO blobs (digest, size, created) VALUES (?, ?, ?)",
+                (digest, size, time.time()),
+            )
+            self._db.commit()
+        return digest
+
+    def link(self, digest, view_path):
+        """
+        Create view_path pointing at the blob and record the reference. Returns the
+        link method used.
+        """
+        blob_path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(view_path) or '.', exist_ok=True)
+        method = None
+        for candidate, make in ((LINK_HARDLINK, os.link), (LINK_REFLINK, _reflink), (LINK_SYMLINK, os.symlink)):
+            try:
+                make(blob_path, view_path)
+                method = candidate
+                break
+            except (OSError, NotImplementedError):
+                continue
+        if method is None:
+            shutil.copyfile(blob_path, view_path)
+            method = LINK_COPY
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO refs (view_path, digest, method, created) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(view_path), digest, method, time.time()),
+            )
+            self._db.commit()
+        return method
+
+    def put_file(self, src_path, view_path, digest=None):
+        """
+        ingest() src_path and link() it at view_path. Returns (digest, method).
+        """
+        digest = self.ingest(src_path, digest)
+        return digest, self.link(digest, view_path)
+
+    def ref_digest(self, view_path):
+        with self._lock:
+            row = self._db.execute("SELECT digest FROM refs WHERE view_path = ?", (os.path.abspath(view_path),)).fetchone()
+        return row[0] if row else None
+
+    def unref(self, view_path):
+        with self._lock:
+            self._db.execute("DELETE FROM refs WHERE view_path = ?", (os.path.abspath(view_path),))
+            self._db.commit()
+
+    def prune_refs(self):
+        """
+        Drop references whose view path has been deleted or replaced by a
+        different file. Returns the number of references dropped.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT view_path, digest, method FROM refs").fetchall()
+        stale = []
+        for view_path, digest, method in rows:
+            if method == LINK_SYMLINK:
+                alive = os.path.islink(view_path) and os.path.exists(view_path)
+            elif method == LINK_HARDLINK:
+                try:
+                    alive = os.path.samefile(view_path, self.blob_path(digest))
+                except OSError:
+                    alive = False
+            else:
+                alive = os.path.exists(view_path)
+            if not alive:
+                stale.append((view_path,))
+        if stale:
+            with self._lock:
+                self._db.executemany("DELETE FROM refs WHERE view_path = ?", stale)
+                self._db.commit()
+        return len(stale)
+
+    def gc(self, dry_run=False):
+        """
+        Prune stale references, then delete blobs nothing refers to any more.
+        Returns (blobs_removed, bytes_freed).
+        """
+        self.prune_refs()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT digest, size FROM blobs WHERE digest NOT IN (SELECT digest FROM refs)"
+            ).fetchall()
+        removed, freed = 0, 0
+        for digest, size in rows:
+            if not dry_run:
+                try:
+                    os.remove(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                with self._lock:
+                    self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                    self._db.commit()
+            removed += 1
+            freed += size
+        # Leftovers from writes interrupted before ingest(); recent ones may
+        # still belong to a running save
+        if not dry_run:
+            cutoff = time.time() - TMP_MAX_AGE
+            with os.scandir(self.tmp_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        return removed, freed
+
+    def stats(self):
+        with self._lock:
+            blobs, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            refs = self._db.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        return {'blobs': blobs, 'bytes': size, 'refs': refs}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
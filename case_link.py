@@ -3,10 +3,11 @@ import datetime
 import re
 import pythoncom
 import win32com.client
+import outlook_broker
 import pandas as pd
 import nest_asyncio
 import json
-import requests
+import link_downloader
 from flask import Flask, render_template, request, redirect, url_for, flash
 from flask_socketio import SocketIO
 from threading import Thread
@@ -26,6 +27,9 @@ with open('config.json', 'r') as f:
 DEFAULT_SAVE_PATH = config.get('DEFAULT_SAVE_PATH', 'path_to_default_folder')
 LOG_FILE_PATH = config.get('LOG_FILE_PATH', 'logs.txt')
 EXCEL_FILE_PATH = config.get('EXCEL_FILE_PATH', 'email_summary.xlsx')
+LINK_CACHE_PATH = config.get('LINK_CACHE_PATH', link_downloader.CACHE_NAME)
+
+_link_downloader = None
 
 def sanitize_filename(filename):
     allowable_chars = re.compile(r'[^a-zA-Z0-9\s\-\_\.\+\%\(\)\|]')
@@ -188,28 +192,37 @@ def save_email(item, save_path, special_case):
     item.SaveAs(os.path.join(save_path, filename), 3)
     return filename
 
-def download_report_from_link(email_body, save_path):
-    link_pattern = re.compile(r'(https?://[^\s]+)')
-    match = link_pattern.search(email_body)
-    if match:
-        url = match.group(0)
-        response = requests.get(url)
-        if response.status_code == 200:
-            content_disposition = response.headers.get('content-disposition')
-            if content_disposition:
-                filename = re.findall('filename="(.+)"', content_disposition)
-                if filename:
-                    filename = sanitize_filename(filename[0])
-                else:
-                    filename = sanitize_filename(url.split("/")[-1])
-            else:
-                filename = sanitize_filename(url.split("/")[-1])
-            
-            file_path = os.path.join(save_path, filename)
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
-            return filename
-    return None
+def get_link_downloader():
+    global _link_downloader
+    if _link_downloader is None:
+        _link_downloader = link_downloader.LinkDownloader(LINK_CACHE_PATH, sanitize=sanitize_filename)
+    return _link_downloader
+
+def download_report_from_link(email_body, save_path, context=None):
+    """
+    Queue the first link in email_body for download into save_path. Returns the
+    URL, or None when the body has no link; results come from drain_downloads().
+    """
+    url = link_downloader.find_report_link(email_body)
+    if url:
+        get_link_downloader().submit(url, save_path, context)
+    return url
+
+def drain_downloads():
+    """
+    Wait for the queued link downloads; returns (logs, failed_emails).
+    """
+    logs = []
+    failed_emails = []
+    for result in get_link_downloader().drain():
+        sender_email, subject = result.context
+        if result.ok:
+            source = " (cached)" if result.cached else " (resumed)" if result.resumed else ""
+            logs.append(f"Downloaded: {result.filename} from link in email body to {result.save_path}{source}")
+        else:
+            logs.append(f"Failed to download report from {result.url} for email with subject '{subject}': {result.error}")
+            failed_emails.append({'email_address': sender_email, 'subject': subject})
+    return logs, failed_emails
 
 def process_email(item, sender_path_table, default_year, specific_date_str):
     logs = []
@@ -234,9 +247,10 @@ def process_email(item, sender_path_table, default_year, specific_date_str):
                 save_path = os.path.join(DEFAULT_SAVE_PATH, specific_date_str)  # Use specific date folder in default path
 
             if link_download.lower() == 'yes':
-                filename = download_report_from_link(item.Body, save_path)
-                if filename:
-                    logs.append(f"Downloaded: {filename} from link in email body to {save_path}")
+                # The download itself runs in the background; see drain_downloads()
+                url = download_report_from_link(item.Body, save_path, (sender_email, item.Subject))
+                if url:
+                    logs.append(f"Queued download: {url} to {save_path}")
                 else:
                     logs.append(f"Failed to download report from link in email body for email with subject '{item.Subject}'")
             else:
@@ -260,33 +274,39 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
     logs = []
     pythoncom.CoInitialize()
     specific_date = datetime.datetime.strptime(specific_date_str, '%Y-%m-%d').date()
-    outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
-    inbox = None
-
-    for store in outlook.Stores:
-        if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
-            try:
-                root_folder = store.GetRootFolder()
-                for folder in root_folder.Folders:
-                    if folder.Name.lower() == "inbox":
-                        inbox = folder
+    # A running outlook_broker.py already holds the session and the Inbox
+    broker = outlook_broker.connect()
+    inbox = items = None
+    if broker is not None:
+        items = outlook_broker.inbox_items_on(broker, email_address, specific_date)
+    else:
+        outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+        for store in outlook.Stores:
+            if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
+                try:
+                    root_folder = store.GetRootFolder()
+                    for folder in root_folder.Folders:
+                        if folder.Name.lower() == "inbox":
+                            inbox = folder
+                            break
+                    if inbox is not None:
                         break
-                if inbox is not None:
-                    break
-            except AttributeError as e:
-                logs.append(f"Error accessing inbox: {str(e)}")
-                continue
+                except AttributeError as e:
+                    logs.append(f"Error accessing inbox: {str(e)}")
+                    continue
 
-    if inbox is None:
+    if inbox is None and items is None:
         logs.append(f"No Inbox found for the account with email address: {email_address}")
         pythoncom.CoUninitialize()
         with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
             f.writelines("\n".join(logs))
         return
 
-    items = inbox.Items
-    items.Sort("[ReceivedTime]", True)
-    items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
+    if items is None:
+        items = inbox.Items
+        items.Sort("[ReceivedTime]", True)
+        items = items.Restrict(f"[ReceivedTime] >= '{specific_date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{specific_date.strftime('%m/%d/%Y')} 11:59 PM'")
 
     total_emails = 0
     saved_default = 0
@@ -304,6 +324,10 @@ def save_emails_from_senders_on_date(email_address, specific_date_str, sender_pa
         else:
             saved_actual += 1
 
+    download_logs, download_failed_emails = drain_downloads()
+    logs.extend(download_logs)
+    failed_emails.extend(download_failed_emails)
+
     pythoncom.CoUninitialize()
     with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
         f.writelines("\n".join(logs))
@@ -4,6 +4,8 @@ import pythoncom
 import win32com.client
 import pandas as pd
 import unicodedata
+import json
+import re
 
 # Hardcoded configuration for file paths and Outlook email account
 CSV_FILE_PATH = "C:/path/to/your/sender_info.csv"    # <-- Update with your CSV file path
@@ -12,16 +14,107 @@ NEW_SENDERS_CSV = "C:/path/to/output/new_senders.csv"  # <-- Update with your de
 
 LOG_FILE_PATH = "logs.txt"  # You can also hardcode the logs file path if desired
 
+# Window of ReceivedTimes already scanned per account/folder ({'low', 'high'}),
+# so repeated runs only look at new mail
+WATERMARK_FILE = "new_senders_watermark.json"
+WATERMARK_FORMAT = '%Y-%m-%d %H:%M:%S'
+
 def sanitize_filename(filename):
     """Sanitize a filename by removing or replacing problematic characters."""
     sanitized = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode('ASCII')
     sanitized = ''.join(c if c.isalnum() or c in (' ', '.', '_') else '_' for c in sanitized)
     return sanitized.strip()[:255]
 
-def extract_emails_for_range(email_address, start_date_str, end_date_str, sender_path_table):
+def normalize_text(value):
+    return unicodedata.normalize('NFKD', value).encode('ASCII', 'ignore').decode('ASCII')
+
+def load_watermarks():
+    if os.path.exists(WATERMARK_FILE):
+        with open(WATERMARK_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_watermarks(watermarks):
+    tmp_path = WATERMARK_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_path, WATERMARK_FILE)
+
+def merge_watermark(window, low, high):
+    """
+    The scanned window after scanning low..high: the union with window when the
+    two overlap, otherwise whichever reaches later (a gap between them was never
+    scanned, so they cannot be joined).
+    """
+    if isinstance(window, dict) and window.get('low') <= high and low <= window.get('high'):
+        return {'low': min(window['low'], low), 'high': max(window['high'], high)}
+    if isinstance(window, dict) and window.get('high') > high:
+        return window
+    return {'low': low, 'high': high}
+
+def build_coper_scanner(coper_names):
+    """
+    Return a function mapping a lower-cased subject to the set of coper names it
+    contains, using one compiled alternation scanned once per subject.
+    """
+    names = sorted({name for name in coper_names if name}, key=len, reverse=True)
+    if not names:
+        return lambda subject: set()
+    # A zero-width lookahead reports a match at every position, and with the longest
+    # names first it is the longest name starting there. Any other name matching at
+    # the same position is a prefix of that one, so prefix sets recover them all.
+    pattern = re.compile('(?=(' + '|'.join(re.escape(name) for name in names) + '))')
+    name_set = set(names)
+    prefixes = {name: {name[:i] for i in range(1, len(name) + 1)} & name_set for name in names}
+
+    def scan(subject):
+        found = set()
+        for match in pattern.finditer(subject):
+            found |= prefixes[match.group(1)]
+        return found
+
+    return scan
+
+def find_new_senders(extracted_df, sender_path_table):
+    """
+    Return [{'sender', 'subject'}] for senders missing from the table, or whose
+    table rows all carry a coper_name that none of their subjects mention.
+    One entry per sender, with the first subject seen (extraction order).
+    """
+    table = pd.DataFrame({
+        'sender': sender_path_table['sender'],
+        'coper_name': sender_path_table['coper_name'] if 'coper_name' in sender_path_table.columns else '',
+    })
+    table['coper_name'] = table['coper_name'].fillna('').astype(str).str.strip().str.lower()
+    table.loc[table['coper_name'] == 'nan', 'coper_name'] = ''
+
+    known_senders = set(table['sender'])
+    # Senders with at least one row without a coper_name accept every subject
+    unrestricted_senders = set(table.loc[table['coper_name'] == '', 'sender'])
+
+    emails = extracted_df.reset_index(drop=True)
+    emails['subject'] = emails['subject'].fillna('')
+    is_known = emails['sender_email'].isin(known_senders)
+    needs_coper = is_known & ~emails['sender_email'].isin(unrestricted_senders)
+
+    candidates = emails[needs_coper]
+    coper_match = pd.Series(False, index=emails.index)
+    if not candidates.empty:
+        scan = build_coper_scanner(table['coper_name'])
+        found = candidates['subject'].str.lower().map(scan).rename('coper_name')
+        pairs = candidates[['sender_email']].join(found).explode('coper_name').dropna(subset=['coper_name'])
+        matched = pairs.reset_index().merge(
+            table[['sender', 'coper_name']],
+            left_on=['sender_email', 'coper_name'], right_on=['sender', 'coper_name'],
+        )
+        coper_match.loc[matched['index'].unique()] = True
+
+    new_rows = emails[~is_known | (needs_coper & ~coper_match)]
+    new_rows = new_rows.drop_duplicates(subset=['sender_email'])
+    return [{'sender': sender, 'subject': subject} for sender, subject in zip(new_rows['sender_email'], new_rows['subject'])]
+
+def extract_emails_for_range(email_address, start_date_str, end_date_str, sender_path_table, use_watermark=True):
     logs = []
-    new_senders = []
-    new_sender_emails = set()
 
     pythoncom.CoInitialize()
     try:
@@ -68,20 +161,36 @@ def extract_emails_for_range(email_address, start_date_str, end_date_str, sender
     if nav_perf_folder:
         folders_to_process.append(nav_perf_folder)
 
-    # Build a date filter for the specified date range
-    date_filter = (
-        f"[ReceivedTime] >= '{start_date.strftime('%m/%d/%Y')} 12:00 AM' AND "
-        f"[ReceivedTime] <= '{end_date.strftime('%m/%d/%Y')} 11:59 PM'"
-    )
+    watermarks = load_watermarks()
 
     all_items = []
+    folder_keys = {}
+    scan_starts = {}
+    range_start = datetime.datetime.combine(start_date, datetime.time()).strftime(WATERMARK_FORMAT)
     for folder in folders_to_process:
+        # Build a date filter for the specified date range, starting after the
+        # last email a previous run already looked at in this folder
+        folder_key = f"{email_address.lower()}|{folder.Name.lower()}"
+        scan_start = range_start
+        window = watermarks.get(folder_key) if use_watermark else None
+        # Only skip ahead when an earlier run scanned everything from the start of
+        # this range up to its high mark; windows saved by older versions (a bare
+        # timestamp) do not say where they started, so they are not trusted
+        if isinstance(window, dict) and window['low'] <= range_start <= window['high']:
+            scan_start = window['high']
+        scan_starts[folder_key] = scan_start
+        start_filter = datetime.datetime.strptime(scan_start, WATERMARK_FORMAT).strftime('%m/%d/%Y %I:%M %p')
+        date_filter = (
+            f"[ReceivedTime] >= '{start_filter}' AND "
+            f"[ReceivedTime] <= '{end_date.strftime('%m/%d/%Y')} 11:59 PM'"
+        )
         try:
             items = folder.Items
             items.Sort("[ReceivedTime]", True)
             restricted_items = items.Restrict(date_filter)
             for item in restricted_items:
                 all_items.append(item)
+                folder_keys[id(item)] = folder_key
         except Exception as e:
             logs.append(f"Error processing folder {folder.Name}: {str(e)}")
 
@@ -90,53 +199,33 @@ def extract_emails_for_range(email_address, start_date_str, end_date_str, sender
 
     # Normalize the 'sender' column in the CSV
     sender_path_table['sender'] = sender_path_table['sender'].astype(str).str.strip()
-    sender_path_table['sender'] = sender_path_table['sender'].apply(
-        lambda x: unicodedata.normalize('NFKD', x).encode('ASCII', 'ignore').decode('ASCII').lower()
-    )
+    sender_path_table['sender'] = sender_path_table['sender'].map(normalize_text).str.lower()
 
     extracted_emails = []
+    newest_received = {}
     for item in all_items:
         try:
             sender_email = (item.SenderEmailAddress if hasattr(item, 'SenderEmailAddress')
                             else item.Sender.Address)
-            sender_email = sender_email.strip().lower()
-            sender_email = unicodedata.normalize('NFKD', sender_email).encode('ASCII', 'ignore').decode('ASCII')
+            sender_email = normalize_text(sender_email.strip().lower())
             subject = item.Subject
             extracted_emails.append({'sender_email': sender_email, 'subject': subject})
+
+            received = item.ReceivedTime.strftime(WATERMARK_FORMAT)
+            folder_key = folder_keys[id(item)]
+            if received > newest_received.get(folder_key, ''):
+                newest_received[folder_key] = received
         except Exception as e:
             logs.append(f"Error processing email: {str(e)}")
             continue
 
     # Remove duplicate email records
-    extracted_df = pd.DataFrame(extracted_emails)
+    extracted_df = pd.DataFrame(extracted_emails, columns=['sender_email', 'subject'])
     extracted_df.drop_duplicates(subset=['sender_email', 'subject'], inplace=True)
+    logs.append(f"Checked {len(extracted_df)} unique sender/subject pairs from {len(all_items)} emails.")
 
     # Compare extracted emails against the CSV data
-    for idx, row in extracted_df.iterrows():
-        sender_email = row['sender_email']
-        subject = row['subject']
-        subject_lower = subject.lower() if subject else ''
-
-        matching_rows = sender_path_table[sender_path_table['sender'] == sender_email]
-        if matching_rows.empty:
-            if sender_email not in new_sender_emails:
-                new_sender_emails.add(sender_email)
-                new_senders.append({'sender': sender_email, 'subject': subject})
-            continue
-        else:
-            is_known_sender = False
-            for _, db_row in matching_rows.iterrows():
-                coper_name = str(db_row.get('coper_name', '')).strip().lower()
-                if not coper_name or pd.isna(coper_name) or coper_name == 'nan':
-                    is_known_sender = True
-                    break
-                elif coper_name in subject_lower:
-                    is_known_sender = True
-                    break
-            if not is_known_sender:
-                if sender_email not in new_sender_emails:
-                    new_sender_emails.add(sender_email)
-                    new_senders.append({'sender': sender_email, 'subject': subject})
+    new_senders = find_new_senders(extracted_df, sender_path_table)
 
     # Save new senders to CSV at the hardcoded path
     if new_senders:
@@ -150,6 +239,14 @@ def extract_emails_for_range(email_address, start_date_str, end_date_str, sender
         else:
             new_senders_df.to_csv(NEW_SENDERS_CSV, index=False)
 
+    # Extend each folder's scanned window by what this run covered: from where it
+    # started to the newest email it saw
+    new_watermarks = dict(watermarks)
+    for folder_key, high in newest_received.items():
+        low = min(scan_starts[folder_key], high)
+        new_watermarks[folder_key] = merge_watermark(watermarks.get(folder_key), low, high)
+    save_watermarks(new_watermarks)
+
     # Save logs to file
     with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
         f.write("\n".join(logs))
@@ -188,8 +285,10 @@ def main():
             print("Error reading the CSV file. Please ensure it's properly formatted.")
             return
 
+    use_watermark = input("Skip emails already checked by a previous run? (Y/n): ").strip().upper() != "N"
+
     # Execute the email extraction process
-    extract_emails_for_range(email_address, start_date_str, end_date_str, sender_path_table)
+    extract_emails_for_range(email_address, start_date_str, end_date_str, sender_path_table, use_watermark)
 
     # Display logs
     if os.path.exists(LOG_FILE_PATH):
@@ -0,0 +1,113 @@
+import argparse
+import datetime
+import os
+import sys
+
+import email_core
+
+# Command-line entry point over email_core. Only argparse and the core module are
+# imported up front; pandas/pywin32 load once a run actually starts.
+#
+#   python email_cli.py run --date 2024-05-31 --default-year 2024 --csv senders.csv
+#   python email_cli.py redrive --csv senders.csv
+#   python email_cli.py blob-gc --blob-store Z:\\Reports\\.blobs
+
+def add_common_arguments(parser):
+    parser.add_argument('--csv', required=True, help="Path to the sender path table CSV.")
+    parser.add_argument('--default-save-path', default=None, help="Override DEFAULT_SAVE_PATH from config.json.")
+    parser.add_argument('--staging-dir', default=None, help="Save to this local directory first and move files to the share in the background.")
+    parser.add_argument('--redrive-db', default=None, help="Override REDRIVE_DB_PATH (the queue of emails that failed with COM errors).")
+    parser.add_argument('--blob-store', default=None, help="Override BLOB_STORE_DIR (content-addressed store for special-case saves).")
+    parser.add_argument('--broker', default=None, help="Use the outlook_broker.py listening at this address (host:port) instead of opening Outlook.")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Save Outlook emails to the folders listed in the sender path CSV.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Save the emails received on one or more dates.")
+    dates = run.add_mutually_exclusive_group(required=True)
+    dates.add_argument('--date', help="Single date to process (YYYY-MM-DD).")
+    dates.add_argument('--range', nargs=2, metavar=('START', 'END'), help="Inclusive date range to process (YYYY-MM-DD YYYY-MM-DD).")
+    dates.add_argument('--yesterday', action='store_true', help="Process yesterday's emails.")
+    run.add_argument('--default-year', required=True, help="Year (YYYY) used when none can be read from the subject.")
+    run.add_argument('--account', default='hf_data@bofa.com', help="Display name / address of the Outlook store.")
+    run.add_argument('--folder', default=None, help="Inbox subfolder to process alongside the Inbox (e.g. 'NAV and Performance').")
+    add_common_arguments(run)
+
+    redrive = commands.add_parser('redrive', help="Retry only the emails queued after COM errors.")
+    redrive.add_argument('--date', default=None, help="Only redrive failures from this processing date (YYYY-MM-DD).")
+    redrive.add_argument('--include-dead', action='store_true', help="Also retry emails that ran out of redrive attempts.")
+    add_common_arguments(redrive)
+
+    blob_gc = commands.add_parser('blob-gc', help="Delete stored blobs no routed file links to any more.")
+    blob_gc.add_argument('--blob-store', default=None, help="Store to collect (defaults to BLOB_STORE_DIR).")
+    blob_gc.add_argument('--dry-run', action='store_true', help="Only report what would be deleted.")
+    return parser
+
+def resolve_dates(args):
+    if args.yesterday:
+        return [(datetime.date.today() - datetime.timedelta(days=1)).strftime('%Y-%m-%d')]
+    if args.range:
+        return email_core.date_range(*args.range)
+    datetime.datetime.strptime(args.date, '%Y-%m-%d')
+    return [args.date]
+
+def apply_settings(args):
+    if args.default_save_path:
+        email_core.configure(DEFAULT_SAVE_PATH=args.default_save_path)
+    if args.staging_dir:
+        email_core.configure(STAGING_DIR=args.staging_dir)
+    if args.redrive_db:
+        email_core.configure(REDRIVE_DB_PATH=args.redrive_db)
+    if args.blob_store:
+        email_core.configure(BLOB_STORE_DIR=args.blob_store)
+    if args.broker:
+        email_core.configure(BROKER_ADDRESS=args.broker)
+
+def run_command(parser, args):
+    try:
+        date_list = resolve_dates(args)
+    except ValueError as e:
+        parser.error(f"Invalid date: {e}")
+    if not (args.default_year.isdigit() and len(args.default_year) == 4):
+        parser.error("Invalid year format. Please enter a year in YYYY format.")
+
+    sender_path_table = email_core.load_sender_path_table(args.csv)
+    os.makedirs(email_core.DEFAULT_SAVE_PATH, exist_ok=True)
+
+    email_core.save_emails_for_dates(args.account, date_list, sender_path_table, args.default_year, args.folder)
+    print(f"Processing complete. Check {email_core.LOG_FILE_PATH} and {email_core.EXCEL_FILE_PATH} for details.")
+    return 0
+
+def redrive_command(parser, args):
+    sender_path_table = email_core.load_sender_path_table(args.csv)
+    redriven, remaining = email_core.redrive_queued(sender_path_table, date_str=args.date, include_dead=args.include_dead)
+    print(f"Redriven: {redriven}, still queued: {remaining}. Check {email_core.LOG_FILE_PATH} for details.")
+    return 0 if remaining == 0 else 1
+
+def blob_gc_command(parser, args):
+    if args.blob_store:
+        email_core.configure(BLOB_STORE_DIR=args.blob_store)
+    blobs = email_core.get_blob_store()
+    if blobs is None:
+        parser.error("No blob store configured; pass --blob-store or set BLOB_STORE_DIR in config.json.")
+    removed, freed = blobs.gc(dry_run=args.dry_run)
+    action = "Would remove" if args.dry_run else "Removed"
+    print(f"{action} {removed} unreferenced blob(s), {freed / (1024 * 1024):.1f} MB.")
+    return 0
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'blob-gc':
+        return blob_gc_command(parser, args)
+    if not os.path.exists(args.csv):
+        parser.error(f"CSV file not found: {args.csv}")
+    apply_settings(args)
+
+    if args.command == 'redrive':
+        return redrive_command(parser, args)
+    return run_command(parser, args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,873 @@
+import os
+import re
+import json
+import time
+import datetime
+import mimetypes
+import importlib
+import unicodedata
+import metrics
+
+# Shared core for the Outlook email savers (app_3.0.py, QZ_Email.py, DZQ.py and
+# email_cli.py). pandas, openpyxl, dateparser and pywin32 are only imported the
+# first time they are actually needed, so `--help` and small runs start quickly.
+
+def _load_config(path='config.json'):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+config = _load_config()
+
+DEFAULT_SAVE_PATH = config.get('DEFAULT_SAVE_PATH', 'path_to_default_folder')
+LOG_FILE_PATH = config.get('LOG_FILE_PATH', 'logs.txt')
+EXCEL_FILE_PATH = config.get('EXCEL_FILE_PATH', 'email_summary.xlsx')
+# Set to False to skip the dateparser fallback (and its slow import) entirely
+USE_DATEPARSER = config.get('USE_DATEPARSER', True)
+# Local directory to SaveAs into before files are moved to the share (see staging.py);
+# None saves straight to the routed path
+STAGING_DIR = config.get('STAGING_DIR')
+# Persistent queue of COM failures (see redrive.py) and how long a run may wait
+# at the end for their backoff before leaving them to `email_cli.py redrive`
+REDRIVE_DB_PATH = config.get('REDRIVE_DB_PATH', 'redrive_queue.sqlite3')
+REDRIVE_INLINE_SECONDS = config.get('REDRIVE_INLINE_SECONDS', 60)
+# Run summaries are appended here (see summary_store.py); EXCEL_FILE_PATH is built from it
+SUMMARY_DB_PATH = config.get('SUMMARY_DB_PATH', 'email_summary.sqlite3')
+# Address of a running outlook_broker.py to use instead of opening Outlook in
+# this process; None (or no broker listening) falls back to a direct session
+BROKER_ADDRESS = config.get('BROKER_ADDRESS')
+# Hex broker key; None reads the per-user key file written by outlook_broker.py serve
+BROKER_AUTHKEY = config.get('BROKER_AUTHKEY')
+# Content-addressed store for the report attachments of special-case saves (see
+# blob_store.py); should sit on the same share as the routed folders so views can
+# be hardlinks. None disables it
+BLOB_STORE_DIR = config.get('BLOB_STORE_DIR')
+
+_SETTINGS = ('DEFAULT_SAVE_PATH', 'LOG_FILE_PATH', 'EXCEL_FILE_PATH', 'USE_DATEPARSER', 'STAGING_DIR',
+             'REDRIVE_DB_PATH', 'REDRIVE_INLINE_SECONDS', 'SUMMARY_DB_PATH', 'BLOB_STORE_DIR',
+             'BROKER_ADDRESS', 'BROKER_AUTHKEY')
+
+_staging_mover = None
+_fs_cache = None
+_redrive_queue = None
+_circuit_breaker = None
+_summary_store = None
+_blob_store = None
+_broker = None
+
+def configure(**settings):
+    """
+    Override module settings (see _SETTINGS) for this process.
+    """
+    for name, value in settings.items():
+        if name not in _SETTINGS:
+            raise KeyError(f"Unknown setting: {name}")
+        globals()[name] = value
+
+def get_staging_mover():
+    """
+    Return the process-wide StagingMover when STAGING_DIR is set, creating it
+    (and re-queuing anything a previous run left behind) on first use.
+    """
+    global _staging_mover
+    if not STAGING_DIR:
+        return None
+    if _staging_mover is None or _staging_mover.staging_dir != STAGING_DIR:
+        import staging
+        _staging_mover = staging.StagingMover(STAGING_DIR)
+        _staging_mover.recover()
+    return _staging_mover
+
+def get_fs_cache():
+    global _fs_cache
+    if _fs_cache is None:
+        import fs_cache
+        _fs_cache = fs_cache.DirectoryCache()
+    return _fs_cache
+
+def reset_fs_cache():
+    """
+    Drop cached directory listings; called at the start of every run so changes
+    made on the share between runs are picked up.
+    """
+    global _fs_cache
+    _fs_cache = None
+
+def get_redrive_queue():
+    global _redrive_queue
+    if _redrive_queue is None or _redrive_queue.db_path != REDRIVE_DB_PATH:
+        import redrive
+        _redrive_queue = redrive.RedriveQueue(REDRIVE_DB_PATH)
+    return _redrive_queue
+
+def get_circuit_breaker():
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        import redrive
+        _circuit_breaker = redrive.CircuitBreaker()
+    return _circuit_breaker
+
+def get_summary_store():
+    """
+    Return the summary store, importing an existing EXCEL_FILE_PATH into it the
+    first time so earlier history is not lost.
+    """
+    global _summary_store
+    if _summary_store is None or _summary_store.db_path != SUMMARY_DB_PATH:
+        import summary_store
+        _summary_store = summary_store.SummaryStore(SUMMARY_DB_PATH)
+        if _summary_store.is_empty() and os.path.exists(EXCEL_FILE_PATH):
+            _summary_store.import_xlsx(EXCEL_FILE_PATH)
+    return _summary_store
+
+def get_blob_store():
+    global _blob_store
+    if not BLOB_STORE_DIR:
+        return None
+    if _blob_store is None or _blob_store.root != BLOB_STORE_DIR:
+        import blob_store
+        _blob_store = blob_store.BlobStore(BLOB_STORE_DIR)
+    return _blob_store
+
+def get_broker():
+    """
+    Return a connected outlook_broker client when BROKER_ADDRESS is set and a
+    broker is listening there, else None.
+    """
+    global _broker
+    if not BROKER_ADDRESS:
+        return None
+    if _broker is None:
+        import outlook_broker
+        _broker = outlook_broker.connect(BROKER_ADDRESS, bytes.fromhex(BROKER_AUTHKEY) if BROKER_AUTHKEY else None)
+        if _broker is None:
+            print(f"No Outlook broker at {BROKER_ADDRESS}; opening Outlook directly.")
+    return _broker
+
+def _pandas():
+    return importlib.import_module('pandas')
+
+def _openpyxl():
+    return importlib.import_module('openpyxl')
+
+def _pythoncom():
+    return importlib.import_module('pythoncom')
+
+def _win32com_client():
+    return importlib.import_module('win32com.client')
+
+def _com_errors():
+    """
+    Exception types meaning Outlook failed the call: pywin32's com_error, plus
+    the same errors relayed by the broker.
+    """
+    import outlook_broker
+    try:
+        return (_pythoncom().com_error, outlook_broker.RemoteComError)
+    except ImportError:
+        return (outlook_broker.RemoteComError,)
+
+def sanitize_filename(filename):
+    # Normalize unicode characters to their closest ASCII equivalent (e.g., é -> e)
+    normalized_filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode('ASCII')
+
+    # Replace common problematic characters with underscores or remove them
+    sanitized = re.sub(r'[<>:"/\\|?*\[\]\'`~!@#$%^&*()+={};,]', '_', normalized_filename)
+
+    # Replace dots (.) followed by a space or end of the string with an underscore, except for file extensions
+    sanitized = re.sub(r'\.(?=\s|$)', '_', sanitized)
+
+    # Replace multiple underscores with a single underscore
+    sanitized = re.sub(r'_+', '_', sanitized)
+
+    # Trim leading and trailing underscores or spaces
+    sanitized = sanitized.strip(' _')
+
+    # Limit filename length (255 chars total)
+    sanitized = sanitized[:255]
+
+    return sanitized
+
+def extract_date_from_text(text, default_year=None, use_dateparser=None):
+    if use_dateparser is None:
+        use_dateparser = USE_DATEPARSER
+
+    # Map quarters to months
+    quarter_mappings = {
+        '1': '03-March', '2': '06-June', '3': '09-September', '4': '12-December',
+        'Q1': '03-March', 'Q2': '06-June', 'Q3': '09-September', 'Q4': '12-December',
+    }
+
+    # Normalize separators
+    text = text.replace("'", "").replace(",", " ").replace("-", " ").replace("/", " ").replace(".", " ")
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+
+    patterns = [
+        r'(?i)\b(?:on|as of|for)?\s*(\d{1,2})?\s*(January|February|March|April|May|June|July|August|September|October|November|December|'
+        r'Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\s*(\d{4}|\d{2})?\b',
+        r'\b(\d{4})\s+(\d{1,2})\b',
+        r'\b(\d{1,2})\s+(\d{4})\b',
+        r'\b(\d{4})(\d{2})\b',
+        r'\b(\d{2})(\d{4})\b',
+        r'\b(Q[1-4]|[1-4]Q)[\s]*(\d{2,4})\b',
+        r'\b(\d{1,2})\s+(\d{1,2})\s+(\d{2,4})\b',
+        r'\b(\d{2,4})\s+(\d{1,2})\s+(\d{1,2})\b',
+    ]
+
+    def try_parsing_with_formats(date_str, formats):
+        for fmt in formats:
+            try:
+                parsed_date = datetime.datetime.strptime(date_str, fmt)
+                month_num = parsed_date.strftime('%m')
+                month_name = parsed_date.strftime('%B')
+                year = parsed_date.strftime('%Y')
+                return year, f"{month_num}-{month_name}"
+            except ValueError:
+                continue
+        return None, None
+
+    # Try regex-based patterns first
+    for pattern in patterns:
+        matches = re.findall(pattern, text)
+        if not matches:
+            continue
+
+        for match in matches:
+            # Month name pattern
+            if len(match) == 3 and re.match(
+                r'(?i)^(January|February|March|April|May|June|July|August|September|October|November|December|'
+                r'Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)$',
+                match[1]
+            ):
+                day, month_str, year = match
+                day = day.strip() if day else '1'
+                year = year.strip() if year else default_year
+                if year:
+                    if len(year) == 2:
+                        year = '20' + year
+                    date_str = f"{day} {month_str} {year}"
+                    year_parsed, month_parsed = try_parsing_with_formats(date_str, ['%d %B %Y', '%d %b %Y'])
+                    if year_parsed and month_parsed:
+                        return year_parsed, month_parsed
+
+            # YYYY MM or MM YYYY patterns
+            elif len(match) == 2 and all(part.isdigit() for part in match):
+                part1, part2 = match
+                # YYYY MM
+                if len(part1) == 4:
+                    date_str = f"{part1} {part2}"
+                    year_parsed, month_parsed = try_parsing_with_formats(date_str, ['%Y %m'])
+                    if year_parsed and month_parsed:
+                        return year_parsed, month_parsed
+                # MM YYYY
+                elif len(part2) == 4:
+                    date_str = f"{part1} {part2}"
+                    year_parsed, month_parsed = try_parsing_with_formats(date_str, ['%m %Y'])
+                    if year_parsed and month_parsed:
+                        return year_parsed, month_parsed
+
+            # Compact YYYYMM or MMYYYY
+            elif len(match) == 2 and all(part.isdigit() for part in match) and (len(match[0]) == 4 or len(match[1]) == 4):
+                part1, part2 = match
+                # YYYYMM
+                if len(part1) == 4 and len(part2) == 2:
+                    date_str = f"{part1}{part2}"
+                    try:
+                        parsed_date = datetime.datetime.strptime(date_str, '%Y%m')
+                        month_num = parsed_date.strftime('%m')
+                        month_name = parsed_date.strftime('%B')
+                        year = parsed_date.strftime('%Y')
+                        return year, f"{month_num}-{month_name}"
+                    except ValueError:
+                        pass
+                # MMYYYY
+                if len(part1) == 2 and len(part2) == 4:
+                    date_str = f"{part2}{part1}"
+                    try:
+                        parsed_date = datetime.datetime.strptime(date_str, '%Y%m')
+                        month_num = parsed_date.strftime('%m')
+                        month_name = parsed_date.strftime('%B')
+                        year = parsed_date.strftime('%Y')
+                        return year, f"{month_num}-{month_name}"
+                    except ValueError:
+                        pass
+
+            # Quarter patterns
+            if len(match) == 2 and any('Q' in m for m in match):
+                quarter_str, year = match
+                quarter = re.sub(r'[^1-4]', '', quarter_str)
+                if not quarter:
+                    continue
+                year = year.strip()
+                if len(year) == 2:
+                    year = '20' + year
+                if year and quarter in quarter_mappings:
+                    return year, quarter_mappings[quarter]
+
+            # Numeric date patterns (DD MM YYYY, YYYY MM DD, etc.)
+            if len(match) == 3 and all(part.isdigit() for part in match):
+                part1, part2, part3 = match
+                candidates = [
+                    (f"{part1}-{part2}-{part3}", ['%d-%m-%Y', '%d-%m-%y', '%Y-%m-%d', '%y-%m-%d']),
+                    (f"{part1}/{part2}/{part3}", ['%d/%m/%Y', '%d/%m/%y', '%Y/%m/%d', '%y/%m/%d']),
+                    (f"{part1} {part2} {part3}", ['%d %m %Y', '%d %m %y', '%Y %m %d', '%y %m %d', '%m %d %Y', '%m %d %y']),
+                ]
+                for date_str, fmt_list in candidates:
+                    for fmt in fmt_list:
+                        try:
+                            parsed_date = datetime.datetime.strptime(date_str, fmt)
+                            month_num = parsed_date.strftime('%m')
+                            month_name = parsed_date.strftime('%B')
+                            year_val = parsed_date.strftime('%Y')
+                            return year_val, f"{month_num}-{month_name}"
+                        except ValueError:
+                            continue
+
+    # Fallback to dateparser; its language data is the slowest import we have,
+    # so it is only loaded when the regex patterns above found nothing
+    if use_dateparser:
+        try:
+            date_parse = importlib.import_module('dateparser').parse
+        except ImportError:
+            date_parse = None
+        if date_parse is not None:
+            parsed_date = date_parse(text, settings={'REQUIRE_PARTS': ['year', 'month'], 'PREFER_DATES_FROM': 'past'})
+            if parsed_date:
+                year = parsed_date.strftime('%Y')
+                month_num = parsed_date.strftime('%m')
+                month_name = parsed_date.strftime('%B')
+                if not year and default_year:
+                    year = default_year
+                return year, f"{month_num}-{month_name}"
+            return default_year, None
+
+    # Fallback: search manually for month names and 4-digit year
+    month_names = {
+        "january": "01-January", "february": "02-February", "march": "03-March",
+        "april": "04-April", "may": "05-May", "june": "06-June", "july": "07-July",
+        "august": "08-August", "september": "09-September", "october": "10-October",
+        "november": "11-November", "december": "12-December"
+    }
+    found_month = None
+    for key, value in month_names.items():
+        if key in text.lower():
+            found_month = value
+            break
+    year_match = re.search(r'\b(\d{4})\b', text)
+    if found_month and year_match:
+        return year_match.group(1), found_month
+
+    # If no date found
+    return default_year, None
+
+def find_save_path(sender, subject, sender_path_table):
+    # Check if the sender exists in the CSV file
+    rows = sender_path_table[sender_path_table['sender'].str.lower() == sender.lower()]
+
+    # If the sender is not found in the CSV, treat it as a default path email
+    if rows.empty:
+        return None, None, False, 'default'
+
+    # If multiple entries, apply coper_name logic
+    if len(rows) > 1:
+        for _, row in rows.iterrows():
+            coper_name = str(row.get('coper_name', '')).strip().lower()
+            if coper_name and coper_name in subject.lower():
+                keywords = str(row.get('keywords', '')).split(';')
+                for keyword in keywords:
+                    if keyword.lower() in subject.lower():
+                        keyword_path = row.get('keyword_path', '')
+                        return keyword_path, False, True, 'keyword'
+                save_path = row.get('save_path', '')
+                return save_path, False, True, 'csv'
+        return None, None, False, 'default'
+    else:
+        row = rows.iloc[0]
+        keywords = str(row.get('keywords', '')).split(';')
+        for keyword in keywords:
+            if keyword.lower() in subject.lower():
+                keyword_path = row.get('keyword_path', '')
+                return keyword_path, False, True, 'keyword'
+        special_case_value = str(row.get('special_case', '')).strip().lower() == 'yes'
+        save_path = row.get('save_path', '')
+        return save_path, special_case_value, True, 'special_case' if special_case_value else 'csv'
+
+def update_excel_summary(date_str, total_emails, saved_default, saved_actual, not_saved, failed_emails):
+    # Appends to the summary store only; call export_excel_summary() once the run
+    # is over to rebuild EXCEL_FILE_PATH
+    get_summary_store().record_day(date_str, total_emails, saved_default, saved_actual, not_saved, failed_emails)
+
+def export_excel_summary():
+    get_summary_store().export_xlsx(EXCEL_FILE_PATH)
+
+def _link_report_attachment(item, report_attachment, save_path, blobs, fs_cache):
+    """
+    Put the report attachment of a special-case email in the blob store, keyed by
+    its own bytes, and link it into save_path under its file name. Resent
+    reports, reply chains and CCs carry the same attachment, so they share one
+    blob; a name already linked to the same report is left as it is.
+    """
+    temp_path = blobs.temp_path(report_attachment['filename'])
+    item.Attachments.Item(report_attachment['index']).SaveAsFile(temp_path)
+    digest = blobs.ingest(temp_path)
+    base, extension = os.path.splitext(sanitize_filename(report_attachment['filename']))
+    view_path = os.path.join(save_path, base + extension)
+    if blobs.ref_digest(view_path) == digest and fs_cache.exists(view_path):
+        return view_path
+    if fs_cache.exists(view_path):
+        _, view_path = fs_cache.unique_path(save_path, base, extension)
+    blobs.link(digest, view_path)
+    fs_cache.add(view_path)
+    return view_path
+
+def save_email(item, save_path, special_case, record=None):
+    mover = get_staging_mover()
+    fs_cache = get_fs_cache()
+    if record is None:
+        record = ItemRecord(item)
+    try:
+        # In staging mode the mover creates the share directory when it moves the file
+        if mover is None:
+            fs_cache.ensure_dir(save_path)
+        
+        report_attachment = record.report_attachment() if special_case else None
+        if report_attachment is not None:
+            filename_base = sanitize_filename(os.path.splitext(report_attachment['filename'])[0])
+        else:
+            filename_base = sanitize_filename(record.subject)
+        
+        extension = ".msg"
+        max_filename_length = 255 - len(save_path) - len(extension) - 1
+        if len(filename_base) > max_filename_length:
+            filename_base = filename_base[:max_filename_length]
+        
+        # Pick a free filename from the cached directory listing
+        filename, full_path = fs_cache.unique_path(
+            save_path, filename_base, extension,
+            reserved=mover.is_reserved if mover is not None else None,
+        )
+        
+        if mover is not None:
+            staged_path = mover.staging_path_for(full_path)
+            try:
+                with metrics.SAVEAS_SECONDS.time():
+                    item.SaveAs(staged_path, 3)
+            except Exception as e:
+                mover.abandon(staged_path, e)
+                raise
+            mover.submit(staged_path, full_path)
+        else:
+            with metrics.SAVEAS_SECONDS.time():
+                item.SaveAs(full_path, 3)
+        fs_cache.add(full_path)
+        blobs = get_blob_store() if report_attachment is not None else None
+        if blobs is not None:
+            _link_report_attachment(item, report_attachment, save_path, blobs, fs_cache)
+        return filename
+    except _com_errors() as com_err:
+        error_message = f"COM Error saving email '{record.subject}' to '{save_path}': {str(com_err)}"
+        print(error_message)
+        raise
+    except Exception as e:
+        error_message = f"General Error saving email '{record.subject}' to '{save_path}': {str(e)}"
+        print(error_message)
+        raise
+
+def _queue_for_redrive(item, sender_email, specific_date_str, default_year, error):
+    """
+    Record a COM failure in the redrive queue; returns the attempt count, or
+    None when the item has no EntryID to find it again by.
+    """
+    try:
+        entry_id = item.EntryID
+        store_id = item.Parent.StoreID
+    except Exception:
+        return None
+    return get_redrive_queue().add(entry_id, store_id, sender_email, item.Subject, specific_date_str, default_year, error)
+
+REPORT_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.pdf', '.doc', '.docx')
+
+class ItemRecord:
+    """
+    Metadata for one email, read from Outlook once and shared by routing and
+    saving. Attachment details are fetched in a single pass the first time
+    anything needs them, instead of once per consumer.
+    """
+
+    def __init__(self, item, sender_email=None):
+        self.item = item
+        self.sender_email = sender_email
+        self.subject = item.Subject
+        self._attachments = None
+
+    @property
+    def attachments(self):
+        """
+        [{'index', 'filename', 'size', 'content_type'}]; index is 1-based as
+        Attachments.Item() expects.
+        """
+        if self._attachments is None:
+            self._attachments = []
+            for index, attachment in enumerate(self.item.Attachments, start=1):
+                filename = attachment.FileName
+                self._attachments.append({
+                    'index': index,
+                    'filename': filename,
+                    'size': attachment.Size,
+                    'content_type': mimetypes.guess_type(filename)[0],
+                })
+        return self._attachments
+
+    def report_attachment(self):
+        """
+        The first attachment with a report extension, which names special-case saves.
+        """
+        return next((a for a in self.attachments if a['filename'].lower().endswith(REPORT_EXTENSIONS)), None)
+
+def sender_address(item):
+    """
+    Return the lower-cased sender address of item, or None when it has none.
+    Raises if Outlook fails to provide the sender.
+    """
+    if hasattr(item, 'SenderEmailAddress') and item.SenderEmailAddress:
+        return item.SenderEmailAddress.lower()
+    if hasattr(item, 'Sender') and item.Sender and hasattr(item.Sender, 'Address') and item.Sender.Address:
+        return item.Sender.Address.lower()
+    return None
+
+def process_email(item, sender_path_table, default_year, specific_date_str, record=None):
+    logs = []
+    failed_emails = []
+    # The scheduler builds the record (with the sender) up front; redrive does not
+    if record is None:
+        record = ItemRecord(item)
+    subject = record.subject
+
+    # Attempt to extract sender email safely
+    sender_email = record.sender_email
+    if sender_email is None:
+        try:
+            sender_email = sender_address(item)
+        except Exception:
+            logs.append(f"Skipped email '{subject}' due to error fetching sender info.")
+            metrics.EMAILS_PROCESSED.inc(route='skipped')
+            return logs, failed_emails
+        if sender_email is None:
+            # If there's no sender info, skip
+            logs.append(f"Skipped email '{subject}' due to missing sender information.")
+            metrics.EMAILS_PROCESSED.inc(route='skipped')
+            return logs, failed_emails
+        record.sender_email = sender_email
+
+    breaker = get_circuit_breaker()
+    try:
+        year, month = extract_date_from_text(subject, default_year)
+        if not year or not month:
+            for attachment in record.attachments:
+                year, month = extract_date_from_text(attachment['filename'], default_year)
+                if year and month:
+                    break
+        year = year or default_year
+
+        base_path, special_case, is_csv_path, route = find_save_path(sender_email, subject, sender_path_table)
+        if base_path is None:
+            base_path = DEFAULT_SAVE_PATH
+
+        # If it's a default path email
+        if not is_csv_path:
+            save_path = os.path.join(base_path, specific_date_str)
+        else:
+            if special_case:
+                save_path = os.path.join(base_path, str(year))
+            else:
+                if month:
+                    save_path = os.path.join(base_path, str(year), month)
+                else:
+                    save_path = os.path.join(base_path, str(year))
+
+        print(f"Email from: {sender_email}")
+        print(f"Subject: {subject}")
+        print(f"Special Case: {special_case}")
+        print(f"Save Path: {save_path}")
+
+        filename = save_email(item, save_path, special_case, record)
+        logs.append(f"Saved: {filename} to {save_path}")
+        metrics.EMAILS_PROCESSED.inc(route=route)
+        breaker.record_success()
+    except _com_errors() as com_err:
+        # Outlook is usually just busy: queue the email with backoff instead of
+        # hammering it again straight away
+        breaker.record_failure()
+        metrics.COM_ERRORS.inc(code=metrics.com_error_code(com_err))
+        logs.append(f"COM Error handling email '{subject}' from '{sender_email}' (Code: {com_err.args})")
+        attempts = _queue_for_redrive(item, sender_email, specific_date_str, default_year, str(com_err.args))
+        if attempts is not None:
+            logs.append(f"Queued the email '{subject}' from '{sender_email}' for redrive (attempt {attempts})")
+        failed_emails.append({'email_address': sender_email, 'subject': subject, 'entry_id': getattr(item, 'EntryID', None)})
+        metrics.EMAILS_PROCESSED.inc(route='failed')
+    except Exception as e:
+        logs.append(f"Error handling email '{subject}' from '{sender_email}': {str(e)}")
+        failed_emails.append({'email_address': sender_email, 'subject': subject})
+        metrics.EMAILS_PROCESSED.inc(route='failed')
+
+    return logs, failed_emails
+
+def redrive_failures(namespace, sender_path_table, date_str=None, max_wait=0.0, include_dead=False):
+    """
+    Retry queued COM failures (optionally only those for date_str). Waits for
+    pending backoffs while the next one is due within max_wait seconds.
+    Returns (logs, redriven_entry_ids, still_failed).
+    """
+    queue = get_redrive_queue()
+    breaker = get_circuit_breaker()
+    logs = []
+    redriven = set()
+    still_failed = []
+    deadline = time.monotonic() + max_wait
+    seen = set()
+
+    while True:
+        if max_wait > 0 and time.monotonic() > deadline:
+            break
+        due = [row for row in queue.due(date_str=date_str, include_dead=include_dead) if row['entry_id'] not in seen]
+        if not due:
+            next_due = queue.next_due_time(date_str=date_str)
+            if next_due is None or next_due - time.time() > deadline - time.monotonic():
+                break
+            time.sleep(max(next_due - time.time(), 0))
+            continue
+
+        for row in due:
+            if max_wait > 0 and time.monotonic() > deadline:
+                break
+            # Without waiting, each entry gets one attempt per call, however it ends
+            if max_wait <= 0:
+                seen.add(row['entry_id'])
+            breaker.wait()
+            try:
+                item = namespace.GetItemFromID(row['entry_id'], row['store_id'])
+            except Exception as e:
+                logs.append(f"Redrive: could not open '{row['subject']}' from '{row['sender']}': {str(e)}")
+                queue.add(row['entry_id'], row['store_id'], row['sender'], row['subject'], row['date_str'], row['default_year'], str(e))
+                continue
+            email_logs, email_failed = process_email(item, sender_path_table, row['default_year'], row['date_str'])
+            logs.extend(f"Redrive: {log}" for log in email_logs)
+            if email_failed:
+                still_failed.extend(email_failed)
+                if not any(failed.get('entry_id') for failed in email_failed):
+                    # Only COM errors re-queue themselves; back off any other
+                    # failure too, or it would stay due and be retried in a loop
+                    queue.add(row['entry_id'], row['store_id'], row['sender'], row['subject'], row['date_str'],
+                              row['default_year'], email_logs[-1] if email_logs else 'failed')
+            else:
+                queue.remove(row['entry_id'])
+                redriven.add(row['entry_id'])
+
+    return logs, redriven, still_failed
+
+def load_sender_path_table(csv_file_path):
+    """
+    Read the sender path CSV (utf-8, falling back to latin1) with lower-cased column names.
+    """
+    pd = _pandas()
+    try:
+        sender_path_table = pd.read_csv(csv_file_path, encoding='utf-8')
+    except UnicodeDecodeError:
+        sender_path_table = pd.read_csv(csv_file_path, encoding='latin1')
+    sender_path_table.columns = sender_path_table.columns.str.lower()
+    return sender_path_table
+
+def date_range(start_date_str, end_date_str):
+    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    if start_date > end_date:
+        raise ValueError("Start date must not be after end date.")
+    delta = end_date - start_date
+    return [(start_date + datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range(delta.days + 1)]
+
+def find_folder_by_name(parent_folder, target_name):
+    for f in parent_folder.Folders:
+        if f.Name.lower() == target_name.lower():
+            return f
+        sub_result = find_folder_by_name(f, target_name)
+        if sub_result is not None:
+            return sub_result
+    return None
+
+def get_items_for_folder(folder, date, broker=None):
+    filtered_items = []
+    if folder and broker is not None:
+        start = datetime.datetime.combine(date, datetime.time.min)
+        return broker.restrict(folder, start=start, end=start + datetime.timedelta(days=1))
+    if folder:
+        items = folder.Items
+        items.Sort("[ReceivedTime]", True)
+        items = items.Restrict(
+            f"[ReceivedTime] >= '{date.strftime('%m/%d/%Y')} 00:00 AM' AND [ReceivedTime] <= '{date.strftime('%m/%d/%Y')} 11:59 PM'"
+        )
+        for item in items:
+            filtered_items.append(item)
+    return filtered_items
+
+def write_logs(logs):
+    with open(LOG_FILE_PATH, 'w', encoding='utf-8') as f:
+        f.writelines("\n".join(logs))
+
+def save_emails_from_senders_on_date(email_address, specific_date_str, sender_path_table, default_year, folder_name=None):
+    """
+    Save the Inbox (and optionally one named subfolder of it) for one date, then
+    write the log file and append the day to the Excel summary.
+    """
+    logs = []
+    reset_fs_cache()
+    specific_date = datetime.datetime.strptime(specific_date_str, '%Y-%m-%d').date()
+
+    inbox = None
+    target_folder = None
+
+    pythoncom = None
+    broker = get_broker()
+    if broker is not None:
+        # The broker already holds the session and resolved folders
+        outlook = broker
+        inbox = broker.resolve_folder(email_address, 'Inbox', allow_primary=True)
+        if inbox and folder_name:
+            target_folder = broker.resolve_folder(email_address, 'Inbox', search=folder_name, allow_primary=True)
+    else:
+        pythoncom = _pythoncom()
+        pythoncom.CoInitialize()
+        outlook = _win32com_client().Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+        # Locate the store
+        for store in outlook.Stores:
+            if store.DisplayName.lower() == email_address.lower() or store.ExchangeStoreType == 3:
+                try:
+                    root_folder = store.GetRootFolder()
+                    inbox = next((folder for folder in root_folder.Folders if folder.Name.lower() == "inbox"), None)
+                    if inbox and folder_name:
+                        target_folder = find_folder_by_name(inbox, folder_name)
+                    break
+                except AttributeError as e:
+                    logs.append(f"Error accessing folders: {str(e)}")
+                    continue
+
+    if not inbox:
+        logs.append(f"No Inbox found for the account with email address: {email_address}")
+        if pythoncom is not None:
+            pythoncom.CoUninitialize()
+        write_logs(logs)
+        return
+    else:
+        logs.append("Inbox found successfully.")
+
+    if folder_name and not target_folder:
+        logs.append(f"No '{folder_name}' folder found as a subfolder of Inbox.")
+    elif folder_name and target_folder:
+        logs.append(f"'{folder_name}' folder found successfully.")
+
+    inbox_items = get_items_for_folder(inbox, specific_date, broker)
+    target_items = get_items_for_folder(target_folder, specific_date, broker) if target_folder else []
+
+    all_items = inbox_items + target_items
+    logs.append(f"Total emails found: {len(all_items)} (Inbox: {len(inbox_items)}, '{folder_name or 'N/A'}': {len(target_items)})")
+
+    total_emails = len(all_items)
+    saved_default, saved_actual, not_saved = 0, 0, 0
+    failed_emails = []
+
+    # Critical senders are routed and saved first; see scheduler.py
+    import scheduler
+    sender_tiers = scheduler.load_sender_tiers(sender_path_table)
+    queue = scheduler.PriorityScheduler()
+    queued_at = time.monotonic()
+    for item in all_items:
+        try:
+            sender_email = sender_address(item)
+        except Exception:
+            sender_email = None
+        queue.push(sender_tiers.get(sender_email, scheduler.UNLISTED_TIER), ItemRecord(item, sender_email))
+    tier_counts = queue.counts()
+    logs.append("Emails by sender tier: " + ", ".join(f"{tier}: {tier_counts[tier]}" for tier in scheduler.TIERS))
+
+    breaker = get_circuit_breaker()
+    metrics.QUEUE_DEPTH.set(total_emails)
+    for tier in scheduler.TIERS:
+        metrics.TIER_QUEUE_DEPTH.set(tier_counts[tier], tier=tier)
+    while True:
+        entry = queue.pop()
+        if entry is None:
+            break
+        tier, record = entry
+        # Pauses here while Outlook keeps failing instead of burning through the day
+        breaker.wait()
+        email_logs, email_failed_emails = process_email(record.item, sender_path_table, default_year, specific_date_str, record)
+        metrics.TIME_TO_FILE_SECONDS.observe(time.monotonic() - queued_at, tier=tier)
+        metrics.QUEUE_DEPTH.set(len(queue))
+        metrics.TIER_QUEUE_DEPTH.set(queue.counts()[tier], tier=tier)
+        logs.extend(email_logs)
+        failed_emails.extend(email_failed_emails)
+        if any(DEFAULT_SAVE_PATH in log for log in email_logs):
+            saved_default += 1
+        else:
+            saved_actual += 1
+
+    # Give this day's COM failures a short in-run redrive; anything still failing
+    # stays queued for `email_cli.py redrive`
+    if any(email.get('entry_id') for email in failed_emails):
+        redrive_logs, redriven, _ = redrive_failures(outlook, sender_path_table, date_str=specific_date_str,
+                                                     max_wait=REDRIVE_INLINE_SECONDS)
+        logs.extend(redrive_logs)
+        failed_emails = [email for email in failed_emails if email.get('entry_id') not in redriven]
+
+    mover = get_staging_mover()
+    if mover is not None:
+        for staged_path, final_path, error in mover.drain():
+            logs.append(f"Could not move '{staged_path}' to '{final_path}' ({error}); it will be retried on the next run.")
+
+    if pythoncom is not None:
+        pythoncom.CoUninitialize()
+    write_logs(logs)
+
+    update_excel_summary(specific_date_str, total_emails, saved_default, saved_actual, not_saved, failed_emails)
+
+def save_emails_for_dates(email_address, date_list, sender_path_table, default_year, folder_name=None):
+    """
+    Run save_emails_from_senders_on_date for each date, then rebuild the Excel
+    summary once from the summary store.
+    """
+    try:
+        for d in date_list:
+            print("Processing emails for:", d)
+            save_emails_from_senders_on_date(email_address, d, sender_path_table, default_year, folder_name)
+    finally:
+        export_excel_summary()
+
+def redrive_queued(sender_path_table, date_str=None, include_dead=False):
+    """
+    Process only the emails waiting in the redrive queue and write the log file.
+    Returns (redriven_count, still_queued_count).
+    """
+    reset_fs_cache()
+    broker = get_broker()
+    pythoncom = None
+    if broker is None:
+        pythoncom = _pythoncom()
+        pythoncom.CoInitialize()
+    try:
+        # The broker client can look items up by EntryID like a MAPI namespace
+        namespace = broker or _win32com_client().Dispatch("Outlook.Application").GetNamespace("MAPI")
+        logs, redriven, _ = redrive_failures(namespace, sender_path_table, date_str=date_str, include_dead=include_dead)
+        mover = get_staging_mover()
+        if mover is not None:
+            for staged_path, final_path, error in mover.drain():
+                logs.append(f"Could not move '{staged_path}' to '{final_path}' ({error}); it will be retried on the next run.")
+    finally:
+        if pythoncom is not None:
+            pythoncom.CoUninitialize()
+    remaining = get_redrive_queue().count()
+    logs.append(f"Redrive complete: {len(redriven)} saved, {remaining} still queued.")
+    write_logs(logs)
+    return len(redriven), remaining
@@ -1,13 +1,18 @@
 import os
 import re
-import pandas as pd
 import pdfplumber
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+import report_writer
+import result_cache
+import number_parser
+import argparse
 import glob
 from datetime import datetime
 import traceback
 
+# Cached results are keyed by this; bump it whenever extraction changes
+EXTRACTOR_NAME = 'ext_pdf'
+EXTRACTOR_VERSION = '4'
+
 def extract_fund_name(pdf_path):
     """
     Extract the fund name from the third line of the first page.
@@ -508,56 +513,17 @@ def last_resort_extraction(pdf_path):
 def clean_number(value_str):
     """
     Clean and convert a string value to a float.
-    Handles various number formats including apostrophes, commas, spaces.
+    Handles various number formats including apostrophes, commas, spaces,
+    European decimals and parenthesised negatives (see number_parser).
     """
-    try:
-        if value_str is None:
-            return None
-            
-        # If it's already a number, return it
-        if isinstance(value_str, (int, float)):
-            return float(value_str)
-            
-        if isinstance(value_str, str):
-            # Handle percentage values - skip these
-            if "%" in value_str:
-                return None
-            
-            # Skip non-numeric text
-            if len(value_str.strip()) == 0 or value_str.strip().isalpha():
-                return None
-                
-            # Remove common separators and non-numeric characters
-            cleaned = value_str.replace("'", "").replace(",", "").replace(" ", "").replace("x", "")
-            
-            # Handle cases where there's no digits
-            if not any(c.isdigit() for c in cleaned):
-                return None
-                
-            # Handle any remaining non-numeric characters (except decimal point)
-            final_value = ""
-            decimal_found = False
-            for char in cleaned:
-                if char.isdigit():
-                    final_value += char
-                elif char == "." and not decimal_found:
-                    final_value += char
-                    decimal_found = True
-                    
-            if final_value:
-                # Convert to float with additional validation
-                try:
-                    value = float(final_value)
-                    
-                    # If we have a non-zero value and it's reasonably large (NAV values are typically large)
-                    # This helps avoid misidentifying small numbers as NAV values
-                    if value > 100:  # NAV is typically in thousands or millions
-                        return value
-                except:
-                    pass
-    except:
-        pass
-        
+    # If it's already a number, return it
+    if isinstance(value_str, (int, float)) and not isinstance(value_str, bool):
+        return float(value_str)
+    value = number_parser.parse_number(value_str)
+    # NAV values are typically in thousands or millions; this helps avoid
+    # misidentifying small numbers as NAV values
+    if value is not None and value > 100:
+        return value
     return None
 
 def process_pdf(pdf_path):
@@ -565,6 +531,14 @@ def process_pdf(pdf_path):
     Process a single PDF file to extract fund name and NAV values.
     Uses multiple fallback approaches to maximize success.
     """
+    return process_pdf_with_method(pdf_path)[0]
+
+def process_pdf_with_method(pdf_path):
+    """
+    process_pdf() plus the name of the approach that found both NAV values
+    (None if none did), for the result cache.
+    """
+    method = None
     try:
         # Extract fund name
         fund_name = extract_fund_name(pdf_path)
@@ -575,6 +549,7 @@ def process_pdf(pdf_path):
         
         # First approach: Direct table extraction targeting Key Figures table
         period1_label, period1_nav, period2_label, period2_nav = direct_table_extraction(pdf_path)
+        method = 'Direct Table Extraction'
         
         # Check if values seem reasonable based on fund name
         if period1_nav is not None and period2_nav is not None:
@@ -585,18 +560,24 @@ def process_pdf(pdf_path):
         # Second approach: Advanced table analysis with different settings
         if period1_nav is None or period2_nav is None:
             period1_label, period1_nav, period2_label, period2_nav = advanced_table_analysis(pdf_path)
+            method = 'Advanced Table Analysis'
             
         # Third approach: Text scanning for NAV mentions
         if period1_nav is None or period2_nav is None:
             period1_label, period1_nav, period2_label, period2_nav = scan_text_for_nav(pdf_path)
+            method = 'Text Scan'
         
         # Fourth approach: Image-based extraction if first approach failed
         if period1_nav is None or period2_nav is None:
             period1_label, period1_nav, period2_label, period2_nav = image_based_extraction(pdf_path)
+            method = 'Image-Based Extraction'
         
         # Last resort: Desperate pattern matching
         if period1_nav is None or period2_nav is None:
             period1_label, period1_nav, period2_label, period2_nav = last_resort_extraction(pdf_path)
+            method = 'Last Resort Extraction'
+        if period1_nav is None or period2_nav is None:
+            method = None
         
         # Make sure date formats are consistent if we have dates
         if period1_label and period2_label:
@@ -627,7 +608,7 @@ def process_pdf(pdf_path):
             'Period 2 Label': period2_label if period2_label else "Period 2",
             'Period 2 NAV': period2_nav,
             'PDF Filename': os.path.basename(pdf_path)
-        }
+        }, method
     except Exception as e:
         print(f"Error processing {pdf_path}: {str(e)}")
         traceback.print_exc()
@@ -638,57 +619,34 @@ def process_pdf(pdf_path):
             'Period 2 Label': 'Period 2',
             'Period 2 NAV': None,
             'PDF Filename': os.path.basename(pdf_path)
-        }
+        }, None
 
-def format_excel(excel_path):
+def write_excel(results, excel_path):
     """
-    Apply formatting to the Excel file for better readability.
+    Stream the results to a formatted Excel file (styled header, sized columns,
+    NAV columns as numbers) without building the workbook in memory.
     """
     try:
-        wb = openpyxl.load_workbook(excel_path)
-        ws = wb.active
-        
-        # Apply header formatting
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = openpyxl.utils.get_column_letter(column[0].column)
-            
-            for cell in column:
-                if cell.value:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-            
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Format numeric values
-        for row in ws.iter_rows(min_row=2):
-            for cell in row[2:]:  # Apply only to NAV columns
-                if isinstance(cell.value, (int, float)):
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal='right')
-        
-        wb.save(excel_path)
+        columns = list(results[0].keys()) if results else []
+        # NAV columns start at the third column
+        number_formats = {i: '#,##0.00' for i in range(2, len(columns))}
+        report_writer.write_records(excel_path, results, columns=columns, header_color=report_writer.HEADER_STEEL,
+                                    number_formats=number_formats, width_scale=1.2, max_width=80, freeze_header=False)
         return True
     except Exception as e:
-        print(f"Error formatting Excel file: {str(e)}")
+        print(f"Error writing Excel file: {str(e)}")
         return False
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract fund names and NAV values from a folder of PDF reports.")
+    parser.add_argument('folder', nargs='?', help="Folder containing the PDF files; prompts if omitted.")
+    parser.add_argument('--force', action='store_true', help="Re-extract every PDF, ignoring cached results.")
+    parser.add_argument('--cache', default=None,
+                        help=f"Result cache database (default: {result_cache.CACHE_NAME} in the PDF folder).")
+    args = parser.parse_args(argv)
+
     # Folder containing PDF files
-    pdf_folder = input("Enter the path to the folder containing PDF files: ")
+    pdf_folder = args.folder or input("Enter the path to the folder containing PDF files: ")
     
     # Check if the folder exists
     if not os.path.isdir(pdf_folder):
@@ -702,7 +660,11 @@ def main():
         print(f"No PDF files found in folder '{pdf_folder}'.")
         return
     
-    print(f"Found {len(pdf_files)} PDF files. Processing...")
+    # Unchanged reports are served from the result cache
+    cache = result_cache.ResultCache(args.cache or os.path.join(pdf_folder, result_cache.CACHE_NAME))
+    hashes, cached = result_cache.split_cached(cache, pdf_files, EXTRACTOR_NAME, EXTRACTOR_VERSION, force=args.force)
+    
+    print(f"Found {len(pdf_files)} PDF files, {len(cached)} unchanged since the last run. Processing...")
     
     # Process each PDF file
     results = []
@@ -710,8 +672,14 @@ def main():
     failure_count = 0
     
     for i, pdf_path in enumerate(pdf_files):
-        print(f"Processing {i+1}/{len(pdf_files)}: {os.path.basename(pdf_path)}...")
-        result = process_pdf(pdf_path)
+        if pdf_path in cached:
+            result = cached[pdf_path]
+        else:
+            print(f"Processing {i+1}/{len(pdf_files)}: {os.path.basename(pdf_path)}...")
+            result, method = process_pdf_with_method(pdf_path)
+            if pdf_path in hashes:
+                # This extractor does not score its results, so there is no confidence to record
+                cache.put(hashes[pdf_path], EXTRACTOR_NAME, EXTRACTOR_VERSION, result, method, None)
         results.append(result)
         
         if result['Period 1 NAV'] is not None and result['Period 2 NAV'] is not None:
@@ -719,18 +687,14 @@ def main():
         else:
             failure_count += 1
     
-    # Create DataFrame from results
-    df = pd.DataFrame(results)
+    cache.close()
     
     # Create output Excel file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_path = os.path.join(pdf_folder, f"Fund_NAV_Summary_{timestamp}.xlsx")
     
     # Export to Excel
-    df.to_excel(output_path, index=False)
-    
-    # Format the Excel file
-    format_excel(output_path)
+    write_excel(results, output_path)
     
     print(f"\nProcessing complete. Results saved to: {output_path}")
     print(f"Success: {success_count}/{len(pdf_files)} ({success_count/len(pdf_files)*100:.1f}%)")
@@ -1,21 +1,25 @@
 import os
 import re
-import pandas as pd
-import pdfplumber
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+import report_writer
+import pdf_document
+import pdf_batch
+import result_cache
+import layout_templates
+import strategy_planner
+import nav_scanner
+import number_parser
+import functools
+import argparse
 import glob
+from collections import Counter
 from datetime import datetime
 import traceback
 import warnings
 warnings.filterwarnings('ignore')
 
-# Try to import additional libraries
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
+# Try to import additional libraries; PyMuPDF itself is only used through pdf_document
+PYMUPDF_AVAILABLE = pdf_document.pymupdf_available()
+if not PYMUPDF_AVAILABLE:
     print("PyMuPDF not available. For better results, install with: pip install PyMuPDF")
 
 try:
@@ -31,15 +35,20 @@ try:
 except ImportError:
     POPPLER_AVAILABLE = False
 
+# Cached results are keyed by this; bump it whenever extraction changes
+EXTRACTOR_NAME = 'extract_pdfv2'
+EXTRACTOR_VERSION = '8'
+
 
 def extract_fund_name(pdf_path):
     """
     Extract the fund name from the third line of the first page.
+    pdf_path may also be an open pdf_document.PDFDocument.
     """
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            if len(pdf.pages) > 0:
-                first_page_text = pdf.pages[0].extract_text()
+        with pdf_document.document(pdf_path) as pdf:
+            if pdf.page_count > 0:
+                first_page_text = pdf.page_text(0)
                 if first_page_text:
                     # Split text by newlines and get the third line if available
                     lines = first_page_text.split('\n')
@@ -59,26 +68,26 @@ def extract_fund_name(pdf_path):
                         if any(indicator in line.lower() for indicator in ['fund', 'sicav', 's.c.a', 'l.p.', 'partners group']):
                             return line
         
-        # Fallback to extracting text from first few pages and looking for fund name patterns
-        all_text = extract_text_from_pdf(pdf_path, max_pages=3)
+            # Fallback to extracting text from first few pages and looking for fund name patterns
+            all_text = extract_text_from_pdf(pdf, max_pages=3)
         
-        # Try to find title lines that might contain fund names
-        lines = all_text.split('\n')
-        for line in lines[:20]:  # Look only in first 20 lines
-            line = line.strip()
-            if len(line) > 10 and any(indicator in line.lower() for indicator in ['fund', 'sicav', 's.c.a', 'l.p.', 'partners group']):
-                return line
+            # Try to find title lines that might contain fund names
+            lines = all_text.split('\n')
+            for line in lines[:20]:  # Look only in first 20 lines
+                line = line.strip()
+                if len(line) > 10 and any(indicator in line.lower() for indicator in ['fund', 'sicav', 's.c.a', 'l.p.', 'partners group']):
+                    return line
         
-        # If all else fails, try to match common fund name patterns
-        fund_patterns = [
-            r"([A-Za-z0-9\s\-\.&]+(?:S\.C\.A\.|SICAV|Fund|L\.P\.))",
-            r"([A-Za-z]+\s+[A-Za-z]+\s+[A-Za-z]+(?:\s+[IVX]+)?)"
-        ]
+            # If all else fails, try to match common fund name patterns
+            fund_patterns = [
+                r"([A-Za-z0-9\s\-\.&]+(?:S\.C\.A\.|SICAV|Fund|L\.P\.))",
+                r"([A-Za-z]+\s+[A-Za-z]+\s+[A-Za-z]+(?:\s+[IVX]+)?)"
+            ]
         
-        for pattern in fund_patterns:
-            match = re.search(pattern, all_text)
-            if match:
-                return match.group(1).strip()
+            for pattern in fund_patterns:
+                match = re.search(pattern, all_text)
+                if match:
+                    return match.group(1).strip()
     except Exception as e:
         print(f"Error extracting fund name: {str(e)}")
     
@@ -90,19 +99,8 @@ def extract_text_from_pdf(pdf_path, max_pages=None, start_page=0):
     Extract text from PDF, optionally limiting to max_pages starting from start_page.
     """
     try:
-        all_text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            # Determine which pages to extract
-            if max_pages is None:
-                pages_to_extract = pdf.pages[start_page:]
-            else:
-                end_page = min(start_page + max_pages, len(pdf.pages))
-                pages_to_extract = pdf.pages[start_page:end_page]
-                
-            for page in pages_to_extract:
-                page_text = page.extract_text() or ""
-                all_text += page_text + "\n"
-        return all_text
+        with pdf_document.document(pdf_path) as pdf:
+            return pdf.text(max_pages=max_pages, start_page=start_page)
     except Exception as e:
         print(f"Error extracting text from PDF: {str(e)}")
         return ""
@@ -111,7 +109,11 @@ def extract_text_from_pdf(pdf_path, max_pages=None, start_page=0):
 def analyze_pdf_structure(pdf_path):
     """
     Analyze PDF to determine its structure and guide extraction approach.
+    The result is memoized on the document, so later strategies reuse it.
     """
+    if isinstance(pdf_path, pdf_document.PDFDocument) and 'structure' in pdf_path.memo:
+        return pdf_path.memo['structure']
+
     pdf_info = {
         "has_tables": False,
         "is_image_based": False,
@@ -122,16 +124,15 @@ def analyze_pdf_structure(pdf_path):
     
     try:
         # Try with pdfplumber first
-        with pdfplumber.open(pdf_path) as pdf:
-            pdf_info["page_count"] = len(pdf.pages)
+        with pdf_document.document(pdf_path) as pdf:
+            pdf_info["page_count"] = pdf.page_count
             
             # Check first 3 pages
-            for i in range(min(3, len(pdf.pages))):
-                page = pdf.pages[i]
-                page_text = page.extract_text() or ""
+            for i in range(min(3, pdf.page_count)):
+                page_text = pdf.page_text(i)
                 
                 # Check if this PDF has tables
-                if page.find_tables():
+                if pdf.page_has_tables(i):
                     pdf_info["has_tables"] = True
                 
                 # Check if this PDF has "Key Figures" section (case-insensitive)
@@ -148,7 +149,7 @@ def analyze_pdf_structure(pdf_path):
                     
             # If we haven't found tables yet, try a different approach
             if not pdf_info["has_tables"] and PYMUPDF_AVAILABLE:
-                doc = fitz.open(pdf_path)
+                doc = pdf.fitz()
                 for i in range(min(3, doc.page_count)):
                     page = doc[i]
                     if page.get_text("dict")["blocks"]:
@@ -164,7 +165,8 @@ def analyze_pdf_structure(pdf_path):
                             pdf_info["is_partners_group"] = True
                         if "key figures" in page_text.lower():
                             pdf_info["has_key_figures_section"] = True
-        
+            
+            pdf.memo['structure'] = pdf_info
         return pdf_info
     except Exception as e:
         print(f"Error analyzing PDF structure: {str(e)}")
@@ -173,47 +175,43 @@ def analyze_pdf_structure(pdf_path):
 
 def extract_text_multi_library(pdf_path):
     """
-    Try multiple libraries to extract text from PDF.
+    Try multiple libraries to extract text from PDF: the document's text engine
+    (PyMuPDF when installed) first, then the other one.
     """
-    text = ""
-    
-    # Try pdfplumber first
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n"
+    with pdf_document.document(pdf_path) as pdf:
+        engines = [pdf.text_engine]
+        if pdf.text_engine == pdf_document.ENGINE_PYMUPDF:
+            engines.append(pdf_document.ENGINE_PDFPLUMBER)
+        elif PYMUPDF_AVAILABLE:
+            engines.append(pdf_document.ENGINE_PYMUPDF)
         
-        if text.strip():
-            return text
-    except Exception as e:
-        print(f"pdfplumber extraction failed: {str(e)}")
-    
-    # Try PyMuPDF if available
-    if PYMUPDF_AVAILABLE:
-        try:
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-            
-            if text.strip():
-                return text
-        except Exception as e:
-            print(f"PyMuPDF extraction failed: {str(e)}")
-    
-    # If all else fails, use the original extract_text_from_pdf function
-    return extract_text_from_pdf(pdf_path)
+        for engine in engines:
+            try:
+                text = pdf.text(engine=engine)
+                
+                if text.strip():
+                    return text
+            except Exception as e:
+                print(f"{engine} extraction failed: {str(e)}")
+        
+        return ""
 
 
-def extract_tables_multi_library(pdf_path):
+def extract_tables_multi_library(pdf_path, pdf_info=None):
     """
     Try multiple libraries to extract tables from PDF.
+    pdf_info is the analyze_pdf_structure() result, if the caller already has it.
     """
+    with pdf_document.document(pdf_path) as pdf:
+        return _extract_tables_multi_library(pdf, pdf_info)
+
+
+def _extract_tables_multi_library(pdf, pdf_info):
     all_tables = []
     
     # First check if this is a Partners Group document with Key Figures
-    pdf_info = analyze_pdf_structure(pdf_path)
+    if pdf_info is None:
+        pdf_info = analyze_pdf_structure(pdf)
     
     # Try pdfplumber with different settings - prioritize settings based on document type
     table_settings_list = []
@@ -237,25 +235,22 @@ def extract_tables_multi_library(pdf_path):
         ]
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num in range(min(5, len(pdf.pages))):
-                page = pdf.pages[page_num]
-                
-                for settings in table_settings_list:
-                    try:
-                        tables = page.extract_tables(settings)
-                        if tables:
-                            all_tables.extend([{'page': page_num, 'tables': tables, 'source': 'pdfplumber'}])
-                            break  # If we found tables with these settings, move to next page
-                    except:
-                        continue
+        for page_num in pdf.ranked_pages():
+            for settings in table_settings_list:
+                try:
+                    tables = pdf.page_tables(page_num, settings)
+                    if tables:
+                        all_tables.extend([{'page': page_num, 'tables': tables, 'source': 'pdfplumber'}])
+                        break  # If we found tables with these settings, move to next page
+                except:
+                    continue
     except Exception as e:
         print(f"pdfplumber table extraction failed: {str(e)}")
     
     # Try tabula if available
     if TABULA_AVAILABLE and not all_tables:
         try:
-            tabula_tables = tabula.read_pdf(pdf_path, pages='1-5', multiple_tables=True)
+            tabula_tables = tabula.read_pdf(pdf.path, pages='1-5', multiple_tables=True)
             if tabula_tables:
                 # Convert tabula tables to our format
                 for table in tabula_tables:
@@ -270,64 +265,11 @@ def extract_tables_multi_library(pdf_path):
 def clean_number(value_str):
     """
     Clean and convert a string value to a float.
-    Handles various number formats including apostrophes, commas, spaces.
+    Handles various number formats including apostrophes, commas, spaces,
+    European decimals and parenthesised negatives (see number_parser).
+    Percentages give None.
     """
-    try:
-        if value_str is None:
-            return None
-            
-        # If it's already a number, return it
-        if isinstance(value_str, (int, float)):
-            return float(value_str)
-            
-        if isinstance(value_str, str):
-            # Handle percentage values - skip these
-            if "%" in value_str:
-                return None
-            
-            # Skip non-numeric text or extremely short text
-            if len(value_str.strip()) == 0 or value_str.strip().isalpha():
-                return None
-            
-            # Check if the string contains any digits at all
-            if not any(c.isdigit() for c in value_str):
-                return None
-            
-            # Special handling for Partners Group format with apostrophes (e.g., 595'446'138)
-            # First check if it matches the pattern
-            if "'" in value_str and re.search(r'\d+(?:\'\d+)+', value_str.strip()):
-                # Simply remove all apostrophes
-                cleaned = value_str.replace("'", "")
-                try:
-                    return float(cleaned)
-                except:
-                    pass
-                
-            # Standard cleaning for other formats
-            cleaned = value_str.replace("'", "").replace(",", "").replace(" ", "").replace("x", "")
-            
-            # Handle any remaining non-numeric characters (except decimal point)
-            final_value = ""
-            decimal_found = False
-            for char in cleaned:
-                if char.isdigit():
-                    final_value += char
-                elif char == "." and not decimal_found:
-                    final_value += char
-                    decimal_found = True
-                    
-            if final_value:
-                # Convert to float
-                try:
-                    value = float(final_value)
-                    # Don't filter by size - some NAV values can be small
-                    return value
-                except:
-                    pass
-    except:
-        pass
-        
-    return None
+    return number_parser.parse_number(value_str)
 
 
 def extract_nav_from_tables(tables_data):
@@ -351,10 +293,9 @@ def extract_nav_from_tables(tables_data):
                     continue
                 
                 row_str = [str(cell).strip() if cell is not None else "" for cell in row]
-                row_text = " ".join(row_str).lower()
                 
                 # Check if this row contains NAV information
-                if "net asset value" in row_text or "nav" in row_text.split():
+                if nav_scanner.scan_line(" ".join(row_str)).has('nav_full', 'nav_abbr'):
                     # Get values
                     values = []
                     for cell_idx, cell in enumerate(row):
@@ -370,7 +311,7 @@ def extract_nav_from_tables(tables_data):
                             if len(table[i]) >= len(row):
                                 header_text = " ".join([str(cell).strip() if cell is not None else "" for cell in table[i]])
                                 # Check for date patterns
-                                if re.search(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', header_text):
+                                if nav_scanner.scan_line(header_text).has('date_numeric'):
                                     header_row = table[i]
                                     break
                         
@@ -404,104 +345,60 @@ def extract_nav_from_tables(tables_data):
     return sorted(results, key=lambda x: x['confidence'], reverse=True)
 
 
+def _token_values(numbers, minimum=None):
+    """
+    Parse number tokens with number_parser, dropping the ones that do not
+    parse and, when minimum is given, the ones not above it.
+    """
+    return [value for value in number_parser.parse_numbers(numbers)
+            if value is not None and (minimum is None or value > minimum)]
+
+
 def extract_nav_with_enhanced_patterns(text):
     """
     Use enhanced patterns to extract NAV values from text.
     Always looking for NAV as row label (never in column headers).
     """
     results = []
+    scanned = nav_scanner.scan(text)
     
-    # Split text into lines for row-based analysis
-    lines = text.split('\n')
-    
-    # Enhanced NAV row patterns - looking for NAV as a row label followed by values
-    nav_row_patterns = [
-        # Pattern 1: "Net Asset Value" followed by values
-        r"Net\s+[Aa]sset\s+[Vv]alue\s*([\d\s,\.\']+)\s*([\d\s,\.\']+)",
-        
-        # Pattern 2: "NAV" followed by values
-        r"\bNAV\b\s*([\d\s,\.\']+)\s*([\d\s,\.\']+)",
-        
-        # Pattern 3: More flexible pattern with intervening content
-        r"Net\s+[Aa]sset\s+[Vv]alue.*?([\d\s,\.\']+).*?([\d\s,\.\']+)"
-    ]
-    
-    # Date patterns
-    date_patterns = [
-        r'\b(\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4})\b',
-        r'\b(\d{2}\.\d{2}\.\d{4})\b',
-        r'\b((?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4})\b',
-        r'\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2},?\s+\d{4})\b',
-        r'\b(\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4})\b',
-        r'\b(\d{2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{4})\b'
-    ]
-    
-    # Extract dates from the text
-    dates = []
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        dates.extend(matches)
-    
-    # Ensure we have unique dates
-    dates = list(set(dates))
+    # Extract the unique dates from the text and sort them (assuming they are in standard formats)
+    dates = sorted(set(scanned.texts(*nav_scanner.DAY_DATE_KINDS)))
     
-    # Sort dates (assuming they are in standard formats)
-    dates.sort()
-    
-    # First try to find NAV rows with values on the same line
-    for line in lines:
-        if "net asset value" in line.lower() or "nav" in line.lower():
-            for pattern in nav_row_patterns:
-                matches = re.search(pattern, line, re.IGNORECASE)
-                if matches:
-                    # Extract the values from the matches
-                    if len(matches.groups()) >= 2:
-                        value1 = clean_number(matches.group(1))
-                        value2 = clean_number(matches.group(2))
-                        
-                        if value1 is not None and value2 is not None:
-                            # If we have dates and values
-                            if len(dates) >= 2:
-                                results.append({
-                                    'period1_label': dates[-2],  # Second most recent date
-                                    'period1_nav': value1,
-                                    'period2_label': dates[-1],  # Most recent date
-                                    'period2_nav': value2,
-                                    'confidence': 0.85,  # Good confidence with dates
-                                    'source': 'pattern_row_with_dates'
-                                })
-                                break
-                            else:
-                                # If we have values but no dates
-                                results.append({
-                                    'period1_label': "Period 1",
-                                    'period1_nav': value1,
-                                    'period2_label': "Period 2", 
-                                    'period2_nav': value2,
-                                    'confidence': 0.75,  # Lower confidence without dates
-                                    'source': 'pattern_row_no_dates'
-                                })
-                                break
+    # First try to find NAV rows with values on the same line: the first two
+    # numbers after the "Net Asset Value" / "NAV" label
+    for line in scanned.lines_with('nav_full', 'nav_abbr'):
+        label = line.first('nav_full', 'nav_abbr')
+        values = _token_values(line.texts('number', after=label.end))
+        if len(values) >= 2:
+            if len(dates) >= 2:
+                # If we have dates and values
+                results.append({
+                    'period1_label': dates[-2],  # Second most recent date
+                    'period1_nav': values[0],
+                    'period2_label': dates[-1],  # Most recent date
+                    'period2_nav': values[1],
+                    'confidence': 0.85,  # Good confidence with dates
+                    'source': 'pattern_row_with_dates'
+                })
+            else:
+                # If we have values but no dates
+                results.append({
+                    'period1_label': "Period 1",
+                    'period1_nav': values[0],
+                    'period2_label': "Period 2", 
+                    'period2_nav': values[1],
+                    'confidence': 0.75,  # Lower confidence without dates
+                    'source': 'pattern_row_no_dates'
+                })
     
     # If we haven't found NAV row with values yet, try looking for NAV row and then extract values
     if not results:
-        # Find the NAV line index
-        nav_line_idx = -1
-        for i, line in enumerate(lines):
-            if "net asset value" in line.lower() or "nav" in line.lower().split():
-                nav_line_idx = i
-                break
+        nav_line = scanned.first_line('nav_full', 'nav_abbr')
         
-        # If we found a NAV line, look for values in this line and the next few lines
-        if nav_line_idx >= 0:
-            # Extract all numbers from the NAV line and next two lines
-            values = []
-            for i in range(nav_line_idx, min(nav_line_idx + 3, len(lines))):
-                numbers = re.findall(r"[\d\s,\.\']+", lines[i])
-                for num in numbers:
-                    value = clean_number(num)
-                    if value is not None:
-                        values.append(value)
+        # If we found a NAV line, look for values in this line and the next two lines
+        if nav_line is not None:
+            values = _token_values(scanned.texts('number', start=nav_line.index, end=nav_line.index + 3))
             
             # If we found at least two values
             if len(values) >= 2:
@@ -536,13 +433,12 @@ def direct_table_extraction(pdf_path):
     This approach focuses specifically on the table structure seen in examples.
     """
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        with pdf_document.document(pdf_path) as pdf:
             # Check pages 1-5 for the key figures table
-            for page_num in range(min(5, len(pdf.pages))):
-                page = pdf.pages[page_num]
+            for page_num in pdf.ranked_pages():
                 
                 # Get the text to check for Key Figures section
-                page_text = page.extract_text() or ""
+                page_text = pdf.page_text(page_num)
                 
                 # Only process pages with "Key figures" or "key figures"
                 if "Key figures" in page_text or "key figures" in page_text.lower():
@@ -554,10 +450,10 @@ def direct_table_extraction(pdf_path):
                         {'vertical_strategy': 'lines', 'horizontal_strategy': 'text'}
                     ]:
                         try:
-                            tables = page.extract_tables(table_settings)
+                            tables = pdf.page_tables(page_num, table_settings)
                             
                             # Process each table
-                            for table in tables:
+                            for table_idx, table in enumerate(tables):
                                 if not table or len(table) < 3:  # Skip small tables
                                     continue
                                 
@@ -571,7 +467,7 @@ def direct_table_extraction(pdf_path):
                                         
                                     row_text = " ".join([str(cell).strip() if cell is not None else "" for cell in row])
                                     # Look for dates or month names in header row
-                                    if (re.search(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', row_text) or
+                                    if (nav_scanner.scan_line(row_text).has('date_numeric') or
                                         "september" in row_text.lower() or "december" in row_text.lower() or 
                                         "march" in row_text.lower() or "june" in row_text.lower()):
                                         header_row = row
@@ -617,6 +513,7 @@ def direct_table_extraction(pdf_path):
                                                     header1 = "Period 1"
                                                     header2 = "Period 2"
                                             
+                                            pdf.note_layout('key_figures', page_num, table_settings, table_idx, header_row_idx, row_idx)
                                             return header1, value1, header2, value2
                         except Exception as e:
                             # Continue with next table settings if this fails
@@ -633,66 +530,45 @@ def scan_text_for_nav(pdf_path):
     This is a fallback approach when table extraction fails.
     """
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        with pdf_document.document(pdf_path) as pdf:
             # Extract text from the first few pages
             all_text = ""
-            for page_num in range(min(5, len(pdf.pages))):
-                page_text = pdf.pages[page_num].extract_text() or ""
+            for page_num in range(min(5, pdf.page_count)):
+                page_text = pdf.page_text(page_num)
                 all_text += page_text + "\n"
                 
                 # Check each page individually first
-                lines = page_text.split('\n')
+                scanned = nav_scanner.scan(page_text)
                 
                 # 1. First, look for "Net asset value" line specifically
-                for i, line in enumerate(lines):
-                    if "net asset value" in line.lower():
-                        # Found NAV line - extract numbers
-                        number_matches = re.findall(r"[\d',\.]+", line)
-                        values = []
-                        
-                        for num in number_matches:
-                            value = clean_number(num)
-                            if value is not None and value > 1000:
-                                values.append(value)
+                for line in scanned.lines_with('nav_full'):
+                    # Found NAV line - extract numbers
+                    values = _token_values(line.texts('number'), minimum=1000)
+                    
+                    if len(values) >= 2:
+                        # Look for date headers in previous lines
+                        date_matches = scanned.texts('date_numeric', start=max(0, line.index - 5), end=line.index)
                         
-                        if len(values) >= 2:
-                            # Look for date headers in previous lines
-                            date_matches = []
-                            for j in range(max(0, i-5), i):
-                                date_match = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', lines[j])
-                                if date_match:
-                                    date_matches.extend(date_match)
-                            
+                        if len(date_matches) >= 2:
+                            return date_matches[0], values[0], date_matches[1], values[1]
+                        else:
+                            # Look for dates in the entire page
+                            date_matches = scanned.texts('date_numeric')
                             if len(date_matches) >= 2:
                                 return date_matches[0], values[0], date_matches[1], values[1]
                             else:
-                                # Look for dates in the entire page
-                                date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', page_text)
-                                if len(date_matches) >= 2:
-                                    return date_matches[0], values[0], date_matches[1], values[1]
-                                else:
-                                    return "Period 1", values[0], "Period 2", values[1]
+                                return "Period 1", values[0], "Period 2", values[1]
             
             # If page-by-page approach failed, try with whole text
-            nav_matches = re.finditer(r'(?:[Nn]et\s+[Aa]sset\s+[Vv]alue|NAV)', all_text)
+            scanned = nav_scanner.scan(all_text)
             
-            for match in nav_matches:
-                # Extract text around the match
-                start_pos = max(0, match.start() - 100)
-                end_pos = min(len(all_text), match.end() + 300)
-                context = all_text[start_pos:end_pos]
-                
-                # Find dates in the context
-                dates = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', context)
-                
-                # Find large numbers that could be NAV values
-                number_matches = re.findall(r"[\d',\.]+", context)
-                values = []
+            for line in scanned.lines_with('nav_full', 'nav_abbr'):
+                # Look at the line before the mention and a few after it
+                start, end = max(0, line.index - 1), line.index + 4
+                dates = scanned.texts('date_numeric', start=start, end=end)
                 
-                for num in number_matches:
-                    value = clean_number(num)
-                    if value is not None and value > 10000:  # NAV values are typically large
-                        values.append(value)
+                # NAV values are typically large
+                values = _token_values(scanned.texts('number', start=start, end=end), minimum=10000)
                 
                 if len(dates) >= 2 and len(values) >= 2:
                     return dates[0], values[0], dates[1], values[1]
@@ -708,83 +584,57 @@ def last_resort_extraction(pdf_path):
     This approach focuses on known formats from the examples provided.
     """
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        with pdf_document.document(pdf_path) as pdf:
             # Check first 3 pages
-            for page_num in range(min(3, len(pdf.pages))):
-                page = pdf.pages[page_num]
-                page_text = page.extract_text() or ""
+            for page_num in range(min(3, pdf.page_count)):
+                page_text = pdf.page_text(page_num)
                 
-                # Look specifically for "Net asset value" in a line
-                lines = page_text.split('\n')
+                scanned = nav_scanner.scan(page_text)
                 
                 # First approach: Look for the exact line format with Net asset value
-                for line in lines:
-                    if "net asset value" in line.lower():
-                        # Try to extract exactly two numbers from this line
-                        number_matches = re.findall(r"[\d',\.]+", line)
-                        values = []
-                        
-                        for num in number_matches:
-                            value = clean_number(num)
-                            if value is not None and value > 10000:  # NAV values are typically large
-                                values.append(value)
+                for line in scanned.lines_with('nav_full'):
+                    # Try to extract exactly two numbers from this line
+                    values = _token_values(line.texts('number'), minimum=10000)  # NAV values are typically large
+                    
+                    if len(values) >= 2:
+                        # Extract dates from the page text
+                        date_matches = scanned.texts('date_numeric')
                         
-                        if len(values) >= 2:
-                            # Extract dates from the page text
-                            date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', page_text)
-                            
-                            if len(date_matches) >= 2:
-                                return date_matches[0], values[0], date_matches[1], values[1]
-                            else:
-                                # If no dates found, just use Period 1 and Period 2
-                                return "Period 1", values[0], "Period 2", values[1]
+                        if len(date_matches) >= 2:
+                            return date_matches[0], values[0], date_matches[1], values[1]
+                        else:
+                            # If no dates found, just use Period 1 and Period 2
+                            return "Period 1", values[0], "Period 2", values[1]
                 
                 # Second approach: Look for numeric patterns in lines with dates
-                date_line_idx = -1
-                for i, line in enumerate(lines):
-                    if re.search(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', line):
-                        date_line_idx = i
-                        break
+                date_line = scanned.first_line('date_numeric')
                 
-                if date_line_idx >= 0:
+                if date_line is not None:
                     # Found a line with dates, now look for "Net asset value" within the next 15 lines
-                    for i in range(date_line_idx + 1, min(date_line_idx + 15, len(lines))):
-                        if "net asset value" in lines[i].lower():
+                    for line in scanned.lines[date_line.index + 1:date_line.index + 15]:
+                        if line.has('nav_full'):
                             # Found the NAV line
-                            number_matches = re.findall(r"[\d',\.]+", lines[i])
-                            values = []
-                            
-                            for num in number_matches:
-                                value = clean_number(num)
-                                if value is not None and value > 10000:
-                                    values.append(value)
+                            values = _token_values(line.texts('number'), minimum=10000)
                             
                             if len(values) >= 2:
                                 # Extract dates from the date line
-                                date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', lines[date_line_idx])
+                                date_matches = date_line.texts('date_numeric')
                                 
                                 if len(date_matches) >= 2:
                                     return date_matches[0], values[0], date_matches[1], values[1]
             
             # Third approach: Process all lines looking for specific formats like in the Excel
-            for page_num in range(min(5, len(pdf.pages))):
-                page_text = pdf.pages[page_num].extract_text() or ""
-                lines = page_text.split('\n')
+            for page_num in range(min(5, pdf.page_count)):
+                scanned = nav_scanner.scan(pdf.page_text(page_num))
                 
-                for line in lines:
+                for line in scanned.lines:
                     # Look for lines that match the format "some text number1 number2"
-                    if "asset" in line.lower() or "value" in line.lower():
-                        number_matches = re.findall(r"[\d',\.]+", line)
-                        values = []
-                        
-                        for num in number_matches:
-                            value = clean_number(num)
-                            if value is not None and value > 10000:
-                                values.append(value)
+                    if "asset" in line.lower or "value" in line.lower:
+                        values = _token_values(line.texts('number'), minimum=10000)
                         
                         if len(values) >= 2:
                             # Extract dates from the page text
-                            date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b', page_text)
+                            date_matches = scanned.texts('date_numeric')
                             
                             if len(date_matches) >= 2:
                                 return date_matches[0], values[0], date_matches[1], values[1]
@@ -803,11 +653,10 @@ def extract_partners_group_key_figures(pdf_path):
     - NAV values at the intersection
     """
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        with pdf_document.document(pdf_path) as pdf:
             # Check first few pages for "Key figures" section
-            for page_num in range(min(5, len(pdf.pages))):
-                page = pdf.pages[page_num]
-                page_text = page.extract_text() or ""
+            for page_num in pdf.ranked_pages():
+                page_text = pdf.page_text(page_num)
                 
                 # Debug for page text
                 print(f"\n------ Checking page {page_num+1} ------")
@@ -822,7 +671,7 @@ def extract_partners_group_key_figures(pdf_path):
                     {'vertical_strategy': 'lines', 'horizontal_strategy': 'lines'}
                 ]:
                     try:
-                        tables = page.extract_tables(table_settings)
+                        tables = pdf.page_tables(page_num, table_settings)
                         
                         for table_idx, table in enumerate(tables):
                             if not table or len(table) < 3:  # Key figures tables usually have several rows
@@ -853,13 +702,8 @@ def extract_partners_group_key_figures(pdf_path):
                                     if cell is not None:
                                         cell_text = str(cell).strip()
                                         
-                                        # Check for various date formats with more flexible patterns
-                                        if (re.search(r'\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}', cell_text) or
-                                            re.search(r'\d{1,2}\s*(?:January|February|March|April|May|June|July|August|September|October|November|December)\s*\d{4}', cell_text, re.IGNORECASE) or
-                                            re.search(r'\d{1,2}(?:January|February|March|April|May|June|July|August|September|October|November|December)\d{4}', cell_text, re.IGNORECASE) or
-                                            re.search(r'\d{2}\.\d{2}\.\d{4}', cell_text) or
-                                            ("september" in cell_text.lower() and re.search(r'\d{4}', cell_text)) or
-                                            ("december" in cell_text.lower() and re.search(r'\d{4}', cell_text))):
+                                        # Check for various date formats (numeric, named or month and year)
+                                        if nav_scanner.scan_line(cell_text).has(*nav_scanner.DATE_KINDS):
                                             date_cells.append((j, cell_text))
                                 
                                 if len(date_cells) >= 2:  # Need at least two date columns
@@ -876,14 +720,6 @@ def extract_partners_group_key_figures(pdf_path):
                                 nav_row = None
                                 nav_row_idx = -1
                                 
-                                # Patterns that might indicate a NAV row
-                                nav_patterns = [
-                                    r"net\s*asset\s*value",
-                                    r"\bnav\b",
-                                    r"^net",
-                                    r"asset.*value"
-                                ]
-                                
                                 # Search through ALL rows after the header
                                 for row_idx in range(date_header_idx + 1, len(table)):
                                     row = table[row_idx]
@@ -895,12 +731,10 @@ def extract_partners_group_key_figures(pdf_path):
                                     
                                     print(f"  Checking row {row_idx}, first cell: '{first_cell}'")
                                     
-                                    # Super flexible matching for NAV indicators
-                                    is_nav_row = False
-                                    for pattern in nav_patterns:
-                                        if re.search(pattern, first_cell, re.IGNORECASE):
-                                            is_nav_row = True
-                                            break
+                                    # Super flexible matching for NAV indicators: any NAV
+                                    # label token, or a label starting with "net"
+                                    is_nav_row = (nav_scanner.scan_line(first_cell).has(*nav_scanner.NAV_KINDS)
+                                                  or first_cell.startswith('net'))
                                     
                                     if is_nav_row:
                                         print(f"  FOUND NAV ROW at index {row_idx}: {first_cell}")
@@ -932,6 +766,7 @@ def extract_partners_group_key_figures(pdf_path):
                                         header1 = str(date_header_row[idx1]).strip() if idx1 < len(date_header_row) and date_header_row[idx1] is not None else "Period 1"
                                         header2 = str(date_header_row[idx2]).strip() if idx2 < len(date_header_row) and date_header_row[idx2] is not None else "Period 2"
                                         
+                                        pdf.note_layout('partners_group_key_figures', page_num, table_settings, table_idx, date_header_idx, nav_row_idx)
                                         print(f"EXTRACTION SUCCESSFUL: {header1}: {value1}, {header2}: {value2}")
                                         return header1, value1, header2, value2
                                 else:
@@ -970,7 +805,7 @@ def extract_partners_group_key_figures(pdf_path):
                                         potential_rows.sort(key=lambda x: sum(val for _, val in x[2])/len(x[2]), reverse=True)
                                         
                                         # Use the row with largest average values
-                                        _, best_row, best_values = potential_rows[0]
+                                        best_row_idx, best_row, best_values = potential_rows[0]
                                         
                                         print(f"Using potential NAV row with largest values: {best_row[0]}")
                                         
@@ -981,6 +816,7 @@ def extract_partners_group_key_figures(pdf_path):
                                         header1 = str(date_header_row[idx1]).strip() if idx1 < len(date_header_row) and date_header_row[idx1] is not None else "Period 1"
                                         header2 = str(date_header_row[idx2]).strip() if idx2 < len(date_header_row) and date_header_row[idx2] is not None else "Period 2"
                                         
+                                        pdf.note_layout('partners_group_key_figures', page_num, table_settings, table_idx, date_header_idx, best_row_idx)
                                         print(f"FALLBACK EXTRACTION: {header1}: {value1}, {header2}: {value2}")
                                         return header1, value1, header2, value2
                     except Exception as e:
@@ -1000,70 +836,35 @@ def scan_for_nav_row(page_text, fund_name):
     """
     try:
         print("\nTrying direct text scanning for NAV rows...")
-        lines = page_text.split('\n')
+        scanned = nav_scanner.scan(page_text)
+        nav_lines = scanned.lines_with(*nav_scanner.NAV_KINDS)
         
         # First log all lines that might contain NAV indicators - this helps with debugging
-        nav_indicators = ["net asset value", "net asset", "nav ", " nav", "asset value"]
-        
         print("Searching for lines containing NAV indicators...")
-        for i, line in enumerate(lines):
-            for indicator in nav_indicators:
-                if indicator in line.lower():
-                    print(f"Potential NAV line {i}: {line}")
-                    # Try to extract numbers directly from this line
-                    number_matches = re.findall(r"[\d',\.]+", line)
-                    values = []
-                    for num_str in number_matches:
-                        value = clean_number(num_str)
-                        if value is not None:
-                            values.append(value)
-                    
-                    if len(values) >= 2:
-                        print(f"Found values directly from line: {values}")
-        
-        # Look for date headers in the text
-        date_lines = []
-        for i, line in enumerate(lines):
-            if (re.search(r'\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}', line) or
-                re.search(r'\d{1,2}\s*(?:January|February|March|April|May|June|July|August|September|October|November|December)\s*\d{4}', line, re.IGNORECASE) or
-                re.search(r'\d{2}(?:September|December|March|June)\d{4}', line, re.IGNORECASE)):
-                date_lines.append((i, line))
+        for line in nav_lines:
+            print(f"Potential NAV line {line.index}: {line.text}")
+            # Try to extract numbers directly from this line
+            values = _token_values(line.texts('number'))
+            
+            if len(values) >= 2:
+                print(f"Found values directly from line: {values}")
         
         # If we found date lines, look for NAV rows after them
-        for date_idx, date_line in date_lines:
-            # Extract dates from this line
-            dates = []
-            date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}\b|\b\d{2}(?:September|December|March|June)\d{4}\b', date_line, re.IGNORECASE)
-            if date_matches:
-                dates = date_matches
-            else:
-                # If no structured dates found, look for month names with years
-                month_matches = re.findall(r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s*\d{4}\b|\b\d{2}(?:Sep|Dec|Mar|Jun)[a-z]*\d{4}\b', date_line, re.IGNORECASE)
-                if month_matches:
-                    dates = month_matches
+        for date_line in scanned.lines_with(*nav_scanner.DATE_KINDS):
+            # Extract dates from this line; if no full dates are found, use month names with years
+            dates = date_line.texts(*nav_scanner.DAY_DATE_KINDS) or date_line.texts('date_month')
             
             # If we found dates, look for NAV rows within the next 20 lines
-            if dates and len(dates) >= 2:
+            if len(dates) >= 2:
                 print(f"Found date line with dates: {dates}")
                 
                 # Look for NAV rows after the date line
-                for i in range(date_idx + 1, min(date_idx + 20, len(lines))):
-                    line = lines[i].lower()
-                    
-                    # Use a more flexible check for NAV indicators
-                    has_nav_indicator = any(indicator in line for indicator in nav_indicators)
-                    
-                    if has_nav_indicator:
-                        print(f"Found potential NAV line after dates: {lines[i]}")
+                for line in scanned.lines[date_line.index + 1:date_line.index + 20]:
+                    if line.has(*nav_scanner.NAV_KINDS):
+                        print(f"Found potential NAV line after dates: {line.text}")
                         
                         # Extract all numbers from this line
-                        number_matches = re.findall(r"[\d',\.]+", lines[i])
-                        values = []
-                        
-                        for num_str in number_matches:
-                            value = clean_number(num_str)
-                            if value is not None:
-                                values.append(value)
+                        values = _token_values(line.texts('number'))
                         
                         # If we found at least 2 values, return them
                         if len(values) >= 2:
@@ -1071,83 +872,222 @@ def scan_for_nav_row(page_text, fund_name):
                             return dates[0], values[0], dates[1], values[1]
         
         # If we haven't found anything yet, try one more approach: scan for "net asset value" row and extract ALL numbers from it
-        for i, line in enumerate(lines):
-            line_lower = line.lower()
+        for line in nav_lines:
+            # Found a potential NAV line - extract ALL numbers from it
+            values = _token_values(line.texts('number'), minimum=1000)  # NAV values are typically large
             
-            # Look for any line that might contain NAV indication
-            is_nav_line = False
-            for indicator in nav_indicators:
-                if indicator in line_lower:
-                    is_nav_line = True
-                    break
-                    
-            if is_nav_line:
-                # Found a potential NAV line - extract ALL numbers from it
-                number_matches = re.findall(r"[\d',\.]+", line)
-                values = []
+            # If we found at least 2 values
+            if len(values) >= 2:
+                print(f"Found numeric values in potential NAV line: {values}")
                 
-                for num_str in number_matches:
-                    value = clean_number(num_str)
-                    if value is not None and value > 1000:  # NAV values are typically large
-                        values.append(value)
+                # Look for dates in the 10 lines before this one, also in header format like "September 2024"
+                context_start = max(0, line.index - 10)
+                date_matches = (scanned.texts(*nav_scanner.DAY_DATE_KINDS, start=context_start, end=line.index)
+                                or scanned.texts('date_month', start=context_start, end=line.index))
                 
-                # If we found at least 2 values
-                if len(values) >= 2:
-                    print(f"Found numeric values in potential NAV line: {values}")
-                    
-                    # Look for dates in the 10 lines before this one
-                    date_context = "\n".join(lines[max(0, i-10):i])
-                    date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b|\b\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}\b', date_context, re.IGNORECASE)
-                    
-                    # Also look for dates in header format like "30 September 2024"
-                    if not date_matches:
-                        header_date_patterns = [
-                            r'\b\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}\b',
-                            r'\b\d{2}(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s*\d{4}\b',
-                            r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}\b'
-                        ]
-                        
-                        for pattern in header_date_patterns:
-                            matches = re.findall(pattern, date_context, re.IGNORECASE)
-                            if matches:
-                                date_matches.extend(matches)
+                if len(date_matches) >= 2:
+                    print(f"Extracted values with dates from context: {values}, {date_matches}")
+                    return date_matches[0], values[0], date_matches[1], values[1]
+                else:
+                    # If no dates found in previous lines, look in the entire document
+                    date_matches = scanned.texts(*nav_scanner.DAY_DATE_KINDS)
                     
                     if len(date_matches) >= 2:
-                        print(f"Extracted values with dates from context: {values}, {date_matches}")
+                        print(f"Extracted values with dates from full document: {values}, {date_matches[:2]}")
                         return date_matches[0], values[0], date_matches[1], values[1]
                     else:
-                        # If no dates found in previous lines, look in the entire document
-                        date_matches = re.findall(r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b|\b\d{2}\.\d{2}\.\d{4}\b|\b\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}\b', page_text, re.IGNORECASE)
-                        
-                        if len(date_matches) >= 2:
-                            print(f"Extracted values with dates from full document: {values}, {date_matches[:2]}")
-                            return date_matches[0], values[0], date_matches[1], values[1]
-                        else:
-                            print(f"Extracted values but no dates found: {values}")
-                            return "Period 1", values[0], "Period 2", values[1]
+                        print(f"Extracted values but no dates found: {values}")
+                        return "Period 1", values[0], "Period 2", values[1]
     except Exception as e:
         print(f"Error in direct text scanning: {str(e)}")
     
     return None, None, None, None
 
 
-def process_pdf_comprehensive(pdf_path):
+# Strategies whose table layout can be saved as a template
+TEMPLATE_STRATEGIES = ('partners_group_key_figures', 'key_figures')
+
+
+def _normalise_label(text):
+    return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+
+def extract_with_template(pdf, template):
+    """
+    Crop the header and NAV rows recorded in a layout template and parse them.
+    Returns (label1, nav1, label2, nav2), or four Nones when the regions no
+    longer validate (NAV label moved, fewer than two values or dates).
+    """
+    try:
+        if template['page'] >= pdf.page_count:
+            return None, None, None, None
+        nav_text = _normalise_label(pdf.region_text(template['page'], template['nav_bbox']))
+        header_text = pdf.region_text(template['page'], template['header_bbox'])
+    except Exception as e:
+        print(f"Error applying layout template: {str(e)}")
+        return None, None, None, None
+    
+    label = template['nav_label'] or ''
+    if not nav_text.startswith(label):
+        return None, None, None, None
+    
+    values = _token_values(nav_scanner.scan_line(nav_text).texts('number', after=len(label)))
+    dates = nav_scanner.scan(header_text).texts(*nav_scanner.DAY_DATE_KINDS)
+    if len(values) < 2 or len(dates) < 2:
+        return None, None, None, None
+    return dates[0], values[0], dates[1], values[1]
+
+
+def learn_template(pdf, strategy, period1_nav, period2_nav):
+    """
+    Build a layout template from where strategy found its table result, or
+    None if the cropped regions do not reproduce the same NAV values.
+    """
+    layout = pdf.layouts.get(strategy)
+    if not layout:
+        return None
+    header_bbox = pdf.table_row_bbox(layout['page'], layout['settings'], layout['table_index'], layout['header_row'])
+    nav_bbox = pdf.table_row_bbox(layout['page'], layout['settings'], layout['table_index'], layout['nav_row'])
+    if header_bbox is None or nav_bbox is None:
+        return None
+    
+    # The row label is whatever precedes the first digit, e.g. "net asset value"
+    nav_text = _normalise_label(pdf.region_text(layout['page'], nav_bbox))
+    template = {
+        'strategy': strategy,
+        'page': layout['page'],
+        'settings': layout['settings'],
+        'header_bbox': header_bbox,
+        'nav_bbox': nav_bbox,
+        'nav_label': re.split(r'\d', nav_text, 1)[0].strip(),
+    }
+    _, value1, _, value2 = extract_with_template(pdf, template)
+    if (value1, value2) != (period1_nav, period2_nav):
+        return None
+    return template
+
+
+def _nav_candidate(period1_label, period1_nav, period2_label, period2_nav, confidence, source):
+    """
+    A one-element candidate list for a strategy's (label, nav, label, nav)
+    result, or an empty list if it found nothing.
+    """
+    if period1_nav is None or period2_nav is None:
+        return []
+    return [{
+        'period1_label': period1_label,
+        'period1_nav': period1_nav,
+        'period2_label': period2_label,
+        'period2_nav': period2_nav,
+        'confidence': confidence,
+        'source': source
+    }]
+
+
+def _run_direct_text_scan(pdf, fund_name, pdf_info):
+    # High confidence for direct text scan
+    return _nav_candidate(*scan_for_nav_row(extract_text_multi_library(pdf), fund_name), 0.9, 'direct_text_scan')
+
+
+def _run_enhanced_patterns(pdf, fund_name, pdf_info):
+    return extract_nav_with_enhanced_patterns(extract_text_multi_library(pdf))
+
+
+def _run_table_extraction(pdf, fund_name, pdf_info):
+    return extract_nav_from_tables(extract_tables_multi_library(pdf, pdf_info))
+
+
+def _run_key_figures(pdf, fund_name, pdf_info):
+    # High confidence for key figures
+    return _nav_candidate(*direct_table_extraction(pdf), 0.85, 'key_figures')
+
+
+# Fallback strategies in their default order, with rough prior costs in seconds;
+# strategy_planner reorders them from the recorded hit rates and timings
+FALLBACK_STRATEGIES = [
+    strategy_planner.Strategy('direct_text_scan', _run_direct_text_scan, prior_seconds=0.05),
+    strategy_planner.Strategy('enhanced_patterns', _run_enhanced_patterns, prior_seconds=0.05),
+    strategy_planner.Strategy('tables', _run_table_extraction, prior_seconds=1.0,
+                              applies=lambda pdf, fund_name, pdf_info: pdf_info["has_tables"]),
+    strategy_planner.Strategy('key_figures', _run_key_figures, prior_seconds=0.5,
+                              applies=lambda pdf, fund_name, pdf_info: pdf_info["has_key_figures_section"]),
+]
+
+
+def process_pdf_comprehensive(pdf_path, templates_path=layout_templates.TEMPLATES_PATH,
+                              stats_path=strategy_planner.STATS_PATH,
+                              confidence_threshold=strategy_planner.CONFIDENCE_THRESHOLD):
     """
     Process a PDF using multiple approaches in an intelligent sequence.
+    templates_path is the layout template store and stats_path the strategy
+    statistics store (None to disable either); fallback strategies stop once a
+    result reaches confidence_threshold (None to run them all).
+    """
+    # The file is parsed once and every strategy below reads from the same
+    # document, so pages are only extracted (and tables only detected) once
+    with pdf_document.PDFDocument(pdf_path) as pdf:
+        return _process_with_stores(pdf, templates_path, stats_path, confidence_threshold)
+
+
+def process_pdf_with_page_stats(pdf_path, templates_path=layout_templates.TEMPLATES_PATH,
+                                stats_path=strategy_planner.STATS_PATH,
+                                confidence_threshold=strategy_planner.CONFIDENCE_THRESHOLD):
+    """
+    process_pdf_comprehensive(), also returning the page-ranking statistics
+    (pdf_document.PDFDocument.page_stats()) for the file.
     """
+    with pdf_document.PDFDocument(pdf_path) as pdf:
+        return _process_with_stores(pdf, templates_path, stats_path, confidence_threshold), pdf.page_stats()
+
+
+def _process_with_stores(pdf, templates_path, stats_path, confidence_threshold):
+    templates = layout_templates.TemplateStore(templates_path) if templates_path else None
+    stats = strategy_planner.StrategyStats(stats_path) if stats_path else None
+    try:
+        return _process_pdf_comprehensive(pdf, templates, stats, confidence_threshold)
+    finally:
+        if templates:
+            templates.close()
+        if stats:
+            stats.close()
+
+
+def _process_pdf_comprehensive(pdf, templates=None, stats=None, confidence_threshold=strategy_planner.CONFIDENCE_THRESHOLD):
     # Step 1: Extract fund name
-    fund_name = extract_fund_name(pdf_path)
-    print(f"\nProcessing: {os.path.basename(pdf_path)}")
+    fund_name = extract_fund_name(pdf)
+    print(f"\nProcessing: {os.path.basename(pdf.path)}")
     print(f"Fund name identified: {fund_name}")
     
+    # Step 1b: Last known layout for this fund, straight from the cropped regions
+    key = layout_templates.template_key(fund_name) if fund_name != "Unknown Fund" else ""
+    template = templates.get(key) if templates and key else None
+    if template:
+        period1_label, period1_nav, period2_label, period2_nav = extract_with_template(pdf, template)
+        if period1_nav is not None and period2_nav is not None:
+            print(f"Layout template matched ({template['strategy']}, page {template['page'] + 1})")
+            templates.record(key, hit=True)
+            pdf.note_result_page(template['page'], 'template')
+            return {
+                'Fund Name': fund_name,
+                'Period 1 Label': period1_label,
+                'Period 1 NAV': period1_nav,
+                'Period 2 Label': period2_label,
+                'Period 2 NAV': period2_nav,
+                'PDF Filename': os.path.basename(pdf.path),
+                'Extraction Method': 'template',
+                'Confidence': 0.97
+            }
+        print("Layout template did not validate, running the full extraction...")
+        templates.record(key, hit=False)
+    
     # Step 2: Analyze PDF structure to determine best approach
-    pdf_info = analyze_pdf_structure(pdf_path)
+    pdf_info = analyze_pdf_structure(pdf)
     
     results = []
     
     # PRIORITY 1: Always try Partners Group Key Figures approach first for ALL funds
     print("Trying Partners Group Key Figures approach first...")
-    period1_label, period1_nav, period2_label, period2_nav = extract_partners_group_key_figures(pdf_path)
+    period1_label, period1_nav, period2_label, period2_nav = extract_partners_group_key_figures(pdf)
     if period1_nav is not None and period2_nav is not None:
         results.append({
             'period1_label': period1_label,
@@ -1160,7 +1100,7 @@ def process_pdf_comprehensive(pdf_path):
     else:
         # PRIORITY 2: If Partners Group approach fails, try last resort
         print("Partners Group approach failed, trying last resort...")
-        period1_label, period1_nav, period2_label, period2_nav = last_resort_extraction(pdf_path)
+        period1_label, period1_nav, period2_label, period2_nav = last_resort_extraction(pdf)
         if period1_nav is not None and period2_nav is not None:
             results.append({
                 'period1_label': period1_label,
@@ -1171,65 +1111,34 @@ def process_pdf_comprehensive(pdf_path):
                 'source': 'last_resort'
             })
     
-    # If both priority methods failed, try remaining approaches
+    # If both priority methods failed, try the remaining approaches, cheapest
+    # and most productive first, until one is confident enough
     if not results:
-        # Step 3: Try direct text scanning 
-        text = extract_text_multi_library(pdf_path)
-        period1_label, period1_nav, period2_label, period2_nav = scan_for_nav_row(text, fund_name)
-        if period1_nav is not None and period2_nav is not None:
-            results.append({
-                'period1_label': period1_label,
-                'period1_nav': period1_nav,
-                'period2_label': period2_label,
-                'period2_nav': period2_nav,
-                'confidence': 0.9,  # High confidence for direct text scan
-                'source': 'direct_text_scan'
-            })
-        
-        # Step 4: Extract NAV using enhanced patterns from text
-        pattern_results = extract_nav_with_enhanced_patterns(text)
-        if pattern_results:
-            results.extend(pattern_results)
-        
-        # Step 5: Table-based extraction if the PDF likely has tables
-        if pdf_info["has_tables"]:
-            tables_data = extract_tables_multi_library(pdf_path)
-            table_results = extract_nav_from_tables(tables_data)
-            if table_results:
-                results.extend(table_results)
-        
-        # Step 6: If we have Key Figures section, use specialized approach
-        if pdf_info["has_key_figures_section"]:
-            # Use the original direct_table_extraction function
-            period1_label, period1_nav, period2_label, period2_nav = direct_table_extraction(pdf_path)
-            if period1_nav is not None and period2_nav is not None:
-                results.append({
-                    'period1_label': period1_label,
-                    'period1_nav': period1_nav,
-                    'period2_label': period2_label,
-                    'period2_nav': period2_nav,
-                    'confidence': 0.85,  # High confidence for key figures
-                    'source': 'key_figures'
-                })
+        candidates, observations = strategy_planner.run_plan(FALLBACK_STRATEGIES, (pdf, fund_name, pdf_info),
+                                                             stats=stats, threshold=confidence_threshold)
+        print("Fallback strategies run: " + ", ".join(f"{name} ({'hit' if hit else 'miss'}, {seconds:.2f}s)"
+                                                      for name, hit, seconds in observations))
+        results.extend(candidates)
         
         # Step 7: If all else fails, try text scanning as final fallback
         if not results:
-            period1_label, period1_nav, period2_label, period2_nav = scan_text_for_nav(pdf_path)
-            if period1_nav is not None and period2_nav is not None:
-                results.append({
-                    'period1_label': period1_label,
-                    'period1_nav': period1_nav,
-                    'period2_label': period2_label,
-                    'period2_nav': period2_nav,
-                    'confidence': 0.6,
-                    'source': 'scan_text'
-                })
+            period1_label, period1_nav, period2_label, period2_nav = scan_text_for_nav(pdf)
+            results.extend(_nav_candidate(period1_label, period1_nav, period2_label, period2_nav, 0.6, 'scan_text'))
     
     # Step 8: Select best result based on confidence
     if results:
         # Sort by confidence
         results.sort(key=lambda x: x['confidence'], reverse=True)
         best_result = results[0]
+        if best_result['source'].startswith('table_p'):
+            pdf.note_result_page(int(best_result['source'][len('table_p'):]), 'tables')
+        
+        # Remember this fund's layout so next month's report can skip the cascade
+        if templates and key and best_result['source'] in TEMPLATE_STRATEGIES:
+            learned = learn_template(pdf, best_result['source'], best_result['period1_nav'], best_result['period2_nav'])
+            if learned:
+                templates.save(key, learned['strategy'], learned['page'], learned['settings'],
+                               learned['header_bbox'], learned['nav_bbox'], learned['nav_label'])
         
         return {
             'Fund Name': fund_name,
@@ -1237,80 +1146,79 @@ def process_pdf_comprehensive(pdf_path):
             'Period 1 NAV': best_result['period1_nav'],
             'Period 2 Label': best_result['period2_label'],
             'Period 2 NAV': best_result['period2_nav'],
-            'PDF Filename': os.path.basename(pdf_path),
+            'PDF Filename': os.path.basename(pdf.path),
             'Extraction Method': best_result['source'],
             'Confidence': best_result['confidence']
         }
     
     # If all approaches failed
-    return {
-        'Fund Name': fund_name,
-        'Period 1 Label': 'Period 1',
-        'Period 1 NAV': None,
-        'Period 2 Label': 'Period 2',
-        'Period 2 NAV': None,
-        'PDF Filename': os.path.basename(pdf_path),
-        'Extraction Method': 'failed',
-        'Confidence': 0.0
-    }
+    result = failed_result(pdf.path)
+    result['Fund Name'] = fund_name
+    return result
 
 
-def format_excel(excel_path):
+def write_excel(results, excel_path):
     """
-    Apply formatting to the Excel file for better readability.
+    Stream the results to a formatted Excel file (styled header, sized columns,
+    NAV columns as numbers) without building the workbook in memory.
     """
     try:
-        wb = openpyxl.load_workbook(excel_path)
-        ws = wb.active
-        
-        # Apply header formatting
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = openpyxl.utils.get_column_letter(column[0].column)
-            
-            for cell in column:
-                if cell.value:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-            
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Format numeric values
-        for row in ws.iter_rows(min_row=2):
-            for cell in row[2:]:  # Apply only to NAV columns
-                if isinstance(cell.value, (int, float)):
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal='right')
-        
-        wb.save(excel_path)
+        columns = list(results[0].keys()) if results else []
+        # NAV columns start at the third column
+        number_formats = {i: '#,##0.00' for i in range(2, len(columns))}
+        report_writer.write_records(excel_path, results, columns=columns, header_color=report_writer.HEADER_STEEL,
+                                    number_formats=number_formats, width_scale=1.2, max_width=80, freeze_header=False)
         return True
     except Exception as e:
-        print(f"Error formatting Excel file: {str(e)}")
+        print(f"Error writing Excel file: {str(e)}")
         return False
 
 
-def main():
+def failed_result(pdf_path, method='failed'):
+    """
+    Result row for a file no NAV could be extracted from.
+    """
+    return {
+        'Fund Name': 'Unknown Fund',
+        'Period 1 Label': 'Period 1',
+        'Period 1 NAV': None,
+        'Period 2 Label': 'Period 2',
+        'Period 2 NAV': None,
+        'PDF Filename': os.path.basename(pdf_path),
+        'Extraction Method': method,
+        'Confidence': 0.0
+    }
+
+
+def main(argv=None):
     """
     Main function to process a folder of PDF files.
     """
+    parser = argparse.ArgumentParser(description="Extract fund names and NAV values from a folder of PDF reports.")
+    parser.add_argument('folder', nargs='?', help="Folder containing the PDF files; prompts if omitted.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="PDFs processed in parallel.")
+    parser.add_argument('--timeout', type=float, default=pdf_batch.DEFAULT_TIMEOUT,
+                        help="Seconds a single PDF may take before its worker is killed (0 for no limit).")
+    parser.add_argument('--max-memory', type=int, default=pdf_batch.DEFAULT_MAX_MEMORY_MB,
+                        help="MB a worker may use before it is killed (0 for no limit).")
+    parser.add_argument('--verbose', action='store_true', help="Print each file's extraction log.")
+    parser.add_argument('--force', action='store_true', help="Re-extract every PDF, ignoring cached results.")
+    parser.add_argument('--templates', default=layout_templates.TEMPLATES_PATH,
+                        help="Per-fund layout template store (default: next to this script).")
+    parser.add_argument('--no-templates', action='store_true', help="Always run the full extraction cascade.")
+    parser.add_argument('--confidence-threshold', type=float, default=strategy_planner.CONFIDENCE_THRESHOLD,
+                        help="Stop the fallback strategies once a result is this confident (0 to run them all).")
+    parser.add_argument('--strategy-stats', default=strategy_planner.STATS_PATH,
+                        help="Per-strategy hit rate and timing store used to order the fallbacks.")
+    parser.add_argument('--cache', default=None,
+                        help=f"Result cache database (default: {result_cache.CACHE_NAME} in the PDF folder).")
+    args = parser.parse_args(argv)
+
     print("=== Comprehensive PDF NAV Extraction Tool ===")
     print("This tool extracts fund names and NAV values from PDF documents using multiple approaches.")
     
     # Folder containing PDF files
-    pdf_folder = input("Enter the path to the folder containing PDF files: ")
+    pdf_folder = args.folder or input("Enter the path to the folder containing PDF files: ")
     
     # Check if the folder exists
     if not os.path.isdir(pdf_folder):
@@ -1318,57 +1226,115 @@ def main():
         return
     
     # Find all PDF files in the folder
-    pdf_files = glob.glob(os.path.join(pdf_folder, "*.pdf"))
+    pdf_files = sorted(glob.glob(os.path.join(pdf_folder, "*.pdf")))
     
     if not pdf_files:
         print(f"No PDF files found in folder '{pdf_folder}'.")
         return
     
-    print(f"Found {len(pdf_files)} PDF files. Processing...")
+    templates_path = None if args.no_templates else args.templates
+    confidence_threshold = args.confidence_threshold or None
+    # Unchanged reports are served from the result cache, but only to runs with
+    # the same result-affecting options: the templates as they are now, and the
+    # fallback order when an early exit makes it matter
+    templates_digest = None
+    if templates_path:
+        templates = layout_templates.TemplateStore(templates_path)
+        templates_digest = templates.digest()
+        templates.close()
+    strategy_order = None
+    if confidence_threshold is not None and args.strategy_stats:
+        strategy_stats = strategy_planner.StrategyStats(args.strategy_stats)
+        strategy_order = [strategy.name for strategy in strategy_planner.plan(FALLBACK_STRATEGIES, strategy_stats)]
+        strategy_stats.close()
+    cache_version = result_cache.options_version(
+        EXTRACTOR_VERSION,
+        templates=templates_digest,
+        strategy_order=strategy_order,
+        confidence_threshold=confidence_threshold,
+    )
+    cache = result_cache.ResultCache(args.cache or os.path.join(pdf_folder, result_cache.CACHE_NAME))
+    hashes, cached = result_cache.split_cached(cache, pdf_files, EXTRACTOR_NAME, cache_version, force=args.force)
+    to_process = [pdf_path for pdf_path in pdf_files if pdf_path not in cached]
     
-    # Process each PDF file using the comprehensive approach
-    results = []
-    success_count = 0
-    failure_count = 0
+    success_count = sum(1 for result in cached.values()
+                        if result['Period 1 NAV'] is not None and result['Period 2 NAV'] is not None)
+    failure_count = len(cached) - success_count
+    page_stats = pdf_document.PageStatsLog(os.path.join(pdf_folder, pdf_document.PAGE_STATS_NAME))
+    print(f"Found {len(pdf_files)} PDF files, {len(cached)} unchanged since the last run. "
+          f"Processing {len(to_process)} with {args.workers} worker(s)...")
     
-    for i, pdf_path in enumerate(pdf_files):
-        print(f"Processing {i+1}/{len(pdf_files)}: {os.path.basename(pdf_path)}...")
-        
-        # Use the comprehensive approach
-        result = process_pdf_comprehensive(pdf_path)
-        results.append(result)
-        
-        if result['Period 1 NAV'] is not None and result['Period 2 NAV'] is not None:
+    def report(file_result, done, total):
+        nonlocal success_count, failure_count
+        name = os.path.basename(file_result.path)
+        if args.verbose and file_result.output:
+            print(file_result.output)
+        if file_result.ok:
+            file_result.value, stats = file_result.value
+            page_stats.record(name, stats)
+        result = file_result.value
+        if file_result.ok and file_result.path in hashes:
+            cache.put(hashes[file_result.path], EXTRACTOR_NAME, cache_version, result,
+                      result['Extraction Method'], result['Confidence'])
+        if file_result.ok and result['Period 1 NAV'] is not None and result['Period 2 NAV'] is not None:
             success_count += 1
-            print(f"  ✓ Success! Method: {result['Extraction Method']} (Confidence: {result['Confidence']:.2f})")
+            print(f"[{done}/{total}] ✓ {name}: {result['Extraction Method']} (Confidence: {result['Confidence']:.2f}, {file_result.seconds:.1f}s)")
             print(f"    {result['Period 1 Label']}: {result['Period 1 NAV']}")
             print(f"    {result['Period 2 Label']}: {result['Period 2 NAV']}")
         else:
             failure_count += 1
-            print(f"  ✗ Failed to extract NAV values")
+            reason = file_result.error or "no NAV values found"
+            print(f"[{done}/{total}] ✗ {name}: {reason}")
     
-    # Create DataFrame from results
-    df = pd.DataFrame(results)
+    # Results come back in the order of to_process, whatever order they finish in
+    try:
+        worker = functools.partial(process_pdf_with_page_stats, templates_path=templates_path,
+                                   stats_path=args.strategy_stats,
+                                   confidence_threshold=confidence_threshold)
+        file_results = pdf_batch.run_batch(worker, to_process, workers=args.workers,
+                                           timeout=args.timeout or None, max_memory_mb=args.max_memory or None,
+                                           on_result=report)
+        result_ranks = page_stats.result_ranks()
+        strategy_stats = strategy_planner.StrategyStats(args.strategy_stats)
+        strategy_order = strategy_planner.plan(FALLBACK_STRATEGIES, strategy_stats)
+        recorded = strategy_stats.snapshot()
+        strategy_stats.close()
+    finally:
+        cache.close()
+        page_stats.close()
+    processed = {r.path: r.value if r.ok else failed_result(r.path, 'timeout' if r.error.startswith('Timed out') else 'error')
+                 for r in file_results}
+    results = [cached[pdf_path] if pdf_path in cached else processed[pdf_path] for pdf_path in pdf_files]
     
     # Create output Excel file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_path = os.path.join(pdf_folder, f"Fund_NAV_Summary_{timestamp}.xlsx")
     
     # Export to Excel
-    df.to_excel(output_path, index=False)
-    
-    # Format the Excel file
-    format_excel(output_path)
+    write_excel(results, output_path)
     
     print(f"\nProcessing complete. Results saved to: {output_path}")
     print(f"Success: {success_count}/{len(pdf_files)} ({success_count/len(pdf_files)*100:.1f}%)")
     print(f"Failed: {failure_count}/{len(pdf_files)} ({failure_count/len(pdf_files)*100:.1f}%)")
     
     # Show extraction method statistics
-    method_stats = df['Extraction Method'].value_counts()
+    method_stats = Counter(result['Extraction Method'] for result in results)
     print("\nExtraction Method Statistics:")
-    for method, count in method_stats.items():
+    for method, count in method_stats.most_common():
         print(f"  {method}: {count} ({count/len(pdf_files)*100:.1f}%)")
+    
+    # Which pre-pass rank the pages that table strategies took results from had
+    if result_ranks:
+        print("\nResult Page Rank Statistics (all runs):")
+        for rank, count in sorted(result_ranks.items(), key=lambda item: (item[0] is None, item[0] or 0)):
+            print(f"  {'unranked' if rank is None else f'rank {rank}'}: {count}")
+    
+    # Order the fallback strategies will be tried in next run
+    print("\nFallback Strategy Order (all runs):")
+    for strategy in strategy_order:
+        runs, hits, seconds = recorded.get(strategy.name, (0, 0, 0.0))
+        average = f"{seconds / runs:.2f}s avg" if runs else "no runs yet"
+        print(f"  {strategy.name}: {hits}/{runs} hits, {average}")
 
 
 if __name__ == "__main__":
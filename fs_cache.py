@@ -0,0 +1,87 @@
+import os
+import threading
+
+# Per-run cache of filesystem metadata for the routed save directories.
+#
+# Thousands of emails land in a few hundred base/year/month folders on the same
+# share, so instead of stat-ing the directory and every candidate filename per
+# email, each directory is listed once with scandir and the name set is kept up
+# to date as files are saved. Names are compared with os.path.normcase, which
+# makes lookups case-insensitive on Windows like the share itself.
+
+class DirectoryCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._existing_dirs = set()
+        self._listings = {}
+        self.scans = 0
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def ensure_dir(self, path):
+        """
+        Create path (and parents) unless this run has already seen it exist.
+        """
+        key = self._key(path)
+        with self._lock:
+            if key in self._existing_dirs:
+                return
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._existing_dirs.add(key)
+            self._listings.setdefault(key, None)
+
+    def _names(self, directory):
+        key = self._key(directory)
+        with self._lock:
+            names = self._listings.get(key)
+            if names is not None:
+                return names
+        names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    names.add(os.path.normcase(entry.name))
+            exists = True
+        except FileNotFoundError:
+            exists = False
+        with self._lock:
+            self.scans += 1
+            # Another thread may have listed it meanwhile; keep whichever is already there
+            names = self._listings.get(key) or names
+            self._listings[key] = names
+            if exists:
+                self._existing_dirs.add(key)
+        return names
+
+    def exists(self, path):
+        directory, name = os.path.split(path)
+        names = self._names(directory or '.')
+        with self._lock:
+            return os.path.normcase(name) in names
+
+    def add(self, path):
+        """
+        Record a file this run has just written (or reserved) at path.
+        """
+        directory, name = os.path.split(path)
+        names = self._names(directory or '.')
+        with self._lock:
+            names.add(os.path.normcase(name))
+
+    def unique_path(self, directory, filename_base, extension, reserved=None):
+        """
+        Return the first free '<base><ext>', '<base>_1<ext>', ... in directory using
+        the cached listing. Callers add() the path once the file is written.
+        reserved is an optional callable for paths taken outside the cache.
+        """
+        filename = f"{filename_base}{extension}"
+        full_path = os.path.join(directory, filename)
+        counter = 1
+        while self.exists(full_path) or (reserved is not None and reserved(full_path)):
+            filename = f"{filename_base}_{counter}{extension}"
+            full_path = os.path.join(directory, filename)
+            counter += 1
+        return filename, full_path
@@ -0,0 +1,107 @@
+import os
+import re
+import json
+import hashlib
+import time
+import sqlite3
+
+# Per-fund layout templates for the NAV extractor (extract_pdfv2.py).
+#
+# Funds send the same report layout every month, so when a table strategy finds
+# a fund's NAV, the page, table settings and the bounding boxes of the date
+# header row and the NAV row are saved under the fund's key. On the next report
+# the extractor crops those two regions and parses them directly; only if that
+# fails validation (label moved, values or dates missing) does it fall back to
+# the full strategy cascade, which then refreshes the template.
+#
+# Templates are meant to outlive the monthly folders, so the store defaults to a
+# file next to the scripts rather than next to the PDFs.
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layout_templates.sqlite3')
+
+def template_key(name):
+    """
+    Normalised key for a fund name (or sender address): lower-cased, single
+    spaces, no surrounding punctuation.
+    """
+    return re.sub(r'\s+', ' ', str(name or '')).strip(' .,;:-').lower()
+
+class TemplateStore:
+    def __init__(self, db_path=TEMPLATES_PATH):
+        self.db_path = db_path
+        # Batch workers share the file, so wait for each other's writes
+        self._db = sqlite3.connect(db_path, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS templates ("
+            " template_key TEXT PRIMARY KEY,"
+            " strategy TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " settings TEXT,"
+            " header_bbox TEXT NOT NULL,"
+            " nav_bbox TEXT NOT NULL,"
+            " nav_label TEXT,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " misses INTEGER NOT NULL DEFAULT 0,"
+            " updated REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        """
+        Return the template for key as a dict, or None.
+        """
+        row = self._db.execute(
+            "SELECT strategy, page, settings, header_bbox, nav_bbox, nav_label, hits, misses"
+            " FROM templates WHERE template_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        strategy, page, settings, header_bbox, nav_bbox, nav_label, hits, misses = row
+        return {
+            'strategy': strategy,
+            'page': page,
+            'settings': json.loads(settings) if settings else None,
+            'header_bbox': tuple(json.loads(header_bbox)),
+            'nav_bbox': tuple(json.loads(nav_bbox)),
+            'nav_label': nav_label,
+            'hits': hits,
+            'misses': misses,
+        }
+
+    def save(self, key, strategy, page, settings, header_bbox, nav_bbox, nav_label):
+        """
+        Create or replace the template for key, keeping its hit/miss counts.
+        """
+        with self._db:
+            self._db.execute(
+                "INSERT INTO templates"
+                " (template_key, strategy, page, settings, header_bbox, nav_bbox, nav_label, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (template_key) DO UPDATE SET strategy = excluded.strategy, page = excluded.page,"
+                " settings = excluded.settings, header_bbox = excluded.header_bbox, nav_bbox = excluded.nav_bbox,"
+                " nav_label = excluded.nav_label, updated = excluded.updated",
+                (key, strategy, page, json.dumps(settings), json.dumps(list(header_bbox)),
+                 json.dumps(list(nav_bbox)), nav_label, time.time()),
+            )
+
+    def digest(self):
+        """
+        SHA-256 over every template's layout (not its hit counts), which changes
+        whenever a template is learned or refreshed.
+        """
+        rows = self._db.execute(
+            "SELECT template_key, strategy, page, settings, header_bbox, nav_bbox, nav_label"
+            " FROM templates ORDER BY template_key"
+        ).fetchall()
+        return hashlib.sha256(json.dumps(rows).encode()).hexdigest()
+
+    def record(self, key, hit):
+        """
+        Count a template that validated (hit) or had to fall back (miss).
+        """
+        column = 'hits' if hit else 'misses'
+        with self._db:
+            self._db.execute(f"UPDATE templates SET {column} = {column} + 1 WHERE template_key = ?", (key,))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+import importlib
+from urllib.parse import urlsplit, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+# Background downloader for reports linked from email bodies (case_link.py).
+#
+# The save loop only pulls the URL out of the body and submits it; a small pool
+# fetches links over one connection-pooled requests.Session, with at most
+# `per_host` downloads to any one host at a time. Bodies are streamed to a
+# .partial file in chunks and renamed into place when complete, and an
+# interrupted .partial is resumed with a Range request on the next attempt,
+# guarded by If-Range so a file that changed meanwhile is fetched whole.
+# Finished downloads are recorded by URL in a SQLite cache, so a link that
+# appears in several emails (or is re-run) is only fetched again if the server
+# says it changed (If-None-Match on the stored ETag).
+
+CACHE_NAME = 'link_cache.sqlite3'
+CHUNK_SIZE = 64 * 1024
+
+LINK_PATTERN = re.compile(r'(https?://[^\s]+)')
+
+def find_report_link(email_body):
+    match = LINK_PATTERN.search(email_body or '')
+    return match.group(0) if match else None
+
+def _default_filename(url):
+    return unquote(urlsplit(url).path.rstrip('/').split('/')[-1]) or 'download'
+
+def filename_from_response(url, response):
+    content_disposition = response.headers.get('content-disposition')
+    if content_disposition:
+        filename = re.findall('filename="(.+)"', content_disposition)
+        if filename:
+            return filename[0]
+    return _default_filename(url)
+
+def _read_validator(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _write_validator(path, headers):
+    """
+    Keep the response's strong ETag (weak ones are not allowed in If-Range), or
+    failing that its Last-Modified date, for resuming the .partial later.
+    """
+    etag = headers.get('etag')
+    validator = etag if etag and not etag.startswith('W/') else headers.get('last-modified')
+    if validator:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(validator)
+    else:
+        _remove_partial(path)
+
+def _remove_partial(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class DownloadResult:
+    def __init__(self, url, save_path, filename=None, error=None, cached=False, resumed=False, context=None):
+        self.url = url
+        self.save_path = save_path
+        self.filename = filename
+        self.error = error
+        self.cached = cached
+        self.resumed = resumed
+        # Whatever the caller passed to submit(), e.g. the email subject for logging
+        self.context = context
+
+    @property
+    def ok(self):
+        return self.error is None
+
+class LinkDownloader:
+    def __init__(self, cache_path=CACHE_NAME, max_workers=8, per_host=2, timeout=(10, 60),
+                 retries=3, backoff=1.0, sanitize=None, session=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # Callable applied to server-supplied filenames before they touch the disk
+        self.sanitize = sanitize or (lambda name: name)
+        self.per_host = per_host
+
+        if session is None:
+            requests = importlib.import_module('requests')
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " url TEXT PRIMARY KEY,"
+            " file_path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " etag TEXT,"
+            " fetched REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        self._hosts_lock = threading.Lock()
+        self._host_slots = {}
+        # Same URL submitted twice in one run: the second waits for the first
+        self._url_locks = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='link-download')
+        self._futures = []
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._hosts_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def _url_lock(self, url):
+        with self._hosts_lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _cached_entry(self, url):
+        with self._db_lock:
+            row = self._db.execute("SELECT file_path, size, etag FROM downloads WHERE url = ?", (url,)).fetchone()
+        if row and os.path.exists(row[0]) and os.path.getsize(row[0]) == row[1]:
+            return row[0], row[2]
+        return None, None
+
+    def cached_path(self, url):
+        return self._cached_entry(url)[0]
+
+    def _record(self, url, file_path, etag):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO downloads (url, file_path, size, etag, fetched) VALUES (?, ?, ?, ?, ?)",
+                (url, os.path.abspath(file_path), os.path.getsize(file_path), etag, time.time()),
+            )
+            self._db.commit()
+
+    def submit(self, url, save_path, context=None):
+        """
+        Queue url for download into save_path; returns a Future of DownloadResult.
+        """
+        future = self._pool.submit(self.download, url, save_path, context)
+        self._futures.append(future)
+        return future
+
+    def download(self, url, save_path, context=None):
+        """
+        Download url into save_path (blocking) and return a DownloadResult; errors
+        are reported on the result rather than raised.
+        """
+        with self._url_lock(url):
+            cached, etag = self._cached_entry(url)
+            if cached and not etag:
+                # Nothing to revalidate against
+                return self._from_cache(url, cached, save_path, context)
+
+            error = None
+            for attempt in range(self.retries):
+                try:
+                    with self._host_slot(url):
+                        filename, resumed = self._fetch(url, save_path, etag if cached else None)
+                    if filename is None:
+                        # 304 Not Modified
+                        return self._from_cache(url, cached, save_path, context)
+                    return DownloadResult(url, save_path, filename, resumed=resumed, context=context)
+                except Exception as e:
+                    error = str(e)
+                    if attempt + 1 < self.retries:
+                        time.sleep(self.backoff * (2 ** attempt))
+            if cached:
+                # Could not revalidate (server down); the cached copy is still complete
+                return self._from_cache(url, cached, save_path, context)
+            return DownloadResult(url, save_path, error=error, context=context)
+
+    def _from_cache(self, url, cached, save_path, context):
+        filename = os.path.basename(cached)
+        target = os.path.join(save_path, filename)
+        if os.path.normcase(os.path.abspath(target)) != os.path.normcase(cached):
+            os.makedirs(save_path, exist_ok=True)
+            shutil.copyfile(cached, target)
+        return DownloadResult(url, save_path, filename, cached=True, context=context)
+
+    def _fetch(self, url, save_path, etag=None):
+        """
+        Fetch url into save_path and return (filename, resumed). With etag (the
+        cached copy's) the request is conditional and (None, False) means the
+        cached copy is still current.
+        """
+        os.makedirs(save_path, exist_ok=True)
+        # The real filename is only known from the response, so partial data is
+        # kept under a name derived from the URL, next to the validator (ETag or
+        # Last-Modified) of the response it came from
+        partial_path = os.path.join(save_path, f".{hashlib.sha1(url.encode()).hexdigest()[:16]}.partial")
+        validator_path = partial_path + '.validator'
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        validator = _read_validator(validator_path) if offset else None
+        headers = {}
+        if validator:
+            # If-Range: the server sends the rest only if the file is unchanged,
+            # otherwise the whole new body with a 200
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator
+        if etag:
+            headers['If-None-Match'] = etag
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304 and etag:
+                return None, False
+            if response.status_code == 416:
+                # Range no longer satisfiable (the file changed on the server);
+                # drop the partial so the next attempt starts over
+                _remove_partial(partial_path, validator_path)
+                raise RuntimeError(f"Stale partial download for {url}, restarting")
+            if response.status_code in (200, 206):
+                resumed = response.status_code == 206 and offset > 0
+                # A 200 to a Range request means the server sent the whole body again
+                mode = 'ab' if resumed else 'wb'
+                if not resumed:
+                    _write_validator(validator_path, response.headers)
+                with open(partial_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+            else:
+                response.raise_for_status()
+                raise RuntimeError(f"Unexpected HTTP status {response.status_code} for {url}")
+            filename = self.sanitize(filename_from_response(url, response))
+            etag = response.headers.get('etag')
+
+        file_path = os.path.join(save_path, filename)
+        os.replace(partial_path, file_path)
+        _remove_partial(validator_path)
+        self._record(url, file_path, etag)
+        return filename, resumed
+
+    def drain(self):
+        """
+        Wait for every submitted download and return their DownloadResults in
+        submission order.
+        """
+        futures, self._futures = self._futures, []
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.session.close()
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import queue
+import argparse
+import datetime
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Mailbox-wide sender/subject export (the script described in "rr_email ext.py").
+#
+# Folder discovery runs once on the main thread and only records each folder's
+# EntryID/StoreID. The folders are then read concurrently: every worker thread
+# initialises COM and opens its own MAPI namespace, and pulls the needed columns
+# in bulk through Folder.GetTable/Table.GetArray instead of touching every item
+# property over COM. Rows are streamed through a queue to a single writer, so
+# memory stays flat no matter how many emails are exported.
+
+HEADERS = ["Account", "Folder", "Sender Email", "Subject", "Received Date"]
+TABLE_COLUMNS = ["SenderEmailAddress", "Subject", "ReceivedTime"]
+BATCH_SIZE = 500
+STATE_FILE = "mailbox_export_state.json"
+
+def _pythoncom():
+    return importlib.import_module('pythoncom')
+
+def _namespace():
+    return importlib.import_module('win32com.client').Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+def discover_mail_folders(namespace):
+    """
+    Return [(path, entry_id, store_id)] for every mail folder in every store.
+    """
+    folders_list = []
+
+    def walk(parent_folders, path):
+        try:
+            for folder in parent_folders:
+                current_path = f"{path}/{folder.Name}" if path else folder.Name
+                try:
+                    if folder.DefaultItemType == 0:  # 0 = Mail items
+                        folders_list.append((current_path, folder.EntryID, folder.StoreID))
+                    if folder.Folders.Count > 0:
+                        walk(folder.Folders, current_path)
+                except Exception:
+                    # Skip folders that throw errors
+                    pass
+        except Exception:
+            pass
+
+    walk(namespace.Folders, "")
+    return folders_list
+
+def load_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_state(state_file, state):
+    tmp_path = state_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_file)
+
+def _format_received(value):
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return str(value)
+
+def export_folder(folder_path, entry_id, store_id, since, row_queue):
+    """
+    Read one folder on its own COM apartment / MAPI session and push row batches
+    onto row_queue. Returns (folder_path, row_count, newest_received).
+    """
+    pythoncom = _pythoncom()
+    pythoncom.CoInitialize()
+    try:
+        namespace = _namespace()
+        folder = namespace.GetFolderFromID(entry_id, store_id)
+        account_name = folder_path.split('/')[0]
+        restriction = "[ReceivedTime] >= '" + since.strftime('%m/%d/%Y %I:%M %p') + "'"
+        table = folder.GetTable(restriction, 0)
+        table.Columns.RemoveAll()
+        for column in TABLE_COLUMNS:
+            table.Columns.Add(column)
+        table.Sort("[ReceivedTime]", True)
+
+        count = 0
+        newest = None
+        while not table.EndOfTable:
+            batch = []
+            for sender_address, subject, received in table.GetArray(BATCH_SIZE):
+                if not sender_address or "@" not in sender_address:
+                    continue
+                received_str = _format_received(received)
+                batch.append([account_name, folder_path, sender_address, subject, received_str])
+                if newest is None or received_str > newest:
+                    newest = received_str
+            if batch:
+                row_queue.put(batch)
+                count += len(batch)
+        return folder_path, count, newest
+    finally:
+        pythoncom.CoUninitialize()
+
+class XlsxRowSink:
+    """
+    Streams rows into a styled report through report_writer, then appends a
+    per-folder Summary sheet when closed.
+    """
+
+    def __init__(self, output_file):
+        import report_writer
+        self.report = report_writer.ReportWriter(output_file)
+        self.sheet = self.report.add_sheet("Email Senders", HEADERS, border=True)
+        # Control characters in subjects (e.g. \x0b) are not allowed in xlsx cells
+        self.illegal = importlib.import_module('openpyxl.cell.cell').ILLEGAL_CHARACTERS_RE
+
+    def write_rows(self, rows):
+        self.sheet.extend([[self.illegal.sub('', value) if isinstance(value, str) else value for value in row]
+                           for row in rows])
+
+    def close(self, summary):
+        ws_summary = self.report.add_sheet("Summary", ["Account", "Folder", "Email Count"], border=True)
+        for (account, folder), count in summary.items():
+            ws_summary.append([account, folder, count])
+        self.report.save()
+
+class ParquetRowSink:
+    """
+    Streams rows into a Parquet file, one row group per flushed batch.
+    """
+
+    def __init__(self, output_file, flush_rows=50000):
+        self.pa = importlib.import_module('pyarrow')
+        self.pq = importlib.import_module('pyarrow.parquet')
+        self.output_file = output_file
+        self.flush_rows = flush_rows
+        self.schema = self.pa.schema([(name.lower().replace(' ', '_'), self.pa.string()) for name in HEADERS])
+        self.writer = self.pq.ParquetWriter(output_file, self.schema)
+        self._pending = []
+
+    def write_rows(self, rows):
+        self._pending.extend(rows)
+        if len(self._pending) >= self.flush_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        columns = list(zip(*self._pending))
+        self.writer.write_table(self.pa.Table.from_arrays([self.pa.array(col, self.pa.string()) for col in columns], schema=self.schema))
+        self._pending = []
+
+    def close(self, summary):
+        self._flush()
+        self.writer.close()
+
+def open_sink(output_file):
+    if output_file.lower().endswith('.parquet'):
+        return ParquetRowSink(output_file)
+    return XlsxRowSink(output_file)
+
+def export_folders(selected_folders, output_file, days=30, workers=8, incremental=False, state_file=STATE_FILE):
+    """
+    Export the selected (path, entry_id, store_id) folders concurrently into
+    output_file (.xlsx or .parquet). With incremental=True each folder only
+    exports mail newer than what the previous incremental run saw.
+    Returns the number of rows written.
+    """
+    default_since = datetime.datetime.now() - datetime.timedelta(days=days)
+    state = load_state(state_file) if incremental else {}
+
+    row_queue = queue.Queue(maxsize=workers * 4)
+    sink = open_sink(output_file)
+    summary = {}
+    written = [0]
+    writer_error = []
+    done = object()
+
+    def writer():
+        while True:
+            batch = row_queue.get()
+            if batch is done:
+                return
+            if writer_error:
+                # Keep draining so the folder threads never block on a full queue
+                continue
+            try:
+                sink.write_rows(batch)
+            except Exception as e:
+                writer_error.append(e)
+                continue
+            for row in batch:
+                key = (row[0], row[1])
+                summary[key] = summary.get(key, 0) + 1
+            written[0] += len(batch)
+
+    writer_thread = threading.Thread(target=writer, name='export-writer')
+    writer_thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export-folder') as pool:
+            futures = {}
+            for folder_path, entry_id, store_id in selected_folders:
+                since = default_since
+                last_seen = state.get(f"{store_id}|{entry_id}")
+                if last_seen:
+                    since = max(since, datetime.datetime.strptime(last_seen, '%Y-%m-%d %H:%M'))
+                future = pool.submit(export_folder, folder_path, entry_id, store_id, since, row_queue)
+                futures[future] = (folder_path, entry_id, store_id)
+
+            for future in as_completed(futures):
+                folder_path, entry_id, store_id = futures[future]
+                try:
+                    _, count, newest = future.result()
+                    print(f"Processed {count} emails in {folder_path}")
+                    if newest:
+                        state[f"{store_id}|{entry_id}"] = newest
+                except Exception as e:
+                    print(f"Error processing folder {folder_path}: {str(e)}")
+    finally:
+        row_queue.put(done)
+        writer_thread.join()
+        sink.close(summary)
+
+    if writer_error:
+        raise writer_error[0]
+
+    if incremental:
+        save_state(state_file, state)
+    return written[0]
+
+def select_folders(all_folders, selection):
+    if selection.lower() == 'all':
+        return list(all_folders)
+    selected = []
+    for idx in (int(part.strip()) - 1 for part in selection.split(',') if part.strip()):
+        if 0 <= idx < len(all_folders):
+            selected.append(all_folders[idx])
+        else:
+            print(f"Warning: Folder number {idx+1} is invalid and will be skipped.")
+    return selected
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export sender/subject metadata from Outlook mail folders.")
+    parser.add_argument('--days', type=int, default=30, help="Export mail received in the last N days.")
+    parser.add_argument('--workers', type=int, default=8, help="Folders read concurrently.")
+    parser.add_argument('--folders', default=None, help="Comma-separated folder numbers or 'all'; prompts if omitted.")
+    parser.add_argument('--output', default=None, help="Output .xlsx or .parquet file.")
+    parser.add_argument('--incremental', action='store_true', help="Only export mail newer than the previous incremental run, per folder.")
+    parser.add_argument('--state-file', default=STATE_FILE, help="Where incremental runs keep their per-folder watermark.")
+    args = parser.parse_args(argv)
+
+    pythoncom = _pythoncom()
+    pythoncom.CoInitialize()
+    try:
+        all_folders = discover_mail_folders(_namespace())
+    finally:
+        pythoncom.CoUninitialize()
+
+    if not all_folders:
+        print("No mail folders found. Please ensure Outlook is properly configured.")
+        return 1
+
+    selection = args.folders
+    if selection is None:
+        print("\nAvailable mailboxes and folders:")
+        print("-" * 70)
+        for i, (folder_path, _, _) in enumerate(all_folders, 1):
+            print(f"{i}. {folder_path}")
+        print("\nSelect folder numbers (comma-separated, e.g., 1,2,3 or 'all' for all folders):")
+        selection = input("Folder numbers: ").strip()
+
+    selected_folders = select_folders(all_folders, selection)
+    if not selected_folders:
+        print("No valid folders selected.")
+        return 1
+
+    output_file = args.output or f"outlook_emails_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    if not output_file.lower().endswith(('.xlsx', '.parquet')):
+        output_file += '.xlsx'
+
+    total = export_folders(selected_folders, output_file, days=args.days, workers=args.workers,
+                           incremental=args.incremental, state_file=args.state_file)
+    print(f"\nExtracted data from {total} emails across {len(selected_folders)} folder(s)")
+    print(f"Results saved to {os.path.abspath(output_file)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
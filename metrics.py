@@ -0,0 +1,249 @@
+import threading
+import time
+
+# Prometheus text-format metrics for the email save services.
+#
+# Every thread records into its own shard (a plain dict it alone writes to), so
+# the hot save loop never takes a lock. The shards are only summed when /metrics
+# is scraped.
+
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# From an email being queued at the start of a run to it being filed
+TIME_TO_FILE_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+class _ShardedMetric:
+    """
+    Base class holding one shard per thread; the registry lock is only taken
+    the first time a thread records to this metric.
+    """
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _label_key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = []
+        for name, value in pairs:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{name}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def _snapshot(self):
+        with self._shards_lock:
+            return [dict(shard) for shard in self._shards]
+
+
+class Counter(_ShardedMetric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._label_key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = self._label_key(labels)
+        return sum(shard.get(key, 0) for shard in self._snapshot())
+
+    def render(self):
+        totals = {}
+        for shard in self._snapshot():
+            for key, count in shard.items():
+                totals[key] = totals.get(key, 0) + count
+        lines = []
+        for key in sorted(totals):
+            lines.append(f"{self.name}{self._format_labels(key)} {totals[key]}")
+        return lines
+
+
+class Gauge(_ShardedMetric):
+    """
+    A gauge is a single current value, so it is stored directly rather than
+    sharded; a plain attribute assignment is atomic under the GIL.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[self._label_key(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(self._label_key(labels), 0)
+
+    def render(self):
+        values = dict(self._values)
+        if not values and not self.labelnames:
+            values = {(): 0}
+        return [f"{self.name}{self._format_labels(key)} {values[key]}" for key in sorted(values)]
+
+
+class Histogram(_ShardedMetric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._label_key(labels)
+        state = shard.get(key)
+        if state is None:
+            # [per-bucket counts..., +Inf count, sum]
+            state = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[key] = state
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        else:
+            state[len(self.buckets)] += 1
+        state[-1] += value
+
+    def time(self, **labels):
+        return _HistogramTimer(self, labels)
+
+    def render(self):
+        totals = {}
+        for shard in self._snapshot():
+            for key, state in shard.items():
+                merged = totals.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, v in enumerate(state):
+                    merged[i] += v
+        lines = []
+        for key in sorted(totals):
+            state = totals[key]
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', bound))} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state[-1]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class _HistogramTimer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Render all registered metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry()
+
+EMAILS_PROCESSED = REGISTRY.register(Counter(
+    'email_saver_emails_processed_total',
+    'Emails processed, by routing outcome (default, csv, keyword, special_case, failed, skipped).',
+    ['route'],
+))
+COM_ERRORS = REGISTRY.register(Counter(
+    'email_saver_com_errors_total',
+    'COM errors raised while handling emails, by HRESULT code.',
+    ['code'],
+))
+SAVEAS_SECONDS = REGISTRY.register(Histogram(
+    'email_saver_saveas_seconds',
+    'Latency of MailItem.SaveAs calls in seconds.',
+))
+STAGED_MOVE_SECONDS = REGISTRY.register(Histogram(
+    'email_saver_staged_move_seconds',
+    'Time to move a staged .msg from local disk to its share path, in seconds.',
+))
+STAGED_MOVE_FAILURES = REGISTRY.register(Counter(
+    'email_saver_staged_move_failures_total',
+    'Staged files that could not be moved to the share after all retries.',
+))
+REDRIVE_QUEUED = REGISTRY.register(Counter(
+    'email_saver_redrive_queued_total',
+    'COM failures written to the redrive queue, by resulting state (pending or dead).',
+    ['state'],
+))
+CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    'email_saver_circuit_open',
+    '1 while the Outlook circuit breaker is open and saving is paused.',
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'email_saver_queue_depth',
+    'Emails found for the current run that are still waiting to be processed.',
+))
+TIER_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'email_saver_tier_queue_depth',
+    'Emails still waiting to be processed in the current run, by sender tier.',
+    ['tier'],
+))
+TIME_TO_FILE_SECONDS = REGISTRY.register(Histogram(
+    'email_saver_time_to_file_seconds',
+    'Seconds from an email being queued for the run to it being processed, by sender tier.',
+    ['tier'],
+    buckets=TIME_TO_FILE_BUCKETS,
+))
+
+
+def com_error_code(com_err):
+    """
+    Return the HRESULT of a pywintypes.com_error as a hex string for labelling.
+    """
+    args = getattr(com_err, 'args', None)
+    if args and isinstance(args[0], int):
+        return f"0x{args[0] & 0xFFFFFFFF:08X}"
+    return 'unknown'
+
+
+def render():
+    return REGISTRY.render()
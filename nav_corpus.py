@@ -0,0 +1,245 @@
+import os
+import json
+import random
+import hashlib
+import argparse
+import importlib
+from datetime import date
+
+# Synthetic fund-report corpus for benchmarking the NAV extractors
+# (bench_nav_extraction.py).
+#
+# Every PDF is drawn with PyMuPDF from a seeded random generator, so the same
+# seed and count always give the same files, and the NAV values and period
+# dates each file was drawn with are written to manifest.json next to them.
+# Layouts:
+#   key_figures   Partners Group style "Key figures" table with ruled cells
+#   text_only     plain lines of text, comma-grouped numbers, no table lines
+#   apostrophe    unruled columns with apostrophe-grouped numbers, named dates
+#   multi_page    filler pages before the key figures table
+#   image_cover   image-only (scanned) pages before the key figures table
+#   image_only    the key figures page as an image with no text layer
+
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_SEED = 1
+DEFAULT_PER_LAYOUT = 5
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+FONT = 'helv'
+FONT_SIZE = 10
+# Resolution of the rasterised (image-only) pages
+IMAGE_DPI = 100
+
+QUARTER_ENDS = ((3, 31), (6, 30), (9, 30), (12, 31))
+FUND_WORDS = ('Alpha', 'Global', 'Secondary', 'Direct', 'Infrastructure', 'Real Estate',
+              'Private Equity', 'Credit', 'Access', 'Opportunities', 'Growth', 'Master')
+FUND_SUFFIXES = ('S.C.A. SICAV', 'L.P.', 'Fund Ltd.', 'SICAV-RAIF', 'Feeder L.P.')
+FILLER = ("The portfolio continued to develop in line with expectations during the period. "
+          "Investments were made in 4 new companies and 2 exits were completed, returning "
+          "capital to investors. Valuations are based on the latest available reports.")
+
+LAYOUTS = ('key_figures', 'text_only', 'apostrophe', 'multi_page', 'image_cover', 'image_only')
+
+def _fitz():
+    try:
+        return importlib.import_module('fitz')
+    except ImportError:
+        raise ImportError("PyMuPDF is needed to generate the corpus: pip install PyMuPDF")
+
+def group_number(value, separator):
+    """
+    value with its thousands grouped by separator, e.g. 595'446'138.
+    """
+    return f"{value:,}".replace(',', separator)
+
+def _periods(rng):
+    year = rng.randint(2019, 2025)
+    quarter = rng.randrange(4)
+    first = date(year, *QUARTER_ENDS[quarter])
+    second = date(year + (quarter == 3), *QUARTER_ENDS[(quarter + 1) % 4])
+    return first, second
+
+def _fund_name(rng):
+    words = rng.sample(FUND_WORDS, 2)
+    return f"{' '.join(words)} {rng.randint(2005, 2024)} {rng.choice(FUND_SUFFIXES)}"
+
+def _text(page, x, y, text, size=FONT_SIZE, right=False):
+    if right:
+        x -= _fitz().get_text_length(text, fontname=FONT, fontsize=size)
+    page.insert_text((x, y), text, fontname=FONT, fontsize=size)
+
+def _filler(page, y, paragraphs=3):
+    words = FILLER.split()
+    for _ in range(paragraphs):
+        line = []
+        for word in words:
+            if _fitz().get_text_length(' '.join(line + [word]), fontname=FONT, fontsize=FONT_SIZE) > PAGE_WIDTH - 120:
+                _text(page, 60, y, ' '.join(line))
+                y += 14
+                line = []
+            line.append(word)
+        _text(page, 60, y, ' '.join(line))
+        y += 24
+    return y
+
+def _title(page, report, y=70):
+    _text(page, 60, y, "Quarterly report", size=16)
+    _text(page, 60, y + 24, "Partners Group", size=12)
+    _text(page, 60, y + 42, report['fund'], size=12)
+    return y + 80
+
+def _key_figures(page, report, rng, y, ruled=True, separator="'", date_format='%d.%m.%Y'):
+    """
+    Draw the key figures table: a date header row over a few key figure rows,
+    with the Net asset value row at a random position among them.
+    """
+    _text(page, 60, y, "Key figures", size=13)
+    y += 20
+    columns = (60, 330, 460, PAGE_WIDTH - 60)
+    first, second = report['period1'], report['period2']
+    rows = [("In EUR", first.strftime(date_format), second.strftime(date_format))]
+    others = [(label, rng.randint(10 ** 5, 10 ** 8), rng.randint(10 ** 5, 10 ** 8))
+              for label in ("Commitments", "Distributions", "Unfunded commitments")]
+    others.insert(rng.randrange(len(others) + 1), ("Net asset value", report['nav1'], report['nav2']))
+    rows.extend((label, group_number(a, separator), group_number(b, separator)) for label, a, b in others)
+    row_height = 20
+    top = y
+    for label, a, b in rows:
+        _text(page, columns[0] + 4, y + 14, label)
+        _text(page, columns[2] - 6, y + 14, a, right=True)
+        _text(page, columns[3] - 6, y + 14, b, right=True)
+        y += row_height
+    if ruled:
+        for line_y in range(top, y + 1, row_height):
+            page.draw_line((columns[0], line_y), (columns[3], line_y))
+        for x in columns:
+            page.draw_line((x, top), (x, y))
+    return y + 30
+
+def _draw_key_figures_page(doc, report, rng):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    y = _title(page, report)
+    y = _key_figures(page, report, rng, y)
+    _filler(page, y)
+    return page
+
+def _draw_image_page(doc, source_page):
+    """
+    Append source_page to doc as a picture only, like a scanned page.
+    """
+    pixmap = source_page.get_pixmap(dpi=IMAGE_DPI)
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_image(page.rect, stream=pixmap.tobytes('png'))
+
+def _layout_text_only(doc, report, rng):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    y = _title(page, report)
+    y = _filler(page, y, paragraphs=1)
+    first, second = report['period1'], report['period2']
+    _text(page, 60, y, f"Figures as at {first:%d.%m.%Y} and {second:%d.%m.%Y}")
+    _text(page, 60, y + 16, f"Net asset value {group_number(report['nav1'], ',')} {group_number(report['nav2'], ',')}")
+    _filler(page, y + 44, paragraphs=2)
+
+def _layout_apostrophe(doc, report, rng):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    y = _title(page, report)
+    y = _key_figures(page, report, rng, y, ruled=False, date_format='%d %B %Y')
+    _filler(page, y)
+
+def _layout_multi_page(doc, report, rng):
+    for _ in range(rng.randint(5, 9)):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        _filler(page, 70, paragraphs=rng.randint(3, 8))
+    _draw_key_figures_page(doc, report, rng)
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    _filler(page, 70)
+
+def _layout_image_cover(doc, report, rng):
+    scratch = _fitz().open()
+    for _ in range(rng.randint(1, 3)):
+        page = scratch.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        _title(page, report)
+        _filler(page, 170, paragraphs=4)
+        _draw_image_page(doc, page)
+    scratch.close()
+    _draw_key_figures_page(doc, report, rng)
+
+def _layout_image_only(doc, report, rng):
+    scratch = _fitz().open()
+    _draw_image_page(doc, _draw_key_figures_page(scratch, report, rng))
+    scratch.close()
+
+_LAYOUT_DRAWERS = {
+    'key_figures': _draw_key_figures_page,
+    'text_only': _layout_text_only,
+    'apostrophe': _layout_apostrophe,
+    'multi_page': _layout_multi_page,
+    'image_cover': _layout_image_cover,
+    'image_only': _layout_image_only,
+}
+
+def generate_corpus(folder, per_layout=DEFAULT_PER_LAYOUT, seed=DEFAULT_SEED, layouts=LAYOUTS):
+    """
+    Write per_layout PDFs of each layout into folder, plus the manifest of their
+    expected values. Returns the manifest.
+    """
+    fitz = _fitz()
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    files = {}
+    for layout in layouts:
+        for number in range(per_layout):
+            first, second = _periods(rng)
+            report = {
+                'fund': _fund_name(rng),
+                'period1': first,
+                'period2': second,
+                'nav1': rng.randint(10 ** 6, 10 ** 9),
+                'nav2': rng.randint(10 ** 6, 10 ** 9),
+            }
+            name = f"{layout}_{number:03d}.pdf"
+            doc = fitz.open()
+            _LAYOUT_DRAWERS[layout](doc, report, rng)
+            # Fixed metadata and no compression randomness, so reruns are byte-identical
+            doc.set_metadata({'title': report['fund'], 'creationDate': '', 'modDate': '', 'producer': 'nav_corpus'})
+            doc.save(os.path.join(folder, name), garbage=4, deflate=True, no_new_id=True)
+            doc.close()
+            files[name] = {
+                'layout': layout,
+                'fund': report['fund'],
+                'period1_label': first.isoformat(),
+                'period1_nav': report['nav1'],
+                'period2_label': second.isoformat(),
+                'period2_nav': report['nav2'],
+            }
+    manifest = {'seed': seed, 'per_layout': per_layout, 'files': files}
+    manifest['fingerprint'] = corpus_fingerprint(manifest)
+    with open(os.path.join(folder, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def corpus_fingerprint(manifest):
+    """
+    Hash of the expected values, so results from different corpora are not
+    compared by mistake.
+    """
+    return hashlib.sha256(json.dumps(manifest['files'], sort_keys=True).encode()).hexdigest()[:16]
+
+def load_manifest(folder):
+    with open(os.path.join(folder, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic fund-report PDFs with known NAV values.")
+    parser.add_argument('folder', help="Folder to write the PDFs and manifest.json to.")
+    parser.add_argument('--per-layout', type=int, default=DEFAULT_PER_LAYOUT, help="PDFs per layout.")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed; the same seed gives the same corpus.")
+    parser.add_argument('--layouts', nargs='+', choices=LAYOUTS, default=list(LAYOUTS), help="Layouts to generate.")
+    args = parser.parse_args(argv)
+
+    manifest = generate_corpus(args.folder, args.per_layout, args.seed, tuple(args.layouts))
+    print(f"Wrote {len(manifest['files'])} PDFs to {args.folder} (corpus {manifest['fingerprint']}).")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import re
+import functools
+
+# Single-pass token scanner for the NAV text strategies (extract_pdfv2.py).
+#
+# The strategies used to split the same text into lines again and again and
+# loop over their own lists of indicator strings and date regexes. scan() makes
+# one pass over the lines with one compiled alternation and records, per line,
+# the NAV-label, date and number tokens with their positions; the strategies
+# then pick the token kinds they care about.
+#
+# Token kinds:
+#   nav_full      "net asset value"
+#   nav_partial   "net asset" or "asset value" on their own
+#   nav_abbr      "NAV" as a word
+#   date_numeric  30.09.2024, 30/09/2024
+#   date_named    30 September 2024, 30Sep2024, September 30, 2024
+#   date_month    September 2024
+#   number        runs of digits with ' , . grouping, e.g. 595'446'138, or
+#                 grouped by one kind of non-breaking or thin space throughout
+# Dates are matched before numbers, so a date is never also a number token.
+# Digits grouped by ordinary spaces (1 234 567) are not joined: text extraction
+# also separates table columns with single spaces, so they come out as three
+# number tokens and number_parser's space grouping is only reached through
+# whole table cells.
+
+# Grouping spaces that never separate columns: no-break, narrow no-break, thin
+_SPACED_NUMBER = '|'.join(rf"\d{{1,3}}(?:{space}\d{{3}})+(?:[.,]\d+)?" for space in ('\u00a0', '\u202f', '\u2009'))
+
+_MONTH = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<nav_full>net\s+asset\s+value)"
+    r"|(?P<nav_partial>net\s+asset|asset\s+value)"
+    r"|(?P<nav_abbr>\bnav\b)"
+    r"|(?P<date_numeric>\b\d{1,2}[\./]\d{1,2}[\./]\d{4}\b)"
+    rf"|(?P<date_named>\b\d{{1,2}}\s*{_MONTH}[a-z]*\s*\d{{4}}\b|\b{_MONTH}[a-z]*\s+\d{{1,2}},?\s+\d{{4}}\b)"
+    rf"|(?P<date_month>\b{_MONTH}[a-z]*\s*\d{{4}}\b)"
+    rf"|(?P<number>(?<![\d',\.])(?:{_SPACED_NUMBER})(?!\d)|[\d',\.]*\d[\d',\.]*)",
+    re.IGNORECASE,
+)
+
+NAV_KINDS = ('nav_full', 'nav_partial', 'nav_abbr')
+DATE_KINDS = ('date_numeric', 'date_named', 'date_month')
+# Full dates with a day, as opposed to month-and-year only
+DAY_DATE_KINDS = ('date_numeric', 'date_named')
+
+class Token:
+    __slots__ = ('kind', 'text', 'start', 'end')
+
+    def __init__(self, kind, text, start, end):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.text!r}, {self.start})"
+
+class ScannedLine:
+    __slots__ = ('index', 'text', 'lower', 'tokens')
+
+    def __init__(self, index, text):
+        self.index = index
+        self.text = text
+        self.lower = text.lower()
+        self.tokens = [Token(match.lastgroup, match.group(), match.start(), match.end())
+                       for match in TOKEN_PATTERN.finditer(text)]
+
+    def has(self, *kinds):
+        return any(token.kind in kinds for token in self.tokens)
+
+    def texts(self, *kinds, after=0):
+        """
+        Texts of the tokens of the given kinds starting at or after column after.
+        """
+        return [token.text for token in self.tokens if token.kind in kinds and token.start >= after]
+
+    def first(self, *kinds):
+        """
+        The first token of the given kinds, or None.
+        """
+        return next((token for token in self.tokens if token.kind in kinds), None)
+
+class ScannedText:
+    def __init__(self, text):
+        self.text = text
+        self.lines = [ScannedLine(i, line) for i, line in enumerate(text.split('\n'))]
+
+    def texts(self, *kinds, start=0, end=None):
+        """
+        Texts of the tokens of the given kinds on lines start..end, in order.
+        """
+        return [text for line in self.lines[start:end] for text in line.texts(*kinds)]
+
+    def lines_with(self, *kinds):
+        return [line for line in self.lines if line.has(*kinds)]
+
+    def first_line(self, *kinds):
+        return next((line for line in self.lines if line.has(*kinds)), None)
+
+@functools.lru_cache(maxsize=64)
+def scan(text):
+    """
+    Scan text once; the result is cached, so strategies handed the same text
+    share one scan.
+    """
+    return ScannedText(text or "")
+
+@functools.lru_cache(maxsize=4096)
+def scan_line(text):
+    """
+    Scan a single line, e.g. a table row joined into one string.
+    """
+    return ScannedLine(0, text or "")
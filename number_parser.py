@@ -0,0 +1,78 @@
+import re
+import functools
+
+# Numeric parsing for the NAV extractors (extract_pdfv2.py, ext_pdf.py).
+#
+# One compiled regex finds the first number in a cell or token and splits it
+# into sign, currency, digits and marker parts; the digits are then normalised
+# with plain string replaces. Handled formats:
+#   595'446'138   1’234.56   1,234,567.89   1 234 567,89   1.234.567,89
+#   (1,234) and -1234 (negative), CHF 1'234 / 1'234 EUR / $1,234, 12.5%, 1.5x
+# A single comma or dot is a thousands separator when one to three digits other
+# than a lone 0 come before it and exactly three after it (1,234 and 1.234 are
+# both 1234, as in EUR 1.000); otherwise it is a decimal point (12,5 and 12.5 are
+# 12.5, 0,123 is 0.123, 1234.567 is 1234.567). Badly grouped digits such as
+# 1,234,56 or 31.12.2023 are not a number at all.
+
+_CURRENCY = r"(?:[$€£¥]|(?:CHF|EUR|USD|GBP|JPY|SEK|NOK|DKK|CAD|AUD)\b)"
+# Thousands separators: apostrophe, right single quote, comma, dot and spaces
+_GROUP = r"['’,. \u00a0\u202f\u2009]"
+# The non-space ones; a number may not run on into more digits through these
+_MARK = r"['’,.]"
+
+NUMBER_PATTERN = re.compile(
+    rf"""
+    (?P<open>\()?\s*
+    (?:{_CURRENCY}\s*)?
+    (?P<sign>[-−])?
+    (?:{_CURRENCY}\s*)?
+    (?<!\d)(?<!\d{_MARK})
+    (?P<digits>
+        [1-9]\d{{0,2}}(?P<group>{_GROUP})\d{{3}}(?:(?P=group)\d{{3}})*(?:(?!(?P=group))[.,]\d+)?
+      | \d+(?:[.,]\d+)?
+      | [.,]\d+
+    )
+    (?!\d)(?!{_MARK}\d)
+    \s*(?P<marker>%|{_CURRENCY}|x\b)?
+    \s*(?P<close>\))?
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+CACHE_SIZE = 4096
+
+def _to_float(match):
+    digits = match.group('digits')
+    group = match.group('group')
+    if group:
+        digits = digits.replace(group, '')
+    value = float(digits.replace(',', '.'))
+    negative = (match.group('open') and match.group('close')) or match.group('sign')
+    return -value if negative else value
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse_text(text, percent):
+    match = NUMBER_PATTERN.search(text)
+    if match is None:
+        return None
+    if (match.group('marker') or '').endswith('%') and not percent:
+        return None
+    return _to_float(match)
+
+def parse_number(value, percent=False):
+    """
+    The first number in value as a float, or None. Numbers are returned as
+    floats; percentages give None unless percent is set, in which case 12.5%
+    gives 12.5.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return _parse_text(str(value), percent)
+
+def parse_numbers(values, percent=False):
+    """
+    parse_number() over a sequence of cells or tokens, in order.
+    """
+    return [parse_number(value, percent) for value in values]
@@ -0,0 +1,604 @@
+import os
+import sys
+import json
+import time
+import secrets
+import argparse
+import datetime
+import importlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+# Long-lived Outlook session broker.
+#
+# Dispatching Outlook, logging on to MAPI and walking stores and folders costs
+# seconds on every script start, even for a one-sender, one-day job. The broker
+# does that once and keeps the session, resolved folders and recently used items
+# warm; scripts talk to it over a local socket (or a named pipe on Windows) with
+# multiprocessing.connection, authenticated with a shared key. The connection
+# unpickles whatever an authenticated client sends, so the key is a random
+# per-user secret kept in a file only that user can read (AUTHKEY_PATH, created
+# by the first `serve`); the broker refuses to start with a well-known key.
+#
+#   python outlook_broker.py serve                    # real Outlook session
+#   python outlook_broker.py serve --fake mailbox.json
+#   python outlook_broker.py ping
+#
+# Every Outlook call runs on one worker thread that owns the COM apartment, so
+# any number of clients can be connected at once. FakeOutlookBackend serves a
+# JSON mailbox instead, so the client side can be exercised without Outlook.
+
+DEFAULT_ADDRESS = '127.0.0.1:47391'
+AUTHKEY_PATH = os.path.join(os.path.expanduser('~'), '.outlook_broker_key')
+AUTHKEY_BYTES = 32
+# Keys anyone can present: empty, or the one older versions shipped with
+INSECURE_AUTHKEYS = (b'', b'outlook-broker')
+ITEM_CACHE_SIZE = 256
+
+RESTRICT_COLUMNS = ('EntryID', 'Subject', 'SenderEmailAddress', 'ReceivedTime')
+
+# MAPI property tags used in DASL filters
+PR_SENDER_EMAIL_ADDRESS = "http://schemas.microsoft.com/mapi/proptag/0x0C1F001F"
+PR_MESSAGE_DELIVERY_TIME = "http://schemas.microsoft.com/mapi/proptag/0x0E060040"
+PR_HASATTACH = "http://schemas.microsoft.com/mapi/proptag/0x0E1B000B"
+
+class BrokerError(Exception):
+    pass
+
+class BrokerUnavailable(BrokerError):
+    pass
+
+class RemoteComError(BrokerError):
+    """
+    A COM error raised inside the broker; args mirror pywintypes.com_error
+    (hresult, text, excepinfo, argerror) so callers can label it the same way.
+    """
+
+def load_authkey(path=AUTHKEY_PATH, create=False):
+    """
+    Read the broker key from path. With create=True a missing file is created
+    with a new random key, readable and writable by the current user only.
+    Returns None when the file does not exist and create is False.
+    """
+    try:
+        with open(path, 'r', encoding='ascii') as f:
+            return bytes.fromhex(f.read().strip())
+    except FileNotFoundError:
+        if not create:
+            return None
+    key = secrets.token_bytes(AUTHKEY_BYTES)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(key.hex())
+    return key
+
+def parse_address(address):
+    """
+    'host:port' -> (host, port); a \\\\.\\pipe\\name path is returned as-is.
+    """
+    if isinstance(address, tuple) or address.startswith('\\\\'):
+        return address
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+def dasl_filter(start=None, end=None, senders=None, has_attachments=False):
+    """
+    Build an @SQL filter for start <= received < end (naive local datetimes),
+    any of the sender address substrings and, optionally, attachments present.
+    DASL compares dates in UTC, so the bounds are converted first.
+    """
+    clauses = []
+    if start is not None:
+        clauses.append(f"\"{PR_MESSAGE_DELIVERY_TIME}\" >= '{start.astimezone(datetime.timezone.utc).strftime('%m/%d/%Y %I:%M %p')}'")
+    if end is not None:
+        clauses.append(f"\"{PR_MESSAGE_DELIVERY_TIME}\" < '{end.astimezone(datetime.timezone.utc).strftime('%m/%d/%Y %I:%M %p')}'")
+    if has_attachments:
+        clauses.append(f"\"{PR_HASATTACH}\" = 1")
+    sender_clauses = []
+    for sender in senders or ():
+        escaped = sender.lower().replace("'", "''")
+        sender_clauses.append(f"\"{PR_SENDER_EMAIL_ADDRESS}\" LIKE '%{escaped}%'")
+    if sender_clauses:
+        clauses.append("(" + " OR ".join(sender_clauses) + ")")
+    return "@SQL=" + " AND ".join(clauses) if clauses else ""
+
+def _to_wire(value):
+    if hasattr(value, 'strftime'):
+        # pywintypes datetimes carry a tzinfo; keep the wall-clock time
+        return datetime.datetime(value.year, value.month, value.day, value.hour, value.minute, value.second).isoformat()
+    return value
+
+def _from_wire(row):
+    received = row.get('ReceivedTime')
+    if isinstance(received, str):
+        row['ReceivedTime'] = datetime.datetime.fromisoformat(received)
+    return row
+
+class OutlookBackend:
+    """
+    The real session. open() runs on the broker's COM thread.
+    """
+    name = 'outlook'
+
+    def open(self):
+        importlib.import_module('pythoncom').CoInitialize()
+        self.namespace = importlib.import_module('win32com.client').Dispatch("Outlook.Application").GetNamespace("MAPI")
+        self._folders = {}
+        self._items = OrderedDict()
+
+    def com_error_type(self):
+        return importlib.import_module('pythoncom').com_error
+
+    def _find_root(self, account, allow_primary):
+        for store in self.namespace.Stores:
+            if store.DisplayName.lower() == account.lower() or (allow_primary and store.ExchangeStoreType == 3):
+                try:
+                    return store.GetRootFolder()
+                except AttributeError:
+                    continue
+        return None
+
+    @staticmethod
+    def _child(folder, name):
+        return next((f for f in folder.Folders if f.Name.lower() == name.lower()), None)
+
+    def _search(self, folder, name):
+        for f in folder.Folders:
+            if f.Name.lower() == name.lower():
+                return f
+            found = self._search(f, name)
+            if found is not None:
+                return found
+        return None
+
+    def resolve_folder(self, account, path, search=None, allow_primary=False):
+        key = (account.lower(), path.lower(), (search or '').lower(), allow_primary)
+        cached = self._folders.get(key)
+        if cached is not None:
+            return cached
+        folder = self._find_root(account, allow_primary)
+        for part in [p for p in path.split('/') if p]:
+            if folder is None:
+                break
+            folder = self._child(folder, part)
+        if folder is not None and search:
+            folder = self._search(folder, search)
+        if folder is None:
+            return None
+        resolved = {'entry_id': folder.EntryID, 'store_id': folder.StoreID, 'name': folder.Name}
+        self._folders[key] = resolved
+        return resolved
+
+    def _folder(self, entry_id, store_id):
+        return self.namespace.GetFolderFromID(entry_id, store_id)
+
+    def _item(self, entry_id, store_id):
+        item = self._items.get(entry_id)
+        if item is None:
+            item = self.namespace.GetItemFromID(entry_id, store_id)
+            self._items[entry_id] = item
+            if len(self._items) > ITEM_CACHE_SIZE:
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(entry_id)
+        return item
+
+    def restrict(self, entry_id, store_id, start=None, end=None, senders=None, has_attachments=False, columns=RESTRICT_COLUMNS):
+        folder = self._folder(entry_id, store_id)
+        table = folder.GetTable(dasl_filter(start, end, senders, has_attachments), 0)
+        table.Columns.RemoveAll()
+        for column in columns:
+            table.Columns.Add(column)
+        table.Sort("[ReceivedTime]", True)
+        rows = []
+        while not table.EndOfTable:
+            for values in table.GetArray(500):
+                row = {column: _to_wire(value) for column, value in zip(columns, values)}
+                row['StoreID'] = store_id
+                rows.append(row)
+        return rows
+
+    def item_metadata(self, entry_id, store_id):
+        item = self._item(entry_id, store_id)
+        attachments = []
+        for attachment in item.Attachments:
+            attachments.append({'FileName': attachment.FileName, 'Size': attachment.Size})
+        return {
+            'EntryID': item.EntryID,
+            'StoreID': store_id,
+            'Subject': item.Subject,
+            'SenderEmailAddress': item.SenderEmailAddress,
+            'ReceivedTime': _to_wire(item.ReceivedTime),
+            'Body': item.Body,
+            'Attachments': attachments,
+        }
+
+    def save_item(self, entry_id, store_id, path, save_type=3):
+        self._item(entry_id, store_id).SaveAs(path, save_type)
+        return path
+
+    def save_attachment(self, entry_id, store_id, index, path):
+        # Attachments are 1-based in Outlook
+        self._item(entry_id, store_id).Attachments.Item(index + 1).SaveAsFile(path)
+        return path
+
+class FakeOutlookBackend:
+    """
+    Serves a mailbox described in JSON, for exercising clients without Outlook:
+
+        {"hf_data@bofa.com": {"Inbox": [{"entry_id": "1", "subject": "...",
+          "sender": "a@b.com", "received": "2024-05-31T09:30:00",
+          "attachments": [{"filename": "NAV.pdf", "content": "..."}]}]}}
+
+    Saved items are written as JSON so tests can inspect them.
+    """
+    name = 'fake'
+
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+        self.calls = []
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def open(self):
+        pass
+
+    def com_error_type(self):
+        return ()
+
+    def _messages(self, folder_id):
+        account, path = folder_id.split('|', 1)
+        return self.mailbox[account][path]
+
+    def _message(self, entry_id, store_id):
+        for folders in self.mailbox.values():
+            for messages in folders.values():
+                for message in messages:
+                    if message['entry_id'] == entry_id:
+                        return message
+        raise KeyError(f"No item with EntryID {entry_id}")
+
+    def resolve_folder(self, account, path, search=None, allow_primary=False):
+        self.calls.append('resolve_folder')
+        folders = self.mailbox.get(account)
+        if folders is None and allow_primary and self.mailbox:
+            account, folders = next(iter(self.mailbox.items()))
+        if folders is None:
+            return None
+        target = '/'.join(p for p in path.split('/') if p)
+        for folder_path in folders:
+            parts = folder_path.split('/')
+            if search:
+                if folder_path.lower().startswith(target.lower() + '/') and parts[-1].lower() == search.lower():
+                    return {'entry_id': f"{account}|{folder_path}", 'store_id': account, 'name': parts[-1]}
+            elif folder_path.lower() == target.lower():
+                return {'entry_id': f"{account}|{folder_path}", 'store_id': account, 'name': parts[-1]}
+        return None
+
+    def restrict(self, entry_id, store_id, start=None, end=None, senders=None, has_attachments=False, columns=RESTRICT_COLUMNS):
+        self.calls.append('restrict')
+        rows = []
+        for message in self._messages(entry_id):
+            received = datetime.datetime.fromisoformat(message['received'])
+            if start is not None and received < start:
+                continue
+            if end is not None and received >= end:
+                continue
+            if has_attachments and not message.get('attachments'):
+                continue
+            if senders and not any(s.lower() in message['sender'].lower() for s in senders):
+                continue
+            values = {'EntryID': message['entry_id'], 'Subject': message.get('subject', ''),
+                      'SenderEmailAddress': message['sender'], 'ReceivedTime': message['received']}
+            row = {column: values.get(column) for column in columns}
+            row['StoreID'] = store_id
+            rows.append(row)
+        rows.sort(key=lambda row: row.get('ReceivedTime') or '', reverse=True)
+        return rows
+
+    def item_metadata(self, entry_id, store_id):
+        self.calls.append('item_metadata')
+        message = self._message(entry_id, store_id)
+        return {
+            'EntryID': message['entry_id'],
+            'StoreID': store_id,
+            'Subject': message.get('subject', ''),
+            'SenderEmailAddress': message['sender'],
+            'ReceivedTime': message['received'],
+            'Body': message.get('body', ''),
+            'Attachments': [{'FileName': a['filename'], 'Size': len(a.get('content', ''))}
+                            for a in message.get('attachments', [])],
+        }
+
+    def save_item(self, entry_id, store_id, path, save_type=3):
+        self.calls.append('save_item')
+        message = self._message(entry_id, store_id)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(message, f)
+        return path
+
+    def save_attachment(self, entry_id, store_id, index, path):
+        self.calls.append('save_attachment')
+        attachment = self._message(entry_id, store_id)['attachments'][index]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(attachment.get('content', ''))
+        return path
+
+OPERATIONS = ('resolve_folder', 'restrict', 'item_metadata', 'save_item', 'save_attachment')
+
+class BrokerServer:
+    def __init__(self, backend, address=DEFAULT_ADDRESS, authkey=None):
+        if authkey is None:
+            authkey = load_authkey(create=True)
+        if authkey in INSECURE_AUTHKEYS:
+            raise BrokerError(f"Refusing to serve with a well-known key; remove --authkey to use {AUTHKEY_PATH}")
+        self.backend = backend
+        self.address = parse_address(address)
+        self.authkey = authkey
+        # One thread owns the Outlook session; every call is serialised onto it
+        self._com = ThreadPoolExecutor(max_workers=1, thread_name_prefix='broker-com', initializer=backend.open)
+        self._listener = None
+        self._closed = threading.Event()
+        self.started = time.time()
+
+    def _dispatch(self, op, kwargs):
+        if op == 'ping':
+            return {'pid': os.getpid(), 'backend': self.backend.name, 'uptime': time.time() - self.started}
+        if op not in OPERATIONS:
+            raise BrokerError(f"Unknown operation: {op}")
+        return self._com.submit(getattr(self.backend, op), **kwargs).result()
+
+    def _serve_connection(self, conn):
+        com_error = self._com.submit(self.backend.com_error_type).result()
+        with conn:
+            while not self._closed.is_set():
+                try:
+                    op, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = {'ok': True, 'result': self._dispatch(op, kwargs)}
+                except Exception as e:
+                    if com_error and isinstance(e, com_error):
+                        reply = {'ok': False, 'kind': 'com_error', 'args': [str(a) if not isinstance(a, int) else a for a in e.args]}
+                    else:
+                        reply = {'ok': False, 'kind': 'error', 'message': f"{type(e).__name__}: {e}"}
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self, ready=None):
+        self._listener = Listener(self.address, authkey=self.authkey)
+        # Report the bound address (port 0 picks a free one)
+        self.address = self._listener.address
+        if ready is not None:
+            ready.set()
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._closed.is_set():
+                    break
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def start(self):
+        """
+        Serve on a background thread (for tests); returns once listening.
+        """
+        ready = threading.Event()
+        threading.Thread(target=self.serve_forever, args=(ready,), daemon=True, name='broker-listener').start()
+        ready.wait()
+        return self
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+        self._com.shutdown(wait=False)
+
+class RemoteAttachment:
+    def __init__(self, item, index, metadata):
+        self._item = item
+        self.Index = index + 1
+        self.FileName = metadata['FileName']
+        self.Size = metadata.get('Size', 0)
+
+    def SaveAsFile(self, path):
+        self._item._client.save_attachment(self._item.EntryID, self._item.StoreID, self.Index - 1, path)
+
+class RemoteAttachments:
+    def __init__(self, attachments):
+        self._attachments = attachments
+
+    @property
+    def Count(self):
+        return len(self._attachments)
+
+    def Item(self, index):
+        return self._attachments[index - 1]
+
+    def __iter__(self):
+        return iter(self._attachments)
+
+    def __len__(self):
+        return len(self._attachments)
+
+class RemoteItems(list):
+    """
+    restrict() results; a list that also answers Items.Count like Outlook.
+    """
+    @property
+    def Count(self):
+        return len(self)
+
+class _StoreRef:
+    def __init__(self, store_id):
+        self.StoreID = store_id
+
+class RemoteItem:
+    """
+    Stand-in for an Outlook MailItem living in the broker, exposing the members
+    the save scripts use. The body and attachment details are fetched on first
+    use.
+    """
+    Sender = None
+
+    def __init__(self, client, row):
+        self._client = client
+        self.EntryID = row['EntryID']
+        self.StoreID = row['StoreID']
+        self.Subject = row.get('Subject') or ''
+        self.SenderEmailAddress = row.get('SenderEmailAddress') or ''
+        self.ReceivedTime = row.get('ReceivedTime')
+        self.Parent = _StoreRef(self.StoreID)
+        self._attachments = None
+        self._body = row.get('Body')
+        if 'Attachments' in row:
+            self._set_attachments(row['Attachments'])
+
+    def _set_attachments(self, attachments):
+        self._attachments = RemoteAttachments([RemoteAttachment(self, i, a) for i, a in enumerate(attachments)])
+
+    def _load_metadata(self):
+        metadata = self._client.item_metadata(self.EntryID, self.StoreID)
+        self._body = metadata.get('Body') or ''
+        self._set_attachments(metadata['Attachments'])
+
+    @property
+    def Attachments(self):
+        if self._attachments is None:
+            self._load_metadata()
+        return self._attachments
+
+    @property
+    def Body(self):
+        if self._body is None:
+            self._load_metadata()
+        return self._body
+
+    def SaveAs(self, path, save_type=3):
+        self._client.save_item(self.EntryID, self.StoreID, path, save_type)
+
+class BrokerClient:
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        if authkey is None:
+            authkey = load_authkey()
+            if authkey is None:
+                raise BrokerUnavailable(f"No Outlook broker key at {AUTHKEY_PATH}; start the broker first")
+        try:
+            self._conn = Client(parse_address(address), authkey=authkey)
+        except (OSError, EOFError) as e:
+            raise BrokerUnavailable(f"No Outlook broker at {address}: {e}")
+        except AuthenticationError as e:
+            raise BrokerUnavailable(f"The Outlook broker at {address} rejected the key: {e}")
+        self._lock = threading.Lock()
+
+    def call(self, op, **kwargs):
+        with self._lock:
+            try:
+                self._conn.send((op, kwargs))
+                reply = self._conn.recv()
+            except (OSError, EOFError) as e:
+                raise BrokerUnavailable(f"Lost connection to the Outlook broker: {e}")
+        if reply['ok']:
+            return reply['result']
+        if reply['kind'] == 'com_error':
+            raise RemoteComError(*reply['args'])
+        raise BrokerError(reply['message'])
+
+    def ping(self):
+        return self.call('ping')
+
+    def resolve_folder(self, account, path, search=None, allow_primary=False):
+        return self.call('resolve_folder', account=account, path=path, search=search, allow_primary=allow_primary)
+
+    def restrict(self, folder, start=None, end=None, senders=None, has_attachments=False, columns=RESTRICT_COLUMNS):
+        """
+        Return RemoteItems in folder (a resolve_folder() result) matching the
+        filter, newest first.
+        """
+        rows = self.call('restrict', entry_id=folder['entry_id'], store_id=folder['store_id'], start=start, end=end,
+                         senders=list(senders) if senders else None, has_attachments=has_attachments, columns=tuple(columns))
+        return RemoteItems(RemoteItem(self, _from_wire(row)) for row in rows)
+
+    def item_metadata(self, entry_id, store_id):
+        return _from_wire(self.call('item_metadata', entry_id=entry_id, store_id=store_id))
+
+    def save_item(self, entry_id, store_id, path, save_type=3):
+        return self.call('save_item', entry_id=entry_id, store_id=store_id, path=path, save_type=save_type)
+
+    def save_attachment(self, entry_id, store_id, index, path):
+        return self.call('save_attachment', entry_id=entry_id, store_id=store_id, index=index, path=path)
+
+    def GetItemFromID(self, entry_id, store_id=None):
+        # Lets the client stand in for a MAPI namespace (e.g. in redrive)
+        return RemoteItem(self, self.item_metadata(entry_id, store_id))
+
+    def close(self):
+        self._conn.close()
+
+def connect(address=DEFAULT_ADDRESS, authkey=None):
+    """
+    Return a BrokerClient, or None when no broker is listening at address.
+    authkey defaults to the key in AUTHKEY_PATH.
+    """
+    try:
+        return BrokerClient(address, authkey)
+    except BrokerUnavailable:
+        return None
+
+def inbox_items_on(client, account, day):
+    """
+    RemoteItems in account's Inbox (or the primary mailbox's) received on day,
+    newest first, or None when the broker finds no Inbox. The per-day savers
+    use this in place of their own store walk and Inbox Restrict.
+    """
+    inbox = client.resolve_folder(account, 'Inbox', allow_primary=True)
+    if inbox is None:
+        return None
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return client.restrict(inbox, start=start, end=start + datetime.timedelta(days=1))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep an Outlook MAPI session warm and serve it to local scripts.")
+    parser.add_argument('command', choices=('serve', 'ping'))
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help="host:port, or \\\\.\\pipe\\name on Windows.")
+    parser.add_argument('--authkey-file', default=AUTHKEY_PATH,
+                        help="File holding the shared key clients must present; created by serve if missing.")
+    parser.add_argument('--fake', default=None, metavar='MAILBOX_JSON', help="Serve this JSON mailbox instead of Outlook.")
+    args = parser.parse_args(argv)
+    authkey = load_authkey(args.authkey_file, create=args.command == 'serve')
+    if authkey is None:
+        print(f"No broker key at {args.authkey_file}; start the broker first")
+        return 1
+
+    if args.command == 'ping':
+        client = connect(args.address, authkey)
+        if client is None:
+            print(f"No broker listening at {args.address}")
+            return 1
+        print(client.ping())
+        client.close()
+        return 0
+
+    backend = FakeOutlookBackend.from_file(args.fake) if args.fake else OutlookBackend()
+    server = BrokerServer(backend, args.address, authkey)
+    print(f"Outlook broker ({backend.name}) listening on {args.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import io
+import os
+import time
+import importlib
+import traceback
+import contextlib
+import collections
+import multiprocessing
+from multiprocessing.connection import wait
+
+# Process-pool batch runner for the PDF extraction scripts (extract_pdfv2.py).
+#
+# Each worker process handles one file at a time and sends its result back over
+# a pipe. The parent watches every busy worker: one that runs past the per-file
+# timeout or grows past the memory cap is killed, its file is reported as failed
+# and a fresh worker takes its place, so a single pathological PDF cannot stall
+# the batch. Whatever a file prints is captured in the worker and returned with
+# its result instead of interleaving on the console.
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_MEMORY_MB = 2048
+POLL_INTERVAL = 0.5
+
+class FileResult:
+    def __init__(self, index, path, value=None, error=None, output='', seconds=0.0):
+        self.index = index
+        self.path = path
+        self.value = value
+        self.error = error
+        # Everything the file's processing printed
+        self.output = output
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+def _psutil():
+    try:
+        return importlib.import_module('psutil')
+    except ImportError:
+        return None
+
+def rss_mb(pid):
+    """
+    Resident memory of pid in MB, or None when it cannot be measured (needs
+    psutil outside Linux).
+    """
+    psutil = _psutil()
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _worker_main(conn, func):
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        index, path = task
+        output = io.StringIO()
+        start = time.time()
+        try:
+            with contextlib.redirect_stdout(output):
+                value = func(path)
+            conn.send((index, value, None, output.getvalue(), time.time() - start))
+        except Exception as e:
+            conn.send((index, None, f"{type(e).__name__}: {e}", output.getvalue() + traceback.format_exc(),
+                       time.time() - start))
+
+class _Worker:
+    def __init__(self, context, func):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, func), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+
+    def assign(self, index, path):
+        self.task = (index, path)
+        self.started = time.time()
+        self.conn.send(self.task)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+def run_batch(func, paths, workers=None, timeout=DEFAULT_TIMEOUT, max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+              on_result=None):
+    """
+    Run func(path) for every path across worker processes and return a list of
+    FileResults in the order of paths. func must be a module-level function.
+    on_result(result, done, total) is called in the parent as each file
+    finishes, in completion order. timeout and max_memory_mb may be None.
+    """
+    total = len(paths)
+    results = [None] * total
+    if not total:
+        return results
+    if max_memory_mb and rss_mb(os.getpid()) is None:
+        print("Memory cap not enforced: install psutil to measure worker memory on this platform.")
+        max_memory_mb = None
+
+    context = multiprocessing.get_context()
+    pending = collections.deque(enumerate(paths))
+    pool = [_Worker(context, func) for _ in range(max(1, min(workers or os.cpu_count() or 1, total)))]
+    done = 0
+
+    def finish(worker, value=None, error=None, output='', seconds=None):
+        nonlocal done
+        index, path = worker.task
+        if seconds is None:
+            seconds = time.time() - worker.started
+        result = FileResult(index, path, value, error, output, seconds)
+        results[index] = result
+        worker.task = None
+        done += 1
+        if on_result:
+            on_result(result, done, total)
+
+    def replace(worker):
+        worker.kill()
+        pool[pool.index(worker)] = _Worker(context, func)
+
+    try:
+        while done < total:
+            for worker in pool:
+                if worker.task is None and pending:
+                    worker.assign(*pending.popleft())
+
+            busy = [worker for worker in pool if worker.task is not None]
+            ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], timeout=POLL_INTERVAL)
+
+            for worker in busy:
+                if worker.conn in ready or worker.conn.poll():
+                    try:
+                        _, value, error, output, seconds = worker.conn.recv()
+                    except (EOFError, OSError):
+                        finish(worker, error=f"Worker exited with code {worker.process.exitcode}")
+                        replace(worker)
+                        continue
+                    finish(worker, value, error, output, seconds)
+                elif not worker.process.is_alive():
+                    finish(worker, error=f"Worker exited with code {worker.process.exitcode}")
+                    replace(worker)
+                elif timeout and time.time() - worker.started > timeout:
+                    finish(worker, error=f"Timed out after {timeout}s")
+                    replace(worker)
+                elif max_memory_mb:
+                    memory = rss_mb(worker.process.pid)
+                    if memory is not None and memory > max_memory_mb:
+                        finish(worker, error=f"Exceeded memory cap ({memory:.0f} MB > {max_memory_mb} MB)")
+                        replace(worker)
+    finally:
+        for worker in pool:
+            if worker.task is None:
+                worker.stop()
+            else:
+                worker.kill()
+
+    return results
@@ -0,0 +1,348 @@
+import re
+import json
+import time
+import sqlite3
+import importlib
+from contextlib import contextmanager
+
+# Parse-once view of a PDF for the NAV extraction strategies (extract_pdfv2.py).
+#
+# Every strategy used to pdfplumber.open() the file itself and re-extract the
+# same pages. A PDFDocument opens the file once and memoizes per page: text,
+# words, find_tables(), and extract_tables() for each distinct settings dict, so
+# a strategy that asks for something another strategy already computed gets the
+# cached result.
+#
+# Plain text comes from PyMuPDF when it is installed (TEXT_ENGINE), which is
+# several times faster than pdfplumber. Its words are regrouped into lines the
+# way pdfplumber's extract_text() builds them (by vertical position, left to
+# right, single spaces), so a table row still reads as one line to the regex
+# strategies. pdfplumber is only opened when a strategy needs table geometry.
+#
+# ranked_pages() is a cheap pre-pass for the table strategies: it scans the page
+# text for Key figures / Net asset value / NAV /
+# date header mentions and returns the best-scoring pages, so the expensive
+# table-finding settings only run there. Per-page hits are kept on the document
+# and can be logged with PageStatsLog to tune the weights.
+
+# Pages scanned by the pre-pass, pages handed to the table strategies, and the
+# pages used when nothing on the scanned pages scores
+SCAN_PAGES = 20
+TOP_PAGES = 3
+FALLBACK_PAGES = 5
+
+DATE_HEADER_PATTERN = (r'\b\d{1,2}[\.\/]\d{1,2}[\.\/]\d{4}\b'
+                       r'|\b\d{1,2}\s*(?:January|February|March|April|May|June|July|August|September|October|November|December)\s*\d{4}\b')
+# (name, weight, pattern); a page scores weight * hits, with hits capped at MAX_SIGNAL_HITS
+PAGE_SIGNALS = (
+    ('key_figures', 4, re.compile(r'key\s+figures', re.IGNORECASE)),
+    ('net_asset_value', 3, re.compile(r'net\s+asset\s+value', re.IGNORECASE)),
+    ('nav', 2, re.compile(r'\bnav\b', re.IGNORECASE)),
+    ('date_header', 1, re.compile(DATE_HEADER_PATTERN, re.IGNORECASE)),
+)
+MAX_SIGNAL_HITS = 3
+
+PAGE_STATS_NAME = 'page_stats.sqlite3'
+
+ENGINE_PYMUPDF = 'pymupdf'
+ENGINE_PDFPLUMBER = 'pdfplumber'
+# Preferred plain-text engine; falls back to pdfplumber when PyMuPDF is missing
+TEXT_ENGINE = ENGINE_PYMUPDF
+# Words whose tops are within this many points share a line (pdfplumber's default)
+LINE_TOLERANCE = 3
+
+_fitz_module = None
+
+def _fitz():
+    """
+    The PyMuPDF module, or None when it is not installed.
+    """
+    global _fitz_module
+    if _fitz_module is None:
+        try:
+            _fitz_module = importlib.import_module('fitz')
+        except ImportError:
+            _fitz_module = False
+    return _fitz_module or None
+
+def pymupdf_available():
+    return _fitz() is not None
+
+def resolve_text_engine(preferred=None):
+    engine = preferred or TEXT_ENGINE
+    if engine == ENGINE_PYMUPDF and _fitz() is None:
+        return ENGINE_PDFPLUMBER
+    return engine
+
+def words_to_text(words, tolerance=LINE_TOLERANCE):
+    """
+    Join PyMuPDF words ((x0, y0, x1, y1, text, ...) tuples) into lines the way
+    pdfplumber's extract_text() does: words are clustered by their top, each
+    line is read left to right and words are separated by single spaces.
+    """
+    lines = []
+    last_top = None
+    for word in sorted(words, key=lambda w: (w[1], w[0])):
+        # Like pdfplumber, a line grows while each top is close to the previous one
+        if lines and word[1] - last_top <= tolerance:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+        last_top = word[1]
+    return "\n".join(" ".join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines)
+
+def _settings_key(settings):
+    if not settings:
+        return ()
+    return tuple(sorted((key, repr(value)) for key, value in settings.items()))
+
+class PDFDocument:
+    def __init__(self, path, text_engine=None):
+        self.path = path
+        self.text_engine = resolve_text_engine(text_engine)
+        self._pdf = None
+        self._fitz_doc = None
+        self._text = {}
+        self._words = {}
+        self._has_tables = {}
+        self._tables = {}
+        # Derived per-document results (e.g. the structure analysis)
+        self.memo = {}
+        self._hits = {}
+        self._ranked = None
+        self._result_pages = {}
+        # strategy -> where in the page its table result came from (note_layout)
+        self.layouts = {}
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            self._pdf = importlib.import_module('pdfplumber').open(self.path)
+        return self._pdf
+
+    @property
+    def page_count(self):
+        if self.text_engine == ENGINE_PYMUPDF:
+            return self.fitz().page_count
+        return len(self.pdf.pages)
+
+    def page(self, index):
+        return self.pdf.pages[index]
+
+    def page_text(self, index, engine=None):
+        """
+        Text of one page, in pdfplumber's extract_text() layout whichever engine
+        produced it.
+        """
+        engine = engine or self.text_engine
+        text = self._text.get((engine, index))
+        if text is None:
+            if engine == ENGINE_PYMUPDF:
+                text = words_to_text(self.fitz()[index].get_text("words"))
+            else:
+                text = self.page(index).extract_text() or ""
+            self._text[(engine, index)] = text
+        return text
+
+    def text(self, max_pages=None, start_page=0, engine=None):
+        """
+        Text of the pages from start_page (max_pages of them, or all), each
+        followed by a newline.
+        """
+        end_page = self.page_count if max_pages is None else min(start_page + max_pages, self.page_count)
+        return "".join(self.page_text(i, engine) + "\n" for i in range(start_page, end_page))
+
+    def page_words(self, index):
+        words = self._words.get(index)
+        if words is None:
+            words = self.page(index).extract_words()
+            self._words[index] = words
+        return words
+
+    def page_has_tables(self, index):
+        found = self._has_tables.get(index)
+        if found is None:
+            found = bool(self.page(index).find_tables())
+            self._has_tables[index] = found
+        return found
+
+    def page_tables(self, index, settings=None):
+        """
+        page.extract_tables(settings), memoized per page and settings. Errors
+        are cached too, so a failing settings dict is only tried once.
+        """
+        key = (index, _settings_key(settings))
+        cached = self._tables.get(key)
+        if cached is None:
+            try:
+                cached = ('ok', self.page(index).extract_tables(settings))
+            except Exception as e:
+                cached = ('error', e)
+            self._tables[key] = cached
+        status, value = cached
+        if status == 'error':
+            raise value
+        return value
+
+    def page_hits(self, index):
+        """
+        {signal: hits, ..., 'score': weighted score} for one page.
+        """
+        hits = self._hits.get(index)
+        if hits is None:
+            text = self.page_text(index)
+            hits = {name: len(pattern.findall(text)) for name, _, pattern in PAGE_SIGNALS}
+            hits['score'] = sum(weight * min(hits[name], MAX_SIGNAL_HITS) for name, weight, _ in PAGE_SIGNALS)
+            self._hits[index] = hits
+        return hits
+
+    def ranked_pages(self, limit=TOP_PAGES):
+        """
+        Indexes of the pages most likely to hold the NAV table, best first. Falls
+        back to the first FALLBACK_PAGES pages when no scanned page scores.
+        """
+        if self._ranked is None:
+            # Without PyMuPDF the scan costs a full pdfplumber text extraction per page
+            scan_pages = SCAN_PAGES if self.text_engine == ENGINE_PYMUPDF else FALLBACK_PAGES
+            scored = []
+            for index in range(min(scan_pages, self.page_count)):
+                score = self.page_hits(index)['score']
+                if score > 0:
+                    scored.append((-score, index))
+            self._ranked = [index for _, index in sorted(scored)]
+        if not self._ranked:
+            return list(range(min(FALLBACK_PAGES, self.page_count)))
+        return self._ranked[:limit]
+
+    def table_row_bbox(self, index, settings, table_index, row_index):
+        """
+        Bounding box (x0, top, x1, bottom) of one row of a table found with
+        settings, matching the row order of page_tables(); None if it is not there.
+        """
+        try:
+            return tuple(self.page(index).find_tables(settings)[table_index].rows[row_index].bbox)
+        except (IndexError, AttributeError):
+            return None
+
+    def region_text(self, index, bbox):
+        """
+        Text inside bbox on one page, in the same line layout as page_text().
+        """
+        if self.text_engine == ENGINE_PYMUPDF:
+            return words_to_text(self.fitz()[index].get_text("words", clip=bbox))
+        return self.page(index).crop(bbox).extract_text() or ""
+
+    def note_layout(self, strategy, index, settings, table_index, header_row, nav_row):
+        """
+        Record where a table strategy found its result (page, table settings and
+        the header and NAV rows of the table), for layout templates.
+        """
+        self.note_result_page(index, strategy)
+        self.layouts.setdefault(strategy, {
+            'strategy': strategy,
+            'page': index,
+            'settings': settings,
+            'table_index': table_index,
+            'header_row': header_row,
+            'nav_row': nav_row,
+        })
+
+    def note_result_page(self, index, strategy):
+        """
+        Record that strategy found its result on page index.
+        """
+        self._result_pages.setdefault(index, strategy)
+
+    def page_stats(self):
+        """
+        One dict per scanned page: its signal hits and score, its rank (None when
+        it did not score), and which strategy, if any, took its result from it.
+        """
+        ranks = {index: rank for rank, index in enumerate(self._ranked or [], 1)}
+        stats = []
+        for index in sorted(self._hits):
+            entry = {'page': index, 'rank': ranks.get(index), 'result_strategy': self._result_pages.get(index)}
+            entry.update(self._hits[index])
+            stats.append(entry)
+        return stats
+
+    def fitz(self):
+        """
+        The PyMuPDF document for the same file, opened on first use.
+        """
+        if self._fitz_doc is None:
+            fitz = _fitz()
+            if fitz is None:
+                raise ImportError("PyMuPDF is not installed")
+            self._fitz_doc = fitz.open(self.path)
+        return self._fitz_doc
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._fitz_doc is not None:
+            self._fitz_doc.close()
+            self._fitz_doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+@contextmanager
+def document(pdf):
+    """
+    Yield a PDFDocument for pdf, which may be a path or an already open
+    PDFDocument; only documents opened here are closed on exit.
+    """
+    if isinstance(pdf, PDFDocument):
+        yield pdf
+        return
+    doc = PDFDocument(pdf)
+    try:
+        yield doc
+    finally:
+        doc.close()
+
+class PageStatsLog:
+    """
+    SQLite log of the ranking pre-pass: per-page hits and scores, and whether
+    the page a result came from was ranked (and how high).
+    """
+
+    def __init__(self, db_path=PAGE_STATS_NAME):
+        self._db = sqlite3.connect(db_path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS page_hits ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " filename TEXT, page INTEGER, rank INTEGER, score INTEGER,"
+            " hits TEXT, result_strategy TEXT, recorded REAL)"
+        )
+        self._db.commit()
+
+    def record(self, filename, stats):
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO page_hits (filename, page, rank, score, hits, result_strategy, recorded)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(filename, entry['page'], entry['rank'], entry['score'],
+                  json.dumps({name: entry[name] for name, _, _ in PAGE_SIGNALS}), entry['result_strategy'], now)
+                 for entry in stats],
+            )
+
+    def result_ranks(self):
+        """
+        {rank: count} over every page a result was taken from; rank None means
+        the page did not score in the pre-pass.
+        """
+        rows = self._db.execute(
+            "SELECT rank, COUNT(*) FROM page_hits WHERE result_strategy IS NOT NULL GROUP BY rank"
+        ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,172 @@
+import time
+import random
+import sqlite3
+import threading
+
+import metrics
+
+# Persistent redrive queue for emails that failed with a COM error, plus the
+# circuit breaker that pauses saving while Outlook is throwing errors.
+#
+# Instead of retrying a busy Outlook three times back to back, a failed email is
+# recorded by EntryID with a next-attempt time using exponential backoff and full
+# jitter. Queued items are retried at the end of the same run (when their backoff
+# is short) or later with `email_cli.py redrive`, which only touches the queue.
+
+BASE_DELAY = 2.0
+MAX_DELAY = 300.0
+MAX_ATTEMPTS = 8
+
+STATE_PENDING = 'pending'
+STATE_DEAD = 'dead'
+
+def backoff_delay(attempts, base=BASE_DELAY, cap=MAX_DELAY):
+    """
+    Jittered exponential backoff: a random delay in [base, min(cap, base * 2**attempts)],
+    never less than base so a retry cannot come due again straight away.
+    """
+    return random.uniform(base, max(base, min(cap, base * (2 ** attempts))))
+
+class RedriveQueue:
+    def __init__(self, db_path, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS failures ("
+            " entry_id TEXT PRIMARY KEY,"
+            " store_id TEXT,"
+            " sender TEXT,"
+            " subject TEXT,"
+            " date_str TEXT,"
+            " default_year TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL,"
+            " last_error TEXT,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " created REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def add(self, entry_id, store_id, sender, subject, date_str, default_year, error):
+        """
+        Record (another) failure for entry_id and schedule its next attempt.
+        Returns the number of failed attempts so far.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM failures WHERE entry_id = ?", (entry_id,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            state = STATE_DEAD if attempts >= self.max_attempts else STATE_PENDING
+            next_attempt = now + backoff_delay(attempts)
+            if row:
+                self._db.execute(
+                    "UPDATE failures SET attempts = ?, next_attempt = ?, last_error = ?, state = ? WHERE entry_id = ?",
+                    (attempts, next_attempt, error, state, entry_id),
+                )
+            else:
+                self._db.execute(
+                    "INSERT INTO failures (entry_id, store_id, sender, subject, date_str, default_year,"
+                    " attempts, next_attempt, last_error, state, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry_id, store_id, sender, subject, date_str, default_year, attempts, next_attempt, error, state, now),
+                )
+            self._db.commit()
+        metrics.REDRIVE_QUEUED.inc(state=state)
+        return attempts
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._db.execute("DELETE FROM failures WHERE entry_id = ?", (entry_id,))
+            self._db.commit()
+
+    def due(self, now=None, date_str=None, include_dead=False):
+        """
+        Return queued failures whose backoff has elapsed as dicts, oldest first.
+        """
+        now = time.time() if now is None else now
+        query = "SELECT entry_id, store_id, sender, subject, date_str, default_year, attempts, next_attempt FROM failures WHERE next_attempt <= ?"
+        params = [now]
+        if not include_dead:
+            query += " AND state = ?"
+            params.append(STATE_PENDING)
+        if date_str is not None:
+            query += " AND date_str = ?"
+            params.append(date_str)
+        query += " ORDER BY next_attempt"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        keys = ('entry_id', 'store_id', 'sender', 'subject', 'date_str', 'default_year', 'attempts', 'next_attempt')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def next_due_time(self, date_str=None):
+        query = "SELECT MIN(next_attempt) FROM failures WHERE state = ?"
+        params = [STATE_PENDING]
+        if date_str is not None:
+            query += " AND date_str = ?"
+            params.append(date_str)
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM failures WHERE state = ?", (STATE_PENDING,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive COM errors and makes callers wait
+    out reset_timeout before the next attempt; one success closes it again.
+    Each time it re-opens without an intervening success the timeout doubles,
+    up to max_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=15.0, max_timeout=240.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._timeout = reset_timeout
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._timeout = self.reset_timeout
+        metrics.CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None:
+                # Failed again in the half-open trial: back off harder
+                self._timeout = min(self._timeout * 2, self.max_timeout)
+                self._opened_at = time.monotonic()
+            elif self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            opened = self._opened_at is not None
+        if opened:
+            metrics.CIRCUIT_OPEN.set(1)
+
+    def wait(self, sleep=time.sleep):
+        """
+        Block while the breaker is open; returns the seconds spent waiting.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            remaining = self._opened_at + self._timeout - time.monotonic()
+        if remaining > 0:
+            sleep(remaining)
+            return remaining
+        return 0.0
@@ -0,0 +1,166 @@
+import importlib
+
+# Streaming, styled XLSX writer shared by the report scripts (mailbox_export.py,
+# ext_pdf.py, extract_pdfv2.py).
+#
+# Rows go straight into an openpyxl write-only workbook, so memory stays constant
+# however many rows are written; styles, number formats and hyperlinks are applied
+# per cell as the row is written rather than by re-opening the saved file.
+# Write-only sheets need their column widths before the first data row, so the
+# first `sample_rows` rows are buffered to size the columns and then flushed.
+
+HEADER_BLUE = "4472C4"
+HEADER_STEEL = "4F81BD"
+
+class ReportSheet:
+    def __init__(self, writer, title, headers, header_color=HEADER_BLUE, number_formats=None,
+                 hyperlink_columns=None, max_width=50, width_scale=1.0, sample_rows=200,
+                 freeze_header=True, border=False):
+        self._writer = writer
+        self._sheet = writer.workbook.create_sheet(title)
+        self.headers = list(headers)
+        # {column index: number format}; such cells are also right-aligned
+        self.number_formats = dict(number_formats or {})
+        # {column index: label column index or None}; the cell value is the link
+        # target, shown as the label column's value when one is given
+        self.hyperlink_columns = dict(hyperlink_columns or {})
+        self.max_width = max_width
+        self.width_scale = width_scale
+        self.sample_rows = sample_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._flushed = False
+
+        styles = writer.styles
+        self._header_font = styles.Font(bold=True, color="FFFFFF")
+        self._header_fill = styles.PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+        self._header_alignment = styles.Alignment(horizontal="center", vertical="center")
+        self._number_alignment = styles.Alignment(horizontal="right")
+        self._link_font = styles.Font(color="0563C1", underline="single")
+        side = styles.Side(style='thin')
+        self._border = styles.Border(left=side, right=side, top=side, bottom=side) if border else None
+        if freeze_header:
+            self._sheet.freeze_panes = "A2"
+
+    def append(self, row):
+        if self._flushed:
+            self._write(row)
+            return
+        self._buffer.append(list(row))
+        if len(self._buffer) >= self.sample_rows:
+            self._flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def _flush(self):
+        if self._flushed:
+            return
+        get_column_letter = self._writer.get_column_letter
+        widths = [len(str(header)) for header in self.headers]
+        for row in self._buffer:
+            for i, value in enumerate(row[:len(widths)]):
+                if value is not None:
+                    widths[i] = max(widths[i], len(str(value)))
+        for i, width in enumerate(widths, 1):
+            self._sheet.column_dimensions[get_column_letter(i)].width = min((width + 2) * self.width_scale, self.max_width)
+
+        header_cells = []
+        for header in self.headers:
+            cell = self._writer.cell(self._sheet, value=header)
+            cell.font = self._header_font
+            cell.fill = self._header_fill
+            cell.alignment = self._header_alignment
+            if self._border is not None:
+                cell.border = self._border
+            header_cells.append(cell)
+        self._sheet.append(header_cells)
+
+        self._flushed = True
+        buffered, self._buffer = self._buffer, []
+        for row in buffered:
+            self._write(row)
+
+    def _write(self, row):
+        if not self.number_formats and not self.hyperlink_columns and self._border is None:
+            self._sheet.append(row)
+            self.rows_written += 1
+            return
+        cells = []
+        for i, value in enumerate(row):
+            cell = self._writer.cell(self._sheet, value=value)
+            if i in self.number_formats and isinstance(value, (int, float)) and not isinstance(value, bool):
+                cell.number_format = self.number_formats[i]
+                cell.alignment = self._number_alignment
+            if i in self.hyperlink_columns and value:
+                label_index = self.hyperlink_columns[i]
+                cell.hyperlink = str(value)
+                if label_index is not None and label_index < len(row) and row[label_index]:
+                    cell.value = row[label_index]
+                cell.font = self._link_font
+            if self._border is not None:
+                cell.border = self._border
+            cells.append(cell)
+        self._sheet.append(cells)
+        self.rows_written += 1
+
+    def close(self):
+        self._flush()
+
+class ReportWriter:
+    """
+    Context manager owning one write-only workbook:
+
+        with ReportWriter(path) as report:
+            sheet = report.add_sheet("Results", headers, number_formats={2: '#,##0.00'})
+            for row in rows:
+                sheet.append(row)
+    """
+
+    def __init__(self, output_file):
+        openpyxl = importlib.import_module('openpyxl')
+        self.styles = importlib.import_module('openpyxl.styles')
+        self.cell = importlib.import_module('openpyxl.cell').WriteOnlyCell
+        self.get_column_letter = importlib.import_module('openpyxl.utils').get_column_letter
+        self.output_file = output_file
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self._sheets = []
+
+    def add_sheet(self, title, headers, **options):
+        # Sheets are written in order; finish the previous one first
+        if self._sheets:
+            self._sheets[-1].close()
+        sheet = ReportSheet(self, title, headers, **options)
+        self._sheets.append(sheet)
+        return sheet
+
+    def save(self):
+        for sheet in self._sheets:
+            sheet.close()
+        self.workbook.save(self.output_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+        return False
+
+def write_records(output_file, records, columns=None, title="Sheet1", **options):
+    """
+    Stream an iterable of dicts into a single-sheet report. columns defaults to
+    the keys of the first record. Returns the number of rows written.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if columns is None:
+        columns = list(first.keys()) if first is not None else []
+    with ReportWriter(output_file) as report:
+        sheet = report.add_sheet(title, columns, **options)
+        if first is not None:
+            sheet.append([first.get(column) for column in columns])
+        for record in records:
+            sheet.append([record.get(column) for column in columns])
+    return sheet.rows_written
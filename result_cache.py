@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+import blob_store
+
+# Persistent cache of NAV extraction results (extract_pdfv2.py, ext_pdf.py).
+#
+# Results are keyed by the SHA-256 of the PDF's contents plus the extractor's
+# name and version, so a report that has not changed since the last run is
+# served from SQLite instead of being parsed again, wherever it now lives and
+# whatever it is called. Each script carries an EXTRACTOR_VERSION; bumping it
+# when the extraction logic changes makes every cached result a miss. Whatever
+# else changes the result (extract_pdfv2's confidence threshold, the contents of
+# its template store and the strategy order its stats give) is folded into the
+# version with options_version(), so a run never reuses results it would not
+# have produced. Templates learned during a run therefore make the next run
+# re-extract the files they cover once.
+
+CACHE_NAME = 'nav_results.sqlite3'
+
+class ResultCache:
+    def __init__(self, db_path=CACHE_NAME):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " file_hash TEXT NOT NULL,"
+            " extractor TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " method TEXT,"
+            " confidence REAL,"
+            " filename TEXT,"
+            " recorded REAL NOT NULL,"
+            " PRIMARY KEY (file_hash, extractor, version))"
+        )
+        self._db.commit()
+
+    def get(self, file_hash, extractor, version):
+        """
+        Return the cached result dict, or None on a miss.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM results WHERE file_hash = ? AND extractor = ? AND version = ?",
+                (file_hash, extractor, version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, file_hash, extractor, version, result, method=None, confidence=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results"
+                " (file_hash, extractor, version, result, method, confidence, filename, recorded)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_hash, extractor, version, json.dumps(result, default=str), method, confidence,
+                 result.get('PDF Filename'), time.time()),
+            )
+            self._db.commit()
+
+    def purge(self, extractor, keep_version):
+        """
+        Drop results from other versions of extractor. Returns the number removed.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM results WHERE extractor = ? AND version != ?", (extractor, keep_version)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def options_version(version, **options):
+    """
+    version with a short digest of the result-affecting options appended, e.g.
+    '5+3f2a9c01d4e7'; the same version and options always give the same string.
+    """
+    if not options:
+        return version
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    return f"{version}+{digest}"
+
+def split_cached(cache, pdf_files, extractor, version, force=False):
+    """
+    Hash pdf_files and look each one up. Returns (hashes, cached) where hashes
+    maps path -> digest and cached maps path -> result for the hits; force
+    treats everything as a miss.
+    """
+    hashes, cached = {}, {}
+    for pdf_path in pdf_files:
+        try:
+            hashes[pdf_path] = blob_store.hash_file(pdf_path)
+        except OSError as e:
+            print(f"Could not read {pdf_path}: {str(e)}")
+            continue
+        if force:
+            continue
+        result = cache.get(hashes[pdf_path], extractor, version)
+        if result is not None:
+            # Same contents, possibly under a new name
+            result['PDF Filename'] = os.path.basename(pdf_path)
+            cached[pdf_path] = result
+    return hashes, cached
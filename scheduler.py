@@ -0,0 +1,87 @@
+import heapq
+import itertools
+import threading
+
+# Sender-tier priority scheduling for the save loop.
+#
+# The sender path CSV may carry a `priority` (or `tier`) column: critical, high,
+# normal or low, or a number where 0 is most urgent. Emails are pushed into a
+# priority queue by their sender's tier so fund administrators' NAV reports are
+# routed and saved before newsletters and default-path mail, while emails of the
+# same tier keep the order they were found in.
+
+TIERS = ('critical', 'high', 'normal', 'low')
+TIER_RANKS = {name: rank for rank, name in enumerate(TIERS)}
+# Senders listed in the CSV without a tier, and senders not listed at all
+LISTED_TIER = 'normal'
+UNLISTED_TIER = 'low'
+
+def tier_name(value, default=LISTED_TIER):
+    """
+    Normalise a CSV priority/tier cell to one of TIERS.
+    """
+    if value is None:
+        return default
+    text = str(value).strip().lower()
+    if not text or text == 'nan':
+        return default
+    if text in TIER_RANKS:
+        return text
+    try:
+        rank = int(float(text))
+    except ValueError:
+        return default
+    return TIERS[min(max(rank, 0), len(TIERS) - 1)]
+
+def load_sender_tiers(sender_path_table):
+    """
+    Return {sender (lower-cased): tier} from the sender path table. A sender
+    listed on several rows gets its most urgent tier.
+    """
+    column = next((name for name in ('priority', 'tier') if name in sender_path_table.columns), None)
+    tiers = {}
+    for _, row in sender_path_table.iterrows():
+        sender = str(row.get('sender', '')).strip().lower()
+        if not sender:
+            continue
+        tier = tier_name(row.get(column) if column else None)
+        current = tiers.get(sender)
+        if current is None or TIER_RANKS[tier] < TIER_RANKS[current]:
+            tiers[sender] = tier
+    return tiers
+
+class PriorityScheduler:
+    """
+    Thread-safe priority queue of (tier, payload); pop() returns the oldest
+    entry of the most urgent tier present.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(TIERS, 0)
+
+    def push(self, tier, payload):
+        with self._lock:
+            heapq.heappush(self._heap, (TIER_RANKS[tier], next(self._seq), tier, payload))
+            self._counts[tier] += 1
+
+    def pop(self):
+        """
+        Return (tier, payload), or None when the queue is empty.
+        """
+        with self._lock:
+            if not self._heap:
+                return None
+            _, _, tier, payload = heapq.heappop(self._heap)
+            self._counts[tier] -= 1
+            return tier, payload
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
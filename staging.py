@@ -0,0 +1,218 @@
+import os
+import time
+import random
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Write-behind staging for saves to slow network shares.
+#
+# Outlook SaveAs writes to a local staging directory, then a small bounded pool
+# moves each file to its routed share path. Every file is recorded in a SQLite
+# ledger (pending -> staged -> moving -> done / failed) inside the staging
+# directory before SaveAs starts, so a crash mid-run leaves a record of every
+# file that still has to reach the share, and of half-written saves to clean up;
+# recover() deals with both on the next start.
+
+LEDGER_NAME = 'ledger.sqlite3'
+
+STATE_PENDING = 'pending'
+STATE_STAGED = 'staged'
+STATE_MOVING = 'moving'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+class StagingMover:
+    def __init__(self, staging_dir, max_workers=4, max_pending=64, retries=5, backoff=0.5):
+        self.staging_dir = staging_dir
+        self.retries = retries
+        self.backoff = backoff
+        os.makedirs(staging_dir, exist_ok=True)
+
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(staging_dir, LEDGER_NAME), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS moves ("
+            " staged_path TEXT PRIMARY KEY,"
+            " final_path TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        # Bounds how many staged files may be waiting for the share at once, so a
+        # dead share blocks the save loop instead of filling the local disk
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='staging-mover')
+        self._pending_lock = threading.Lock()
+        self._pending = {}  # final_path -> future
+        self.failures = []
+
+    def _set_final_path(self, staged_path, final_path):
+        with self._db_lock:
+            self._db.execute("UPDATE moves SET final_path = ? WHERE staged_path = ?", (final_path, staged_path))
+            self._db.commit()
+
+    def _set_state(self, staged_path, state, error=None, final_path=None, attempts=None):
+        with self._db_lock:
+            if final_path is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO moves (staged_path, final_path, state, attempts, error, updated) VALUES (?, ?, ?, 0, ?, ?)",
+                    (staged_path, final_path, state, error, time.time()),
+                )
+            elif attempts is not None:
+                self._db.execute(
+                    "UPDATE moves SET state = ?, error = ?, attempts = ?, updated = ? WHERE staged_path = ?",
+                    (state, error, attempts, time.time(), staged_path),
+                )
+            else:
+                self._db.execute(
+                    "UPDATE moves SET state = ?, error = ?, updated = ? WHERE staged_path = ?",
+                    (state, error, time.time(), staged_path),
+                )
+            self._db.commit()
+
+    def staging_path_for(self, final_path):
+        """
+        Return a unique local path to SaveAs into for a file bound for final_path.
+        The file is recorded as pending before this returns, and a pending slot is
+        taken (blocking while the share is behind); hand the path to submit() once
+        SaveAs succeeds, or to abandon() if it fails.
+        """
+        name = os.path.basename(final_path)
+        stamp = f"{time.time_ns()}_{threading.get_ident()}"
+        staged_path = os.path.join(self.staging_dir, f"{stamp}_{name}")
+        self._set_state(staged_path, STATE_PENDING, final_path=final_path)
+        self._slots.acquire()
+        return staged_path
+
+    def is_reserved(self, final_path):
+        """
+        True if a staged file is still on its way to final_path; the collision
+        check treats these like files that already exist on the share.
+        """
+        with self._pending_lock:
+            return final_path in self._pending
+
+    def submit(self, staged_path, final_path):
+        """
+        Queue a saved file from staging_path_for() for the move to final_path.
+        """
+        self._set_state(staged_path, STATE_STAGED, final_path=final_path)
+        with self._pending_lock:
+            future = self._pool.submit(self._move_with_retry, staged_path, final_path)
+            self._pending[final_path] = future
+        future.add_done_callback(lambda _f, path=final_path: self._release(path))
+        return future
+
+    def abandon(self, staged_path, error):
+        """
+        Give up on a path from staging_path_for() whose SaveAs failed: remove
+        anything half-written, mark it failed and free its slot.
+        """
+        try:
+            os.remove(staged_path)
+        except FileNotFoundError:
+            pass
+        self._set_state(staged_path, STATE_FAILED, error=str(error))
+        self._slots.release()
+
+    def _release(self, final_path):
+        with self._pending_lock:
+            self._pending.pop(final_path, None)
+        self._slots.release()
+
+    def _move_with_retry(self, staged_path, final_path):
+        last_error = None
+        for attempt in range(1, self.retries + 1):
+            self._set_state(staged_path, STATE_MOVING, attempts=attempt)
+            try:
+                with metrics.STAGED_MOVE_SECONDS.time():
+                    moved_path = self._move(staged_path, final_path)
+                if moved_path != final_path:
+                    print(f"'{final_path}' already exists on the share; saved as '{moved_path}'")
+                    self._set_final_path(staged_path, moved_path)
+                self._set_state(staged_path, STATE_DONE)
+                return moved_path
+            except OSError as e:
+                last_error = e
+                if attempt < self.retries:
+                    time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        metrics.STAGED_MOVE_FAILURES.inc()
+        self._set_state(staged_path, STATE_FAILED, error=str(last_error))
+        self.failures.append((staged_path, final_path, str(last_error)))
+        raise last_error
+
+    def _move(self, staged_path, final_path):
+        """
+        Move staged_path to final_path, or to final_path with a _1, _2, ... suffix
+        if that name was taken on the share meanwhile. Returns the path used.
+        """
+        os.makedirs(os.path.dirname(final_path) or '.', exist_ok=True)
+        # Copy under a temporary name and rename into place, so the share never
+        # shows a half-written .msg
+        base, ext = os.path.splitext(final_path)
+        counter = 1
+        while os.path.exists(final_path):
+            final_path = f"{base}_{counter}{ext}"
+            counter += 1
+        partial_path = final_path + '.partial'
+        shutil.copyfile(staged_path, partial_path)
+        os.replace(partial_path, final_path)
+        os.remove(staged_path)
+        return final_path
+
+    def recover(self):
+        """
+        Re-queue files left in the staged/moving state by an earlier run that
+        stopped before they reached the share. Files still pending were cut off
+        during SaveAs and may be incomplete, so they are removed and marked
+        failed. Returns the number re-queued.
+        """
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT staged_path, final_path, state FROM moves WHERE state IN (?, ?, ?, ?)",
+                (STATE_PENDING, STATE_STAGED, STATE_MOVING, STATE_FAILED),
+            ).fetchall()
+        requeued = 0
+        for staged_path, final_path, state in rows:
+            if state == STATE_PENDING:
+                if os.path.exists(staged_path):
+                    os.remove(staged_path)
+                self._set_state(staged_path, STATE_FAILED, error='interrupted during SaveAs')
+            elif os.path.exists(staged_path):
+                self._slots.acquire()
+                self.submit(staged_path, final_path)
+                requeued += 1
+            elif state != STATE_FAILED:
+                self._set_state(staged_path, STATE_FAILED, error='staged file missing')
+        return requeued
+
+    def drain(self):
+        """
+        Wait until every submitted file has been moved (or has failed for good).
+        Returns and clears the list of (staged_path, final_path, error) failures.
+        """
+        while True:
+            with self._pending_lock:
+                futures = list(self._pending.values())
+            if not futures:
+                break
+            for future in futures:
+                try:
+                    future.result()
+                except OSError:
+                    pass
+        failures, self.failures = self.failures, []
+        return failures
+
+    def close(self):
+        self.drain()
+        self._pool.shutdown(wait=True)
+        with self._db_lock:
+            self._db.close()
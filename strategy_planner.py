@@ -0,0 +1,101 @@
+import os
+import time
+import sqlite3
+
+# Adaptive ordering of the NAV extraction fallback strategies (extract_pdfv2.py).
+#
+# Each strategy's runs, hits (it produced at least one candidate) and time spent
+# are recorded in SQLite across the whole corpus. Strategies are tried in order
+# of expected hits per second, with a small prior so new or rarely used
+# strategies keep their default order until there is data, and the run stops as
+# soon as a candidate clears the confidence threshold.
+
+STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategy_stats.sqlite3')
+CONFIDENCE_THRESHOLD = 0.9
+# Pseudo-runs behind each strategy's prior hit rate and cost
+PRIOR_RUNS = 2
+PRIOR_HIT_RATE = 0.5
+
+class Strategy:
+    def __init__(self, name, run, prior_seconds=0.1, applies=None):
+        self.name = name
+        # run(*args) -> list of candidate dicts with a 'confidence' key
+        self.run = run
+        self.prior_seconds = prior_seconds
+        # applies(*args) -> bool; strategies that do not apply are skipped
+        self.applies = applies
+
+class StrategyStats:
+    def __init__(self, db_path=STATS_PATH):
+        self.db_path = db_path
+        # Batch workers share the file, so wait for each other's writes
+        self._db = sqlite3.connect(db_path, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS strategy_stats ("
+            " strategy TEXT PRIMARY KEY,"
+            " runs INTEGER NOT NULL DEFAULT 0,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " seconds REAL NOT NULL DEFAULT 0)"
+        )
+        self._db.commit()
+
+    def snapshot(self):
+        """
+        {strategy: (runs, hits, seconds)}.
+        """
+        rows = self._db.execute("SELECT strategy, runs, hits, seconds FROM strategy_stats").fetchall()
+        return {name: (runs, hits, seconds) for name, runs, hits, seconds in rows}
+
+    def record(self, observations):
+        """
+        Add (strategy, hit, seconds) observations in one transaction.
+        """
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO strategy_stats (strategy, runs, hits, seconds) VALUES (?, 1, ?, ?)"
+                " ON CONFLICT (strategy) DO UPDATE SET runs = runs + 1, hits = hits + excluded.hits,"
+                " seconds = seconds + excluded.seconds",
+                [(name, int(hit), seconds) for name, hit, seconds in observations],
+            )
+
+    def close(self):
+        self._db.close()
+
+def expected_value(strategy, recorded):
+    """
+    Expected hits per second for strategy given its (runs, hits, seconds).
+    """
+    runs, hits, seconds = recorded or (0, 0, 0.0)
+    hit_rate = (hits + PRIOR_HIT_RATE * PRIOR_RUNS) / (runs + PRIOR_RUNS)
+    mean_seconds = (seconds + strategy.prior_seconds * PRIOR_RUNS) / (runs + PRIOR_RUNS)
+    return hit_rate / max(mean_seconds, 1e-6)
+
+def plan(strategies, stats=None):
+    """
+    strategies ordered best first; ties (e.g. no stats) keep the given order.
+    """
+    recorded = stats.snapshot() if stats else {}
+    ranked = sorted(enumerate(strategies), key=lambda item: (-expected_value(item[1], recorded.get(item[1].name)), item[0]))
+    return [strategy for _, strategy in ranked]
+
+def run_plan(strategies, args, stats=None, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Run the applicable strategies in planned order on args until a candidate
+    reaches threshold. Returns (candidates, observations) where observations
+    are the (strategy, hit, seconds) of the strategies that ran; they are also
+    recorded in stats.
+    """
+    candidates = []
+    observations = []
+    for strategy in plan(strategies, stats):
+        if strategy.applies and not strategy.applies(*args):
+            continue
+        start = time.perf_counter()
+        found = strategy.run(*args) or []
+        observations.append((strategy.name, bool(found), time.perf_counter() - start))
+        candidates.extend(found)
+        if threshold is not None and any(c['confidence'] >= threshold for c in found):
+            break
+    if stats and observations:
+        stats.record(observations)
+    return candidates, observations
@@ -0,0 +1,107 @@
+import os
+import time
+import sqlite3
+import importlib
+
+# Append-only run summary store behind email_summary.xlsx.
+#
+# Each processed date appends a few rows to SQLite, which costs the same no matter
+# how much history exists. The xlsx is rebuilt from the store in one pass with
+# openpyxl's write-only (streaming) workbook once a run has finished, instead of
+# loading and re-saving the whole workbook for every day.
+
+SUMMARY_HEADERS = ['Date', 'Total Emails', 'Saved in Default', 'Saved in Actual Paths', 'Not Saved']
+FAILED_HEADERS = ['Date', 'Email Address', 'Subject']
+
+class SummaryStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summary ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " date_str TEXT, total_emails INTEGER, saved_default INTEGER,"
+            " saved_actual INTEGER, not_saved INTEGER, recorded REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS failed_emails ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " date_str TEXT, email_address TEXT, subject TEXT)"
+        )
+        self._db.commit()
+
+    def is_empty(self):
+        return self._db.execute("SELECT COUNT(*) FROM summary").fetchone()[0] == 0
+
+    def record_day(self, date_str, total_emails, saved_default, saved_actual, not_saved, failed_emails):
+        with self._db:
+            self._db.execute(
+                "INSERT INTO summary (date_str, total_emails, saved_default, saved_actual, not_saved, recorded)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (date_str, total_emails, saved_default, saved_actual, not_saved, time.time()),
+            )
+            self._db.executemany(
+                "INSERT INTO failed_emails (date_str, email_address, subject) VALUES (?, ?, ?)",
+                [(date_str, email['email_address'], email['subject']) for email in failed_emails],
+            )
+
+    def import_xlsx(self, xlsx_path):
+        """
+        One-off import of an existing email_summary.xlsx so its history is kept.
+        Returns the number of summary rows imported.
+        """
+        openpyxl = importlib.import_module('openpyxl')
+        workbook = openpyxl.load_workbook(xlsx_path, read_only=True)
+        imported = 0
+        try:
+            with self._db:
+                sheet = workbook.worksheets[0]
+                for row in sheet.iter_rows(min_row=2, values_only=True):
+                    if not row or row[0] is None:
+                        continue
+                    row = (list(row) + [None] * 5)[:5]
+                    self._db.execute(
+                        "INSERT INTO summary (date_str, total_emails, saved_default, saved_actual, not_saved, recorded)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (*row, time.time()),
+                    )
+                    imported += 1
+                if 'Failed Emails' in workbook.sheetnames:
+                    for row in workbook['Failed Emails'].iter_rows(min_row=2, values_only=True):
+                        if not row or row[0] is None:
+                            continue
+                        row = (list(row) + [None] * 3)[:3]
+                        self._db.execute(
+                            "INSERT INTO failed_emails (date_str, email_address, subject) VALUES (?, ?, ?)", row
+                        )
+        finally:
+            workbook.close()
+        return imported
+
+    def export_xlsx(self, xlsx_path):
+        """
+        Write the Summary and Failed Emails sheets in one streaming pass. The file
+        is written next to the target and renamed over it, so a crash never leaves
+        a half-written workbook.
+        """
+        openpyxl = importlib.import_module('openpyxl')
+        workbook = openpyxl.Workbook(write_only=True)
+
+        summary_sheet = workbook.create_sheet('Summary')
+        summary_sheet.append(SUMMARY_HEADERS)
+        for row in self._db.execute(
+            "SELECT date_str, total_emails, saved_default, saved_actual, not_saved FROM summary ORDER BY id"
+        ):
+            summary_sheet.append(list(row))
+
+        failed_sheet = workbook.create_sheet('Failed Emails')
+        failed_sheet.append(FAILED_HEADERS)
+        for row in self._db.execute("SELECT date_str, email_address, subject FROM failed_emails ORDER BY id"):
+            failed_sheet.append(list(row))
+
+        tmp_path = xlsx_path + '.tmp'
+        workbook.save(tmp_path)
+        os.replace(tmp_path, xlsx_path)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts live in the repository root, which also holds an email.py that
+# shadows the standard library's email package; append the root instead of
+# prepending it so `import email` still finds the standard library.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import link_downloader
+
+class ReportHandler(BaseHTTPRequestHandler):
+    # Set per server in the fixture: body, etag and the headers of every request
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body, etag = server.body, server.etag
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        start = 0
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range') == etag:
+            start = int(byte_range.split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Disposition', 'attachment; filename="report.pdf"')
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ReportHandler)
+    httpd.body, httpd.etag, httpd.requests = b'%PDF-1.4 first version', '"v1"', []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def downloader(tmp_path):
+    pytest.importorskip('requests')
+    downloader = link_downloader.LinkDownloader(str(tmp_path / 'cache.sqlite3'), retries=1, backoff=0)
+    yield downloader
+    downloader.close()
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_port}/files/report"
+
+def test_download_then_revalidate_with_etag(server, downloader, tmp_path):
+    save_path = str(tmp_path / 'out')
+    result = downloader.download(_url(server), save_path)
+    assert result.ok and not result.cached and result.filename == 'report.pdf'
+    assert open(os.path.join(save_path, 'report.pdf'), 'rb').read() == server.body
+    assert 'If-None-Match' not in server.requests[0]
+
+    result = downloader.download(_url(server), save_path)
+    assert result.ok and result.cached
+    assert server.requests[1]['If-None-Match'] == '"v1"'
+
+def test_changed_file_is_fetched_again(server, downloader, tmp_path):
+    save_path = str(tmp_path / 'out')
+    downloader.download(_url(server), save_path)
+    server.body, server.etag = b'%PDF-1.4 second version', '"v2"'
+
+    result = downloader.download(_url(server), save_path)
+    assert result.ok and not result.cached
+    assert open(os.path.join(save_path, 'report.pdf'), 'rb').read() == b'%PDF-1.4 second version'
+
+def _partial(save_path, url, data, validator):
+    os.makedirs(save_path, exist_ok=True)
+    partial_path = os.path.join(save_path, f".{hashlib.sha1(url.encode()).hexdigest()[:16]}.partial")
+    with open(partial_path, 'wb') as f:
+        f.write(data)
+    with open(partial_path + '.validator', 'w') as f:
+        f.write(validator)
+    return partial_path
+
+def test_resume_sends_if_range(server, downloader, tmp_path):
+    save_path = str(tmp_path / 'out')
+    partial_path = _partial(save_path, _url(server), server.body[:8], '"v1"')
+
+    result = downloader.download(_url(server), save_path)
+    assert result.ok and result.resumed
+    assert server.requests[0]['Range'] == 'bytes=8-'
+    assert server.requests[0]['If-Range'] == '"v1"'
+    assert open(os.path.join(save_path, 'report.pdf'), 'rb').read() == server.body
+    assert not os.path.exists(partial_path) and not os.path.exists(partial_path + '.validator')
+
+def test_resume_of_changed_file_starts_over(server, downloader, tmp_path):
+    save_path = str(tmp_path / 'out')
+    _partial(save_path, _url(server), b'%PDF-1.3 stale', '"v0"')
+
+    result = downloader.download(_url(server), save_path)
+    assert result.ok and not result.resumed
+    assert open(os.path.join(save_path, 'report.pdf'), 'rb').read() == server.body
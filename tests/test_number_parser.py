@@ -0,0 +1,94 @@
+import pytest
+
+import number_parser
+
+# (text, expected) for parse_number(text); one row per format in the module header
+FORMATS = [
+    ("595'446'138", 595446138.0),
+    ("1’234.56", 1234.56),
+    ("1,234,567.89", 1234567.89),
+    ("1 234 567,89", 1234567.89),
+    ("1\u00a0234\u00a0567,89", 1234567.89),
+    ("1\u202f234", 1234.0),
+    ("1.234.567,89", 1234567.89),
+    ("1.234.567", 1234567.0),
+    ("1234", 1234.0),
+    ("1234.5", 1234.5),
+    ("Net asset value 595'446'138", 595446138.0),
+]
+
+MARKERS = [
+    ("(1,234)", -1234.0),
+    ("( 1'234.50 )", -1234.5),
+    ("-1234", -1234.0),
+    ("−1'234", -1234.0),
+    ("CHF 1'234", 1234.0),
+    ("CHF -1'234", -1234.0),
+    ("1'234 EUR", 1234.0),
+    ("$1,234", 1234.0),
+    ("€ 1.234,50", 1234.5),
+    ("-$1,234", -1234.0),
+    ("1.5x", 1.5),
+    ("(12)", -12.0),
+]
+
+AMBIGUOUS = [
+    # A single comma or dot after one to three digits with three after is a
+    # thousands separator...
+    ("1,234", 1234.0),
+    ("123,456", 123456.0),
+    ("1.234", 1234.0),
+    ("1.000", 1000.0),
+    ("EUR 1.000", 1000.0),
+    # ...otherwise a decimal point
+    ("12.5", 12.5),
+    ("1.2345", 1.2345),
+    ("1234.567", 1234.567),
+    ("12,5", 12.5),
+    ("12,50", 12.5),
+    ("1,2345", 1.2345),
+    ("0,123", 0.123),
+    ("1234,567", 1234.567),
+    ("0.123", 0.123),
+    (".5", 0.5),
+    (",5", 0.5),
+    # Badly grouped digits are not a number
+    ("1,234,56", None),
+    ("1'234'56", None),
+    ("31.12.2023", None),
+    # Unbalanced parenthesis is not a negative
+    ("(1,234", 1234.0),
+    ("1,234.", 1234.0),
+]
+
+NOT_NUMBERS = [
+    ("", None),
+    ("n/a", None),
+    ("Net asset value", None),
+    ("-", None),
+    (None, None),
+    (True, None),
+]
+
+@pytest.mark.parametrize('text, expected', FORMATS + MARKERS + AMBIGUOUS + NOT_NUMBERS)
+def test_parse_number(text, expected):
+    assert number_parser.parse_number(text) == expected
+
+@pytest.mark.parametrize('text, expected', [
+    ("12.5%", 12.5),
+    ("12,5 %", 12.5),
+    ("(3.2%)", -3.2),
+    ("100%", 100.0),
+])
+def test_percentages(text, expected):
+    assert number_parser.parse_number(text) is None
+    assert number_parser.parse_number(text, percent=True) == expected
+
+@pytest.mark.parametrize('value, expected', [(1234, 1234.0), (12.5, 12.5), (0, 0.0)])
+def test_numeric_values_pass_through(value, expected):
+    result = number_parser.parse_number(value)
+    assert result == expected and isinstance(result, float)
+
+def test_parse_numbers_keeps_order():
+    assert number_parser.parse_numbers(["1'234", "x", "12.5%", "(5)"]) == [1234.0, None, None, -5.0]
+    assert number_parser.parse_numbers(["12.5%"], percent=True) == [12.5]
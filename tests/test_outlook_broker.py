@@ -0,0 +1,82 @@
+import datetime
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+import outlook_broker
+
+MAILBOX = {
+    "hf_data@bofa.com": {
+        "Inbox": [
+            {"entry_id": "1", "subject": "NAV May 2024", "sender": "reports@fund.com",
+             "received": "2024-05-31T09:30:00", "body": "See attached",
+             "attachments": [{"filename": "NAV.pdf", "content": "nav"}]},
+            {"entry_id": "2", "subject": "Newsletter", "sender": "news@other.com",
+             "received": "2024-05-30T08:00:00"},
+        ]
+    }
+}
+
+@pytest.fixture
+def broker():
+    authkey = os.urandom(outlook_broker.AUTHKEY_BYTES)
+    server = outlook_broker.BrokerServer(outlook_broker.FakeOutlookBackend(MAILBOX), '127.0.0.1:0', authkey).start()
+    client = outlook_broker.BrokerClient(server.address, authkey)
+    yield server, client, authkey
+    client.close()
+    server.close()
+
+def test_round_trip_through_client(broker, tmp_path):
+    server, client, _ = broker
+    assert client.ping()['backend'] == 'fake'
+
+    folder = client.resolve_folder("hf_data@bofa.com", "Inbox")
+    assert folder['name'] == "Inbox"
+
+    items = client.restrict(folder, senders=["fund.com"], has_attachments=True)
+    assert [item.EntryID for item in items] == ["1"]
+    item = items[0]
+    assert item.Subject == "NAV May 2024"
+    assert item.ReceivedTime.year == 2024
+    assert [a.FileName for a in item.Attachments] == ["NAV.pdf"]
+
+    saved = tmp_path / "item.msg"
+    item.SaveAs(str(saved))
+    assert json.loads(saved.read_text(encoding='utf-8'))['entry_id'] == "1"
+    assert server.backend.calls == ['resolve_folder', 'restrict', 'item_metadata', 'save_item']
+
+def test_inbox_items_on_day(broker):
+    _, client, _ = broker
+    items = outlook_broker.inbox_items_on(client, "hf_data@bofa.com", datetime.date(2024, 5, 31))
+    assert items.Count == 1 and items[0].EntryID == "1"
+    assert items[0].Body == "See attached"
+    assert outlook_broker.inbox_items_on(client, "hf_data@bofa.com", datetime.date(2024, 6, 1)).Count == 0
+
+def test_errors_come_back_as_broker_errors(broker):
+    _, client, _ = broker
+    with pytest.raises(outlook_broker.BrokerError):
+        client.item_metadata("missing", "hf_data@bofa.com")
+    with pytest.raises(outlook_broker.BrokerError):
+        client.call('__reduce__')
+
+def test_wrong_key_is_rejected(broker):
+    server, _, authkey = broker
+    with pytest.raises(outlook_broker.BrokerUnavailable):
+        outlook_broker.BrokerClient(server.address, bytes(reversed(authkey)))
+
+@pytest.mark.parametrize('authkey', outlook_broker.INSECURE_AUTHKEYS)
+def test_refuses_well_known_keys(authkey):
+    with pytest.raises(outlook_broker.BrokerError):
+        outlook_broker.BrokerServer(outlook_broker.FakeOutlookBackend(MAILBOX), '127.0.0.1:0', authkey)
+
+def test_load_authkey_creates_a_private_random_key(tmp_path):
+    path = str(tmp_path / "key")
+    assert outlook_broker.load_authkey(path) is None
+    key = outlook_broker.load_authkey(path, create=True)
+    assert len(key) == outlook_broker.AUTHKEY_BYTES
+    assert outlook_broker.load_authkey(path) == key
+    if sys.platform != 'win32':
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600